@@ -0,0 +1,175 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """
+    Run the enclosed block against a freshly migrated throwaway database.
+
+    Uses the same machinery as the test runner, so benchmarks never touch
+    the configured database and always see the current schema.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at values set on the instances."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+# Dataset sizes for the seeding profiles used by benchmarks and the
+# endpoint performance suite
+SEED_PROFILES = {
+    'test': {
+        'users': 5, 'stores': 20, 'products': 10, 'orders': 40,
+        'items_per_order': 3, 'deliveries': 30,
+    },
+    'realistic': {
+        'users': 50, 'stores': 2000, 'products': 3000, 'orders': 5000,
+        'items_per_order': 4, 'deliveries': 4000,
+    },
+}
+
+
+def seed_dataset(users, stores, products, orders, items_per_order, deliveries, days=60, seed=42):
+    """
+    Bulk-insert a deterministic dataset and return a dict describing it.
+
+    Bypasses model save() and signals for speed, so derived data (inventory
+    rows, profiles, the sales rollup) is created explicitly.
+    """
+    # Imported here so the helpers above stay usable before app loading
+    from datetime import time as dt_time, timedelta
+    from decimal import Decimal
+    import random
+
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from apps.dashboard import rollups
+    from apps.deliveries.models import Delivery
+    from apps.inventory.models import Inventory
+    from apps.orders.models import Order, OrderItem
+    from apps.products.models import Product
+    from apps.stores import geo as store_geo
+    from apps.stores.models import Store
+    from apps.users.models import UserProfile
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    now = timezone.now()
+    today = timezone.localdate()
+
+    admin = User.objects.create_user(username='perf-admin', password='perf-admin', role='admin')
+    staff = User.objects.bulk_create([
+        User(username=f'perf-user-{i}', first_name='Perf', last_name=str(i), role='employee')
+        for i in range(users)
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in staff])
+
+    store_rows = [
+        Store(
+            name=f'Store {i:05d}',
+            owner_name=f'Owner {i}',
+            address=f'{i} Main Street',
+            contact=f'0917{i:07d}',
+            day=Store.DAYS_OF_WEEK[i % 7][0],
+            latitude=14.5 + rng.random() * 0.3,
+            longitude=120.9 + rng.random() * 0.3,
+            hours='8:00 AM - 6:00 PM',
+        )
+        for i in range(stores)
+    ]
+    for store in store_rows:
+        store.update_geohash()
+    store_rows = Store.objects.bulk_create(store_rows)
+    # Bulk inserts skip the signal that keeps the spatial index current
+    store_geo.invalidate()
+    product_rows = Product.objects.bulk_create([
+        Product(
+            product_id=f'PERF-{i:05d}',
+            name=f'Product {i:05d}',
+            price=Decimal(rng.randint(1500, 9000)) / 100,
+            size=rng.choice(['250ml', '330ml', '500ml', '1L', '1.5L']),
+        )
+        for i in range(products)
+    ])
+    Inventory.objects.bulk_create([
+        Inventory(product=product, stock=rng.randint(0, 500), low_stock_threshold=10)
+        for product in product_rows
+    ])
+
+    for offset in range(0, orders, 2000):
+        order_rows = []
+        item_rows = []
+        for i in range(offset, min(offset + 2000, orders)):
+            lines = rng.sample(product_rows, min(items_per_order, len(product_rows)))
+            line_items = [(product, rng.randint(1, 48)) for product in lines]
+            subtotal = sum((product.price * quantity for product, quantity in line_items), Decimal('0'))
+            tax = subtotal * Decimal('0.02')
+            order = Order(
+                order_id=f'P{i:011d}',
+                store=rng.choice(store_rows),
+                created_by=rng.choice(staff) if staff else admin,
+                status=rng.choice(['Pending', 'Processing', 'Completed', 'Completed', 'Cancelled']),
+                subtotal=subtotal,
+                tax=tax,
+                total=subtotal + tax,
+                created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+            )
+            order_rows.append(order)
+            item_rows.extend(
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=quantity,
+                    unit_price=product.price,
+                    total=product.price * quantity,
+                )
+                for product, quantity in line_items
+            )
+        with explicit_timestamps(Order):
+            Order.objects.bulk_create(order_rows)
+        OrderItem.objects.bulk_create(item_rows)
+
+    delivered_orders = Order.objects.order_by('pk')[:deliveries]
+    Delivery.objects.bulk_create([
+        Delivery(
+            id=f'DEL-{i:06d}',
+            order=order,
+            employee=rng.choice(staff) if staff else None,
+            status=rng.choice(['pending', 'in-transit', 'delivered', 'cancelled']),
+            delivery_date=today - timedelta(days=rng.randint(0, 6)),
+            delivery_time=dt_time(rng.randint(8, 17), rng.choice([0, 15, 30, 45])),
+        )
+        for i, order in enumerate(delivered_orders.iterator())
+    ])
+
+    rollups.rebuild()
+
+    return {
+        'user': admin,
+        'today': today,
+        'counts': {
+            'users': users, 'stores': stores, 'products': products,
+            'orders': orders, 'deliveries': min(deliveries, orders),
+        },
+    }
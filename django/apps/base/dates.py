@@ -0,0 +1,16 @@
+"""
+Local calendar days.
+
+Timestamps are stored in UTC while days (sales, snapshots, date filters)
+are local. Filtering a timestamp column on the aware bounds of a day,
+rather than on ``__date``, lets the database use the column's index.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def day_bounds(day):
+    """Aware datetimes spanning one local calendar day, end exclusive."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
@@ -0,0 +1,128 @@
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from apps.base.benchmarks import SEED_PROFILES, scratch_database, seed_dataset
+from apps.deliveries import services
+from apps.deliveries.models import Delivery
+
+STATUSES = ('pending', 'in-transit')
+
+
+@contextmanager
+def sqlite_file(options):
+    """Point the scratch database at a file (WAL needs one) opened with ``options``."""
+    settings_dict = connection.settings_dict
+    saved = settings_dict['TEST'].get('NAME'), settings_dict['OPTIONS']
+    with tempfile.TemporaryDirectory() as directory:
+        settings_dict['TEST']['NAME'] = str(Path(directory) / 'bench.sqlite3')
+        settings_dict['OPTIONS'] = options
+        try:
+            yield
+        finally:
+            settings_dict['TEST']['NAME'], settings_dict['OPTIONS'] = saved
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests concurrent writes: driver threads posting status updates while '
+        'reader threads list deliveries. On SQLite it compares the stock connection '
+        'settings with the configured ones (WAL, immediate transactions, busy timeout). '
+        'Runs against a throwaway database, the configured one is never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=8, help='Threads writing at once')
+        parser.add_argument('--updates', type=int, default=50, help='Status updates per driver')
+        parser.add_argument('--readers', type=int, default=2, help='Threads listing deliveries meanwhile')
+
+    def handle(self, *args, **options):
+        profile = dict(SEED_PROFILES['test'], orders=options['drivers'], deliveries=options['drivers'])
+        if connection.vendor == 'sqlite':
+            modes = [
+                # Django's defaults: rollback journal, deferred transactions, 5 s timeout
+                ('stock', {}, 'DELETE'),
+                # The migrations switch the scratch file to WAL, as they do the real one
+                ('configured', dict(connection.settings_dict['OPTIONS']), 'WAL'),
+            ]
+        else:
+            modes = [('configured', None, None)]
+
+        for name, mode_options, journal_mode in modes:
+            setup = sqlite_file(mode_options) if mode_options is not None else nullcontext()
+            with setup, scratch_database():
+                if journal_mode:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+                seed_dataset(**profile)
+                delivery_ids = list(Delivery.objects.values_list('pk', flat=True))
+                connection.close()
+                result = self.hammer(delivery_ids, options['updates'], options['readers'])
+            latencies = sorted(result['latencies'])
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+            self.stdout.write(
+                f"{name:<10} {len(latencies):,} writes  {len(latencies) / result['elapsed']:8,.0f} writes/s  "
+                f"p95 {p95 * 1000:7.1f} ms  locked {result['locked']:<5}  "
+                f"{result['reads'] / result['elapsed']:8,.0f} reads/s  reads locked {result['reads_locked']}"
+            )
+
+    def hammer(self, delivery_ids, updates, readers):
+        """Run one driver thread per delivery plus ``readers``; returns the counts."""
+        latencies = []
+        counts = {'locked': 0, 'reads': 0, 'reads_locked': 0}
+        lock = threading.Lock()
+        done = threading.Event()
+        start = threading.Barrier(len(delivery_ids) + readers + 1)
+
+        def drive(delivery_id):
+            try:
+                start.wait()
+                for step in range(updates):
+                    update = {'delivery_id': delivery_id, 'status': STATUSES[step % 2], 'notes': f'Update {step}'}
+                    began = time.perf_counter()
+                    while True:
+                        try:
+                            services.update_statuses([update])
+                            break
+                        except OperationalError:
+                            # "database is locked": what a client would see and retry
+                            with lock:
+                                counts['locked'] += 1
+                            time.sleep(0.001)
+                    with lock:
+                        latencies.append(time.perf_counter() - began)
+            finally:
+                connection.close()
+
+        def read():
+            try:
+                start.wait()
+                while not done.is_set():
+                    try:
+                        list(Delivery.objects.order_by('-delivery_date', '-delivery_time', '-pk')[:50])
+                        key = 'reads'
+                    except OperationalError:
+                        key = 'reads_locked'
+                    with lock:
+                        counts[key] += 1
+            finally:
+                connection.close()
+
+        drivers = [threading.Thread(target=drive, args=(delivery_id,)) for delivery_id in delivery_ids]
+        threads = drivers + [threading.Thread(target=read) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in drivers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in threads:
+            thread.join()
+        return dict(counts, latencies=latencies, elapsed=elapsed)
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.base import perf
+from apps.base.benchmarks import SEED_PROFILES, scratch_database, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests every API GET endpoint against a seeded dataset and checks the '
+        'number of SQL queries against the committed budgets. '
+        'Runs against a throwaway database, the configured one is never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', choices=sorted(SEED_PROFILES), action='append',
+            help='Dataset profile to run (repeatable, default: all)'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Record the measured query counts as the new budgets'
+        )
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or sorted(SEED_PROFILES)
+        baseline = perf.load_baseline()
+        failed = False
+
+        for profile in profiles:
+            with scratch_database():
+                dataset = seed_dataset(**SEED_PROFILES[profile])
+                measurements = perf.run(dataset['user'], {'today': dataset['today'].isoformat()})
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Profile {profile}'))
+            for m in measurements:
+                outcome = m.error or f'HTTP {m.status}'
+                self.stdout.write(
+                    f'  {m.path:<40} queries={m.queries:<5} {m.elapsed * 1000:9.1f} ms '
+                    f'{m.size:>10,} B  {outcome}'
+                )
+
+            if options['update_baseline']:
+                baseline['profiles'][profile] = {m.path: m.as_budget() for m in measurements}
+                continue
+
+            failures, notes = perf.compare(measurements, baseline['profiles'].get(profile, {}))
+            for note in notes:
+                self.stdout.write(self.style.WARNING(f'  {note}'))
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f'  {failure}'))
+            failed = failed or bool(failures)
+
+        if options['update_baseline']:
+            perf.save_baseline(baseline)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {perf.BASELINE_PATH}'))
+        elif failed:
+            raise CommandError('Query budgets exceeded, see above')
+        else:
+            self.stdout.write(self.style.SUCCESS('All endpoints within their query budgets'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from apps.dashboard.scheduler import start_stats_scheduler, stop_stats_scheduler
+from apps.inventory.ledger import start_snapshot_scheduler, stop_snapshot_scheduler
+
+# (start, stop) of every in-process periodic job; each start returns the
+# running task, or None when its interval setting disables it
+SCHEDULERS = [
+    (start_stats_scheduler, stop_stats_scheduler),
+    (start_snapshot_scheduler, stop_snapshot_scheduler),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the periodic jobs enabled in settings (dashboard stats refresh, '
+        'inventory snapshots) until interrupted. Run it as one dedicated process; '
+        'the jobs are never started at app load, so web workers and other '
+        'commands leave them alone.'
+    )
+
+    def handle(self, *args, **options):
+        tasks = {}
+        try:
+            for start, stop in SCHEDULERS:
+                task = start()
+                if task is not None:
+                    tasks[task] = stop
+            if not tasks:
+                self.stdout.write(self.style.WARNING('No periodic jobs enabled in settings'))
+                return
+            self.stdout.write(f"Running {', '.join(task.name for task in tasks)}")
+            while any(task.is_alive() for task in tasks):
+                for task in tasks:
+                    task.join(timeout=1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for stop in tasks.values():
+                stop()
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+# journal_mode is stored in the database file, so it is set once here rather
+# than on every connection. It cannot change inside a transaction.
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={mode}')
+    return run
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = []
+
+    operations = [
+        # WAL lets reads run alongside the writer
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE')),
+    ]
@@ -0,0 +1,173 @@
+# apps/base/pagination.py
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Offset pagination reads and throws away every row before the page, so
+page 1000 costs a thousand pages. Here a page starts after the last row
+of the previous one instead: the cursor holds that row's values of the
+ordering fields and the next page is
+
+    WHERE (a, b, id) > (cursor a, cursor b, cursor id) ORDER BY a, b, id LIMIT n
+
+spelled out as ``a > x OR (a = x AND b > y) OR ...`` with a leading
+``a >= x`` so an index on the ordering fields is range-scanned from the
+cursor. Every page costs the same, however deep, and rows inserted
+while a client pages are never skipped or repeated.
+
+The ordering is the queryset's own (``order_by``, or the model's
+``Meta.ordering``), with the primary key appended as a tiebreaker, so
+each endpoint keeps the order it always had. Only plain, non-null model
+fields can be keys.
+
+Responses are ``{"next": url, "previous": url, "results": [...]}``;
+``page_size`` (or the older ``limit``) picks the page size.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    # ``limit`` is what the order list used before it was paginated
+    page_size_query_params = ('page_size', 'limit')
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+        reverse = False
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.after(values, reverse))
+
+        # Previous pages are read backwards from the cursor, then flipped
+        ordering = [('-' if descending != reverse else '') + name for name, _, descending in self.keys]
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, bool(cursor)
+        self.rows = rows
+        return rows
+
+    def get_page_size(self, request):
+        for param in self.page_size_query_params:
+            try:
+                size = int(request.query_params[param])
+            except (KeyError, ValueError):
+                continue
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    def get_keys(self, queryset):
+        """``[(name, field, descending)]`` for the queryset's ordering, ending with the pk."""
+        opts = queryset.model._meta
+        if queryset.query.order_by:
+            ordering = queryset.query.order_by
+        elif queryset.query.default_ordering and opts.ordering:
+            ordering = opts.ordering
+        else:
+            ordering = ()
+
+        keys = []
+        for term in ordering:
+            if not isinstance(term, str) or term == '?':
+                raise ImproperlyConfigured(f'Cannot paginate {opts.label} by {term!r}')
+            name = term.lstrip('-')
+            try:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f'Cannot paginate {opts.label} by {term!r}')
+            if field.null or not field.concrete or field.many_to_many or field.one_to_many:
+                raise ImproperlyConfigured(f'Cannot paginate {opts.label} by {term!r}')
+            keys.append((field.attname, field, term.startswith('-')))
+            if field.primary_key or field.unique:
+                return keys
+        # The primary key breaks ties, in the direction of the first key
+        return keys + [(opts.pk.attname, opts.pk, keys[0][2] if keys else False)]
+
+    def after(self, values, reverse):
+        """Rows strictly after the cursor ``values`` in the page direction."""
+        lookups = [
+            ('lt' if descending != reverse else 'gt', name, value)
+            for (name, _, descending), value in zip(self.keys, values)
+        ]
+        condition = Q()
+        equal = Q()
+        for lookup, name, value in lookups:
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # Bounds the index scan on the first key; the OR alone may not
+        lookup, name, value = lookups[0]
+        return Q(**{f'{name}__{lookup}e': value}) & condition
+
+    def encode_cursor(self, row, reverse):
+        payload = {'v': [field.value_to_string(row) for _, field, _ in self.keys]}
+        if reverse:
+            payload['r'] = 1
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            raw = payload['v']
+            if not isinstance(raw, list) or len(raw) != len(self.keys):
+                raise ValueError('cursor does not match the ordering')
+            values = [field.to_python(value) for (_, field, _), value in zip(self.keys, raw)]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def get_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        # Links carry the page size under one name
+        for param in self.page_size_query_params[1:]:
+            url = remove_query_param(url, param)
+        if self.page_size != type(self).page_size:
+            url = replace_query_param(url, self.page_size_query_params[0], self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.get_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.rows:
+            return None
+        return self.get_link(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,206 @@
+"""
+Endpoint performance harness.
+
+Discovers every DRF GET endpoint under ``api/``, requests each one against
+a seeded dataset and records the number of SQL queries, wall time and
+response size. Query counts are compared with the budgets committed in
+``perf_budgets.json`` so N+1 regressions fail loudly; timings and sizes
+are reported but never enforced since they depend on the machine.
+"""
+import json
+import logging
+import re
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIClient
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'perf_budgets.json'
+
+# Query parameters required by endpoints that reject bare requests
+ENDPOINT_PARAMS = {
+    'api/deliveries/deliveries/routes/': {'delivery_date': '{today}'},
+    'api/deliveries/delivery-routes/': {'delivery_date': '{today}'},
+    'api/orders/orders/export_pdf/': {'delivery_day': 'Monday', 'limit': '20'},
+    'api/stores/nearby/': {'lat': '14.65', 'lng': '121.05', 'radius': '5'},
+    'api/stores/within/': {'bbox': '121.0,14.6,121.1,14.7'},
+}
+
+_PARAM_PATTERN = re.compile(r'\(\?P<(\w+)>[^)]*\)|<(?:\w+:)?(\w+)>')
+
+
+@dataclass
+class Endpoint:
+    path: str
+    view_class: type
+    params: list = field(default_factory=list)
+
+
+@dataclass
+class Measurement:
+    path: str
+    status: int = None
+    queries: int = 0
+    elapsed: float = 0.0
+    size: int = 0
+    error: str = None
+
+    def as_budget(self):
+        if self.error:
+            return {'error': self.error}
+        return {'queries': self.queries, 'status': self.status}
+
+
+def _normalize(pattern):
+    """Render a URL pattern as a readable path with ``<name>`` placeholders."""
+    path = str(pattern).lstrip('^').rstrip('$')
+    return _PARAM_PATTERN.sub(lambda match: f'<{match.group(1) or match.group(2)}>', path)
+
+
+def _is_get_endpoint(callback):
+    view_class = getattr(callback, 'cls', None)
+    if view_class is None:
+        return False
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return 'get' in actions
+    return 'get' in view_class.http_method_names and hasattr(view_class, 'get')
+
+
+def discover_endpoints(prefix='api/', resolver=None):
+    """List the DRF GET endpoints under ``prefix`` in resolution order."""
+    endpoints = {}
+
+    def walk(patterns, base):
+        for entry in patterns:
+            if isinstance(entry, URLResolver):
+                walk(entry.url_patterns, base + _normalize(entry.pattern))
+            elif isinstance(entry, URLPattern):
+                path = base + _normalize(entry.pattern)
+                params = re.findall(r'<(\w+)>', path)
+                # Format suffix variants duplicate the plain endpoints
+                if 'format' in params or not path.startswith(prefix) or path in endpoints:
+                    continue
+                if _is_get_endpoint(entry.callback):
+                    endpoints[path] = Endpoint(path, entry.callback.cls, params)
+
+    walk((resolver or get_resolver()).url_patterns, '')
+    return list(endpoints.values())
+
+
+def _sample_pk(view_class):
+    queryset = getattr(view_class, 'queryset', None)
+    if queryset is None:
+        return None
+    return queryset.model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+
+
+def measure_endpoint(client, endpoint, context):
+    """Request one endpoint and capture its query count, timing and size."""
+    result = Measurement(endpoint.path)
+    url = '/' + endpoint.path
+    for name in endpoint.params:
+        if name != 'pk':
+            result.error = f'No sample value for <{name}>'
+            return result
+        pk = _sample_pk(endpoint.view_class)
+        if pk is None:
+            result.error = 'No sample object for <pk>'
+            return result
+        url = url.replace('<pk>', str(pk))
+
+    params = {
+        key: value.format(**context)
+        for key, value in ENDPOINT_PARAMS.get(endpoint.path, {}).items()
+    }
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        try:
+            response = client.get(url, params)
+        except Exception as exc:
+            result.error = f'{type(exc).__name__}: {exc}'[:200]
+        result.elapsed = time.perf_counter() - started
+    result.queries = len(ctx.captured_queries)
+    if result.error:
+        return result
+
+    result.status = response.status_code
+    if getattr(response, 'streaming', False):
+        result.size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        result.size = len(response.content)
+    if response.status_code >= 500:
+        result.error = f'HTTP {response.status_code}'
+    return result
+
+
+def run(user, context, endpoints=None):
+    """Measure every endpoint as ``user``. Returns a list of Measurements."""
+    client = APIClient()
+    client.force_authenticate(user)
+    hosts = list(settings.ALLOWED_HOSTS) + ['testserver']
+    # Failing endpoints are recorded, not logged with a full traceback each
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        # Files rendered while measuring (receipts) go to a throwaway cache
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                override_settings(ALLOWED_HOSTS=hosts, RECEIPT_CACHE_DIR=cache_dir):
+            return [
+                measure_endpoint(client, endpoint, context)
+                for endpoint in (endpoints if endpoints is not None else discover_endpoints())
+            ]
+    finally:
+        request_logger.setLevel(level)
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not Path(path).exists():
+        return {'profiles': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(baseline, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(measurements, budgets):
+    """
+    Check measurements against one profile's budgets.
+
+    Returns ``(failures, notes)``: failures are regressions (more queries
+    than budgeted, a newly failing endpoint, an endpoint without a budget);
+    notes are improvements that call for ``--update-baseline``.
+    """
+    failures = []
+    notes = []
+    for measurement in measurements:
+        budget = budgets.get(measurement.path)
+        if budget is None:
+            failures.append(f'{measurement.path}: no budget recorded')
+        elif measurement.error:
+            if 'error' not in budget:
+                failures.append(f'{measurement.path}: {measurement.error}')
+        elif 'error' in budget:
+            notes.append(f'{measurement.path}: no longer fails ({measurement.queries} queries)')
+        elif measurement.queries > budget['queries']:
+            failures.append(
+                f'{measurement.path}: {measurement.queries} queries, budget is {budget["queries"]}'
+            )
+        elif measurement.queries < budget['queries']:
+            notes.append(
+                f'{measurement.path}: {measurement.queries} queries, under budget of {budget["queries"]}'
+            )
+    measured = {measurement.path for measurement in measurements}
+    notes.extend(f'{path}: endpoint no longer exists' for path in budgets if path not in measured)
+    return failures, notes
@@ -0,0 +1,38 @@
+"""
+Periodic background jobs.
+
+Each app that needs an in-process job (stats refreshes, buffer flushes,
+snapshots) starts its own ``PeriodicTask``, enabled by a setting giving
+the interval in seconds. Nothing starts at app load, which also runs for
+migrations, tests and every other command: scheduled jobs are started by
+the ``run_schedulers`` command, buffer flushes by the first buffered write.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask(threading.Thread):
+    """Daemon thread running ``func`` every ``interval`` seconds until stopped."""
+
+    def __init__(self, func, interval, name=None):
+        super().__init__(name=name or func.__name__, daemon=True)
+        self.func = func
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.func()
+            except Exception:
+                logger.exception('Periodic task %s failed', self.name)
+            finally:
+                close_old_connections()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
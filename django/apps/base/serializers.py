@@ -0,0 +1,88 @@
+# apps/base/serializers.py
+from django.core.exceptions import ValidationError
+from rest_framework import serializers
+
+
+def requested_fields(request):
+    """
+    Parse the ``?fields=a,b`` query parameter.
+
+    Returns a set of field names, or None when the client did not ask for a
+    sparse fieldset.
+    """
+    if request is None:
+        return None
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin adding ``?fields=`` support and field-driven eager loading.
+
+    Only the top-level serializer is trimmed; write-only fields are always
+    kept so the same serializer still validates input. Subclasses describe
+    which relations each field reads with ``select_related_fields`` and
+    ``prefetch_related_fields`` (field name -> list of lookups), and views
+    call ``setup_eager_loading`` so only the relations that will actually
+    be rendered are loaded.
+    """
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is None:
+            return
+        for name, field in list(self.fields.items()):
+            if name not in fields and not field.write_only:
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """Apply select/prefetch related for ``fields`` (all fields when None)."""
+        select = [
+            lookup
+            for name, lookups in cls.select_related_fields.items()
+            if fields is None or name in fields
+            for lookup in lookups
+        ]
+        prefetch = [
+            lookup
+            for name, lookups in cls.prefetch_related_fields.items()
+            if fields is None or name in fields
+            for lookup in lookups
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that can resolve from objects loaded up front.
+
+    Batch endpoints put ``{Model: Model.objects.in_bulk(ids)}`` in the
+    serializer context under ``'preloaded'`` so validating many rows costs
+    one query instead of one per row. Falls back to a normal lookup.
+    """
+
+    def to_internal_value(self, data):
+        queryset = self.get_queryset()
+        preloaded = self.context.get('preloaded', {}).get(queryset.model)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = queryset.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, ValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return preloaded[pk]
@@ -1,3 +1,272 @@
-from django.test import TestCase
+import io
+import tempfile
+import threading
+from datetime import timedelta
+from importlib import import_module
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.base import perf
+from apps.base.benchmarks import SEED_PROFILES, seed_dataset
+from apps.base.management.commands import run_schedulers
+from apps.base.pagination import KeysetPagination
+from apps.base.scheduler import PeriodicTask
+from apps.orders.models import Order
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class EndpointQueryBudgetTests(TestCase):
+    """Every API GET endpoint stays within its committed query budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset(**SEED_PROFILES['test'])
+
+    def test_discovers_detail_and_action_endpoints(self):
+        paths = {endpoint.path for endpoint in perf.discover_endpoints()}
+        self.assertIn('api/orders/orders/', paths)
+        self.assertIn('api/orders/orders/<pk>/', paths)
+        self.assertIn('api/dashboard/summary/', paths)
+        self.assertFalse(any('format' in path for path in paths))
+        self.assertFalse(any(path.startswith('api/token/') for path in paths))
+
+    def test_query_budgets(self):
+        measurements = perf.run(self.dataset['user'], {'today': self.dataset['today'].isoformat()})
+        budgets = perf.load_baseline()['profiles']['test']
+        failures, _notes = perf.compare(measurements, budgets)
+        self.assertEqual(failures, [], 'Run `manage.py perf_check` for details')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection settings')
+class SQLiteConnectionTests(TestCase):
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_migration_switches_file_to_wal(self):
+        migration = import_module('apps.base.migrations.0001_sqlite_wal')
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = connections['default'].__class__(dict(connection.settings_dict, NAME=str(Path(directory) / 'wal.sqlite3')))
+            try:
+                migration.set_journal_mode('WAL')(None, SimpleNamespace(connection=wrapper))
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+            finally:
+                wrapper.close()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pages', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(name='Store', owner_name='Owner', address='-', contact='-')
+        Order.objects.bulk_create([
+            Order(order_id=f'K{i:011d}', store=store, created_by=self.user) for i in range(10)
+        ])
+        # Ties on created_at are broken by id
+        now = timezone.now()
+        for offset, pks in enumerate([[1, 2, 3, 4], [5, 6], [7, 8, 9, 10]]):
+            Order.objects.filter(order_id__in=[f'K{pk - 1:011d}' for pk in pks]).update(
+                created_at=now - timedelta(minutes=offset)
+            )
+        self.expected = list(Order.objects.order_by('-created_at', '-id').values_list('order_id', flat=True))
+
+    def walk(self, url, params):
+        seen = []
+        pages = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(order['order_id'] for order in response.data['results'])
+            url, params = response.data['next'], None
+        return seen, pages
+
+    def test_pages_follow_the_ordering_without_gaps(self):
+        seen, pages = self.walk('/api/orders/orders/', {'page_size': 3, 'fields': 'order_id'})
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 3, 1])
+        self.assertIsNone(pages[0]['previous'])
+
+        # And back again from the last page
+        seen = []
+        url = pages[-1]['previous']
+        while url:
+            response = self.client.get(url)
+            seen[:0] = [order['order_id'] for order in response.data['results']]
+            url = response.data['previous']
+        self.assertEqual(seen, self.expected[:9])
+
+    def test_limit_is_a_page_size(self):
+        response = self.client.get('/api/orders/orders/', {'limit': 4, 'fields': 'order_id'})
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIn('page_size=4', response.data['next'])
+        self.assertNotIn('limit', response.data['next'])
+
+    def test_deep_pages_cost_the_same(self):
+        response = self.client.get('/api/orders/orders/', {'page_size': 1, 'fields': 'order_id'})
+        for _ in range(8):
+            response = self.client.get(response.data['next'])
+        with CaptureQueriesContext(connection) as deep:
+            response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['order_id'], self.expected[9])
+        self.assertEqual(len(deep), 1)
+        self.assertIn('LIMIT 2', deep[0]['sql'])
+        self.assertNotIn('OFFSET', deep[0]['sql'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('nonsense', 'eyJ2IjpbXX0'):
+            response = self.client.get('/api/orders/orders/', {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text is SQLite specific')
+    def test_page_reads_the_composite_index(self):
+        order = Order.objects.order_by('-created_at', '-id')[4]
+        pagination = KeysetPagination()
+        pagination.keys = pagination.get_keys(Order.objects.all())
+        plan = (
+            Order.objects.filter(pagination.after([order.created_at, order.pk], reverse=False))
+            .order_by('-created_at', '-id')[:50]
+            .explain()
+        )
+        self.assertIn('order_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Plan text is SQLite specific')
+class HotPathIndexTests(TestCase):
+    """The list queries behind the common filters are answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_dataset(**SEED_PROFILES['test'])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.dataset['user'])
+
+    def plan(self, path, params, table):
+        """EXPLAIN QUERY PLAN of the request's query on ``table``."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = next(query['sql'] for query in queries if f'FROM "{table}"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, plan, index):
+        self.assertIn(f'INDEX {index}', plan)
+        # Rows come out of the index in page order, not through a sort
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_order_list(self):
+        today = self.dataset['today'].isoformat()
+        store = Store.objects.order_by('pk').first()
+        for params, index in [
+            ({'start_date': today}, 'order_created_idx'),
+            ({'status': 'Pending'}, 'order_status_created_idx'),
+            ({'store_id': store.pk, 'start_date': today, 'end_date': today}, 'order_store_created_idx'),
+        ]:
+            with self.subTest(**params):
+                plan = self.plan('/api/orders/orders/', {'fields': 'id', **params}, 'orders_order')
+                self.assertUsesIndex(plan, index)
+
+    def test_delivery_list(self):
+        today = self.dataset['today'].isoformat()
+        for params, index in [
+            ({'status': 'pending'}, 'delivery_status_schedule_idx'),
+            ({'employee_id': self.dataset['user'].pk, 'start_date': today}, 'delivery_employee_schedule_idx'),
+        ]:
+            with self.subTest(**params):
+                plan = self.plan('/api/deliveries/deliveries/', {'fields': 'id', **params}, 'deliveries_delivery')
+                self.assertUsesIndex(plan, index)
+
+    def test_product_list(self):
+        plan = self.plan('/api/products/', {'is_archived': 'false'}, 'products_product')
+        self.assertUsesIndex(plan, 'product_active_name_idx')
+
+    def test_store_list(self):
+        for params, index in [
+            ({'is_archived': 'false'}, 'store_current_name_idx'),
+            ({'is_archived': 'false', 'status': 'Active'}, 'store_current_status_idx'),
+        ]:
+            with self.subTest(**params):
+                self.assertUsesIndex(self.plan('/api/stores/', params, 'stores_store'), index)
+
+
+class PeriodicTaskTests(TestCase):
+    def test_runs_until_stopped(self):
+        calls = []
+        ran_twice = threading.Event()
+
+        def job():
+            calls.append(1)
+            if len(calls) == 2:
+                ran_twice.set()
+
+        task = PeriodicTask(job, interval=0.01)
+        task.start()
+        self.assertTrue(ran_twice.wait(timeout=5))
+        task.stop()
+        task.join(timeout=5)
+        self.assertFalse(task.is_alive())
+
+    def test_failures_do_not_stop_the_schedule(self):
+        ran_again = threading.Event()
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError('boom')
+            ran_again.set()
+
+        task = PeriodicTask(flaky, interval=0.01)
+        with self.assertLogs('apps.base.scheduler', level='ERROR'):
+            task.start()
+            self.assertTrue(ran_again.wait(timeout=5))
+        task.stop()
+        task.join(timeout=5)
+
+    @override_settings(DASHBOARD_STATS_REFRESH_INTERVAL=3600, INVENTORY_SNAPSHOT_INTERVAL=3600)
+    def test_jobs_do_not_start_at_app_load(self):
+        django_apps.get_app_config('dashboard').ready()
+        django_apps.get_app_config('inventory').ready()
+        names = [thread.name for thread in threading.enumerate()]
+        self.assertNotIn('dashboard-stats-refresh', names)
+        self.assertNotIn('inventory-snapshots', names)
+
+    def test_run_schedulers_runs_enabled_jobs_until_they_stop(self):
+        stopped = []
+
+        def start():
+            task = PeriodicTask(lambda: task.stop(), interval=0.01, name='once')
+            task.start()
+            return task
+
+        schedulers = [(start, lambda: stopped.append('once')), (lambda: None, lambda: stopped.append('disabled'))]
+        out = io.StringIO()
+        with mock.patch.object(run_schedulers, 'SCHEDULERS', schedulers):
+            call_command('run_schedulers', stdout=out)
+        self.assertIn('Running once', out.getvalue())
+        self.assertEqual(stopped, ['once'])
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DashboardStat, RecentActivity
+from .models import DailySalesRollup, DashboardStat, RecentActivity
 
 
 @admin.register(DashboardStat)
@@ -16,3 +16,11 @@ class RecentActivityAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description', 'reference_id')
     readonly_fields = ('created_at',)
 
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'store', 'product', 'quantity', 'revenue', 'order_count')
+    list_filter = ('date',)
+    search_fields = ('store__name', 'product__name')
+    readonly_fields = ('updated_at',)
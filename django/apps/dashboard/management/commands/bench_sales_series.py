@@ -0,0 +1,133 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.base.benchmarks import explicit_timestamps, scratch_database
+from apps.dashboard import rollups
+from apps.dashboard.timeseries import aggregate_series, bucket_keys, next_bucket, sales_series, _as_datetime
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.stores.models import Store
+
+PRESETS = {
+    'week': ('day', 6),
+    'month': ('day', 29),
+    'year': ('month', 365),
+}
+
+
+def per_bucket_series(start, end, granularity):
+    """The previous implementation: one aggregate query per bucket."""
+    series = []
+    for key in bucket_keys(start, end, granularity):
+        total = Order.objects.filter(
+            created_at__gte=_as_datetime(key),
+            created_at__lt=_as_datetime(next_bucket(key, granularity)),
+        ).aggregate(total=Sum('subtotal'))['total'] or 0
+        series.append((key, total))
+    return series
+
+
+def grouped_order_series(start, end, granularity):
+    """One grouped query, but still scanning the order table."""
+    return aggregate_series(Order.objects.all(), 'created_at', 'subtotal', start, end, granularity)
+
+
+STRATEGIES = (
+    ('per-bucket', per_bucket_series),
+    ('grouped', grouped_order_series),
+    ('rollup', sales_series),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the sales chart series (per-bucket queries, one grouped order '
+        'query, and the daily rollup) against seeded order volumes. '
+        'Runs against a throwaway database, the configured one is never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+            help='Order volumes to benchmark (cumulative, ascending)'
+        )
+        parser.add_argument('--days', type=int, default=400, help='Spread seeded orders over this many days')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, best is reported')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        with scratch_database():
+            store = Store.objects.create(
+                name='Benchmark Store', owner_name='Benchmark', address='-', contact='-'
+            )
+            products = Product.objects.bulk_create([
+                Product(product_id=f'BENCH-{i}', name=f'Benchmark {i}', price=Decimal('10.00'))
+                for i in range(20)
+            ])
+            seeded = 0
+            for size in sorted(options['sizes']):
+                started = time.perf_counter()
+                self._seed(store, products, seeded, size, options['days'], rng)
+                rollups.rebuild()
+                self.stdout.write(
+                    f'Seeded {size:,} orders and rebuilt the rollup ({time.perf_counter() - started:.1f}s)'
+                )
+                seeded = size
+
+                for period, (granularity, days) in PRESETS.items():
+                    end = timezone.localdate()
+                    start = end - timedelta(days=days)
+                    for name, fn in STRATEGIES:
+                        queries, elapsed = self._measure(fn, start, end, granularity, options['repeat'])
+                        self.stdout.write(
+                            f'  {period:<5} {name:<10} queries={queries:<3} {elapsed * 1000:9.1f} ms'
+                        )
+
+    def _seed(self, store, products, first, last, days, rng):
+        now = timezone.now()
+        for offset in range(first, last, 5000):
+            orders = []
+            items = []
+            with explicit_timestamps(Order):
+                for i in range(offset, min(offset + 5000, last)):
+                    quantity = rng.randint(1, 24)
+                    subtotal = Decimal('10.00') * quantity
+                    tax = subtotal * Decimal('0.02')
+                    order = Order(
+                        order_id=f'B{i:011d}',
+                        store=store,
+                        subtotal=subtotal,
+                        tax=tax,
+                        total=subtotal + tax,
+                        created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+                    )
+                    orders.append(order)
+                    items.append(OrderItem(
+                        order=order,
+                        product=rng.choice(products),
+                        quantity=quantity,
+                        unit_price=Decimal('10.00'),
+                        total=subtotal,
+                    ))
+                Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items)
+
+    def _measure(self, fn, start, end, granularity, repeat):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                fn(start, end, granularity)
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return len(ctx.captured_queries), best
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.dashboard import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily sales rollup from order items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD), defaults to the beginning')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD), defaults to today')
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'])
+        end = self._parse(options['end'])
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        written = rollups.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily sales rollup rows'))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Invalid date: {value}')
+        return parsed
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.dashboard.summary import refresh_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the precomputed dashboard statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Keep running and refresh every N seconds (default: refresh once and exit)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            stats = refresh_stats()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {len(stats)} dashboard statistics'))
+            if interval <= 0:
+                break
+            close_old_connections()
+            time.sleep(interval)
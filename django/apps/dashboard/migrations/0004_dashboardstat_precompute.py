@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dashboardstat',
+            name='stat_type',
+            field=models.CharField(choices=[('sales', 'Sales'), ('orders', 'Orders'), ('deliveries', 'Deliveries'), ('customers', 'Customers'), ('products', 'Products'), ('inventory', 'Inventory'), ('pending_deliveries', 'Pending Deliveries'), ('low_stock', 'Low Stock')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='dashboardstat',
+            index=models.Index(fields=['is_active', 'stat_type', 'period'], name='dashboardstat_active_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardstat',
+            constraint=models.UniqueConstraint(fields=('stat_type', 'period'), name='unique_dashboard_stat'),
+        ),
+    ]
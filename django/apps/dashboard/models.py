@@ -13,6 +13,8 @@ class DashboardStat(TimeStampedModel):
         ('customers', 'Customers'),
         ('products', 'Products'),
         ('inventory', 'Inventory'),
+        ('pending_deliveries', 'Pending Deliveries'),
+        ('low_stock', 'Low Stock'),
     )
     PERIOD_TYPES = (
         ('daily', 'Daily'),
@@ -33,16 +35,24 @@ class DashboardStat(TimeStampedModel):
         verbose_name = 'Dashboard Statistic'
         verbose_name_plural = 'Dashboard Statistics'
         ordering = ['stat_type', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['stat_type', 'period'], name='unique_dashboard_stat'),
+        ]
+        indexes = [
+            models.Index(fields=['is_active', 'stat_type', 'period'], name='dashboardstat_active_idx'),
+        ]
         
     def __str__(self):
         return f"{self.title} ({self.period})"
     
-    def save(self, *args, **kwargs):
-        # Calculate percentage change
+    def calculate_percentage_change(self):
         if self.previous_value and self.previous_value != 0:
             self.percentage_change = ((self.current_value - self.previous_value) / self.previous_value) * 100
         else:
             self.percentage_change = 0
+
+    def save(self, *args, **kwargs):
+        self.calculate_percentage_change()
         super().save(*args, **kwargs)
 
 
@@ -73,3 +83,33 @@ class RecentActivity(TimeStampedModel):
     def __str__(self):
         return f"{self.activity_type}: {self.title}"
 
+
+
+class DailySalesRollup(models.Model):
+    """
+    Pre-aggregated sales per store, product and day.
+
+    Maintained incrementally from order writes (see ``apps.dashboard.rollups``)
+    so charts and summaries never rescan the order history.
+    """
+    store = models.ForeignKey('stores.Store', on_delete=models.CASCADE, related_name='daily_sales')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Daily Sales Rollup'
+        verbose_name_plural = 'Daily Sales Rollups'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'product', 'date'], name='unique_daily_sales_cell'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='dailysales_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.store} - {self.product} ({self.date})"
@@ -0,0 +1,157 @@
+"""
+Maintenance of the DailySalesRollup table.
+
+Each (store, product, day) cell is recomputed from its order items whenever
+an item or its order's status changes. The recompute is bounded by the
+size of that one cell, so writes stay cheap no matter how large the order
+history grows. ``rebuild`` regenerates the table from scratch.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.base.dates import day_bounds
+from apps.orders.models import OrderItem
+from .models import DailySalesRollup
+
+# Orders in these statuses do not count towards sales
+EXCLUDED_STATUSES = ('Cancelled',)
+
+
+def order_day(order):
+    """The local calendar day an order is attributed to."""
+    return timezone.localtime(order.created_at).date()
+
+
+def _sales_items():
+    return OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)
+
+
+def refresh_cells(store_id, day, product_ids=None):
+    """
+    Recompute the rollup cells of one store and day.
+
+    When ``product_ids`` is given only those cells are touched, otherwise
+    every product sold by the store that day is refreshed.
+    """
+    refresh_day(day, [store_id], product_ids)
+
+
+def refresh_day(day, store_ids, product_ids=None):
+    """
+    Recompute the rollup cells of several stores for one day.
+
+    Every (store, product) cell in ``store_ids`` x ``product_ids`` is
+    recomputed with one grouped query, which lets bulk order paths refresh a
+    whole batch at once instead of store by store.
+    """
+    store_ids = set(store_ids)
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+    if not store_ids:
+        return
+
+    start, end = day_bounds(day)
+    items = _sales_items().filter(
+        order__store_id__in=store_ids,
+        order__created_at__gte=start,
+        order__created_at__lt=end,
+    )
+    cells = DailySalesRollup.objects.filter(store_id__in=store_ids, date=day)
+    if product_ids is not None:
+        items = items.filter(product_id__in=product_ids)
+        cells = cells.filter(product_id__in=product_ids)
+
+    rows = (
+        items.values('order__store_id', 'product_id')
+        .annotate(
+            quantity_total=Sum('quantity'),
+            revenue_total=Sum('total'),
+            orders=Count('order_id', distinct=True),
+        )
+        .order_by()
+    )
+    rollups = [
+        DailySalesRollup(
+            store_id=row['order__store_id'],
+            product_id=row['product_id'],
+            date=day,
+            quantity=row['quantity_total'],
+            revenue=row['revenue_total'],
+            order_count=row['orders'],
+        )
+        for row in rows
+    ]
+    fresh = {(rollup.store_id, rollup.product_id) for rollup in rollups}
+
+    with transaction.atomic():
+        stale = [
+            pk for pk, store_id, product_id in cells.values_list('pk', 'store_id', 'product_id')
+            if (store_id, product_id) not in fresh
+        ]
+        if stale:
+            DailySalesRollup.objects.filter(pk__in=stale).delete()
+        if rollups:
+            DailySalesRollup.objects.bulk_create(
+                rollups,
+                update_conflicts=True,
+                unique_fields=['store', 'product', 'date'],
+                update_fields=['quantity', 'revenue', 'order_count', 'updated_at'],
+            )
+
+
+def refresh_order(order, store_id=None):
+    """Refresh every cell an order contributes to (optionally under a previous store)."""
+    product_ids = set(order.items.values_list('product_id', flat=True))
+    refresh_cells(store_id or order.store_id, order_day(order), product_ids)
+
+
+def rebuild(start=None, end=None):
+    """
+    Regenerate the rollup from order items, optionally limited to a date range.
+
+    Returns the number of cells written.
+    """
+    cells = DailySalesRollup.objects.all()
+    items = _sales_items()
+    if start:
+        cells = cells.filter(date__gte=start)
+        items = items.filter(order__created_at__gte=day_bounds(start)[0])
+    if end:
+        cells = cells.filter(date__lte=end)
+        items = items.filter(order__created_at__lt=day_bounds(end)[1])
+
+    rows = (
+        items.annotate(day=TruncDate('order__created_at'))
+        .values('order__store_id', 'product_id', 'day')
+        .annotate(
+            quantity_total=Sum('quantity'),
+            revenue_total=Sum('total'),
+            orders=Count('order_id', distinct=True),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        cells.delete()
+        batch = []
+        written = 0
+        for row in rows.iterator(chunk_size=5000):
+            batch.append(DailySalesRollup(
+                store_id=row['order__store_id'],
+                product_id=row['product_id'],
+                date=row['day'],
+                quantity=row['quantity_total'],
+                revenue=row['revenue_total'],
+                order_count=row['orders'],
+            ))
+            if len(batch) == 5000:
+                DailySalesRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailySalesRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
@@ -0,0 +1,47 @@
+"""
+In-process periodic scheduler for dashboard precompute jobs.
+
+Enabled by setting ``DASHBOARD_STATS_REFRESH_INTERVAL`` to a positive
+number of seconds and started by the ``run_schedulers`` command, never at
+app load. Each process runs at most one scheduler thread; the refresh is
+an idempotent upsert, so several running at once is harmless.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+from apps.base.scheduler import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_lock = threading.Lock()
+
+
+def refresh_dashboard_stats():
+    from .summary import refresh_stats
+    refresh_stats()
+
+
+def start_stats_scheduler():
+    """Start the stats refresh thread if configured. Returns the running task or None."""
+    global _scheduler
+    interval = getattr(settings, 'DASHBOARD_STATS_REFRESH_INTERVAL', 0)
+    if interval <= 0:
+        return None
+
+    with _lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = PeriodicTask(refresh_dashboard_stats, interval, name='dashboard-stats-refresh')
+            _scheduler.start()
+            logger.info('Dashboard stats scheduler started (every %ss)', interval)
+    return _scheduler
+
+
+def stop_stats_scheduler():
+    global _scheduler
+    with _lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler = None
@@ -1,9 +1,16 @@
-from django.db.models.signals import post_save
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
-from apps.orders.models import Order
+from apps.orders.models import Order, OrderItem
+from apps.orders.signals import order_items_bulk_saved
 from apps.deliveries.models import Delivery
-from apps.inventory.models import InventoryTransaction
+from apps.deliveries.signals import delivery_statuses_bulk_updated
+from apps.inventory.models import Inventory, InventoryTransaction
+from apps.inventory.signals import low_stock_crossed, stock_adjusted
+from apps.products.models import Product
 from .models import RecentActivity
+from . import rollups
 
 
 @receiver(post_save, sender=Order)
@@ -15,7 +22,7 @@ def create_order_activity(sender, instance, created, **kwargs):
             title=f"New order {instance.order_id}",
             description=f"New order created for {instance.store.name}",
             reference_id=instance.order_id,
-            user=instance.user
+            user=instance.created_by
         )
     elif instance.status == 'completed':
         RecentActivity.objects.create(
@@ -23,7 +30,7 @@ def create_order_activity(sender, instance, created, **kwargs):
             title=f"Order {instance.order_id} completed",
             description=f"Order for {instance.store.name} has been completed",
             reference_id=instance.order_id,
-            user=instance.user
+            user=instance.created_by
         )
 
 
@@ -38,7 +45,7 @@ def create_delivery_activity(sender, instance, created, **kwargs):
             reference_id=instance.id,
             user=instance.employee
         )
-    elif instance.status == 'delivered':
+    elif instance.status == 'delivered' and instance._status_changed:
         RecentActivity.objects.create(
             activity_type='delivery',
             title=f"Delivery {instance.id} completed",
@@ -48,6 +55,22 @@ def create_delivery_activity(sender, instance, created, **kwargs):
         )
 
 
+@receiver(delivery_statuses_bulk_updated, sender=Delivery)
+def create_bulk_delivery_activity(sender, deliveries, **kwargs):
+    """Record completion activities for deliveries delivered in a batch"""
+    RecentActivity.objects.bulk_create([
+        RecentActivity(
+            activity_type='delivery',
+            title=f"Delivery {delivery.id} completed",
+            description=f"Delivery for order {delivery.order.order_id} has been completed",
+            reference_id=delivery.id,
+            user_id=delivery.employee_id
+        )
+        for delivery in deliveries
+        if delivery.status == 'delivered'
+    ])
+
+
 @receiver(post_save, sender=InventoryTransaction)
 def create_inventory_activity(sender, instance, created, **kwargs):
     """Create activity record when an inventory transaction is created"""
@@ -61,3 +84,113 @@ def create_inventory_activity(sender, instance, created, **kwargs):
             user=instance.user
         )
 
+
+@receiver(stock_adjusted, sender=Inventory)
+def create_bulk_inventory_activity(sender, transactions, source, **kwargs):
+    """Record activities for manual stock changes; an order's own activity covers its reservations"""
+    if source == 'order':
+        return
+    if source == 'count':
+        # One entry for a whole stock take rather than one per product
+        if transactions:
+            RecentActivity.objects.create(
+                activity_type='inventory',
+                title="Stock count imported",
+                description=f"Stock corrected for {len(transactions)} products",
+                user_id=transactions[0].user_id
+            )
+        return
+    products = Product.objects.only('name').in_bulk({transaction.product_id for transaction in transactions})
+    RecentActivity.objects.bulk_create([
+        RecentActivity(
+            activity_type='inventory',
+            title=f"Inventory {transaction.transaction_type}",
+            description=(
+                f"{transaction.quantity} units of {products[transaction.product_id].name} "
+                f"{'added to' if transaction.transaction_type == InventoryTransaction.INCREASE else 'removed from'} inventory"
+            ),
+            reference_id=str(transaction.id),
+            user_id=transaction.user_id
+        )
+        for transaction in transactions
+    ])
+
+
+@receiver(low_stock_crossed)
+def create_low_stock_activity(sender, raised, **kwargs):
+    """Record an activity each time a product falls to its low-stock threshold"""
+    if not raised:
+        return
+    products = Product.objects.only('name', 'product_id').in_bulk({alert.product_id for alert in raised})
+    RecentActivity.objects.bulk_create([
+        RecentActivity(
+            activity_type='inventory',
+            title=f"Low stock: {products[alert.product_id].name}",
+            description=(
+                f"{products[alert.product_id].name} is down to {alert.stock} units "
+                f"(threshold {alert.threshold})"
+            ),
+            reference_id=products[alert.product_id].product_id,
+        )
+        for alert in raised
+    ])
+
+
+@receiver(post_init, sender=Order)
+def remember_order_rollup_state(sender, instance, **kwargs):
+    """Keep the loaded store and status so rollup refreshes only run on real changes"""
+    instance._rollup_state = (instance.__dict__.get('store_id'), instance.__dict__.get('status'))
+
+
+@receiver(post_save, sender=Order)
+def update_rollup_on_order_change(sender, instance, created, **kwargs):
+    """Refresh the sales rollup when an order changes status or store"""
+    previous_store_id, previous_status = instance._rollup_state
+    instance._rollup_state = (instance.store_id, instance.status)
+    if created or (previous_store_id, previous_status) == instance._rollup_state:
+        return
+
+    rollups.refresh_order(instance)
+    if previous_store_id and previous_store_id != instance.store_id:
+        rollups.refresh_order(instance, store_id=previous_store_id)
+
+
+@receiver(post_init, sender=OrderItem)
+def remember_item_rollup_state(sender, instance, **kwargs):
+    instance._rollup_product_id = instance.__dict__.get('product_id')
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_rollup_on_item_change(sender, instance, **kwargs):
+    """Refresh the rollup cells an order item contributes to"""
+    product_ids = {instance.product_id, instance._rollup_product_id} - {None}
+    instance._rollup_product_id = instance.product_id
+    order = instance.order
+    rollups.refresh_cells(order.store_id, rollups.order_day(order), product_ids)
+
+
+@receiver(order_items_bulk_saved, sender=Order)
+def update_dashboard_on_bulk_save(sender, orders, items, created=False, **kwargs):
+    """Record activities and refresh the rollup once per day for bulk-written orders"""
+    if created:
+        RecentActivity.objects.bulk_create([
+            RecentActivity(
+                activity_type='order',
+                title=f"New order {order.order_id}",
+                description=f"New order created for {order.store.name}",
+                reference_id=order.order_id,
+                user=order.created_by
+            )
+            for order in orders
+        ])
+
+    stores_by_day = defaultdict(set)
+    products_by_day = defaultdict(set)
+    for item in items:
+        day = rollups.order_day(item.order)
+        stores_by_day[day].add(item.order.store_id)
+        # Include the product an updated item was loaded with
+        products_by_day[day].update({item.product_id, getattr(item, '_rollup_product_id', None)} - {None})
+    for day, store_ids in stores_by_day.items():
+        rollups.refresh_day(day, store_ids, products_by_day[day])
@@ -0,0 +1,141 @@
+"""
+Dashboard summary computation and its precomputed DashboardStat form.
+
+``compute_summary`` runs the live queries. ``refresh_stats`` stores the
+result as DashboardStat rows so the summary endpoint can serve it with a
+single indexed read; ``summary_from_stats`` turns those rows back into
+the same response shape.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.base.dates import day_bounds
+from apps.deliveries.models import Delivery
+from apps.inventory.models import LOW_STOCK, Inventory
+from apps.orders.models import Order
+from .models import DailySalesRollup, DashboardStat
+
+# (stat_type, period) -> (summary section, current key, previous key, title)
+SUMMARY_STATS = {
+    ('orders', 'daily'): ('orders', 'today', 'yesterday', 'Orders today'),
+    ('sales', 'daily'): ('sales', 'today', 'yesterday', 'Sales today'),
+    ('deliveries', 'daily'): ('deliveries', 'today', 'yesterday', 'Deliveries today'),
+    ('pending_deliveries', 'daily'): ('deliveries', 'pending', None, 'Pending deliveries'),
+    ('low_stock', 'daily'): ('products', 'low_stock', None, 'Low stock products'),
+}
+
+# Sections whose values are counts rather than amounts
+COUNT_SECTIONS = ('orders', 'deliveries', 'products')
+
+
+def percentage_change(current, previous):
+    """Calculate percentage change between two values"""
+    if not previous:
+        return 0
+    return ((current - previous) / previous) * 100
+
+
+def compute_summary(today=None):
+    """Compute the dashboard summary from live data."""
+    today = today or timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    yesterday_start, today_start = day_bounds(yesterday)
+    today_end = day_bounds(today)[1]
+
+    orders = Order.objects.filter(created_at__gte=yesterday_start, created_at__lt=today_end).aggregate(
+        today=Count('id', filter=Q(created_at__gte=today_start)),
+        yesterday=Count('id', filter=Q(created_at__lt=today_start)),
+    )
+    deliveries = Delivery.objects.aggregate(
+        today=Count('id', filter=Q(delivery_date=today)),
+        yesterday=Count('id', filter=Q(delivery_date=yesterday)),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    sales = DailySalesRollup.objects.filter(date__gte=yesterday, date__lte=today).aggregate(
+        today=Sum('revenue', filter=Q(date=today)),
+        yesterday=Sum('revenue', filter=Q(date=yesterday)),
+    )
+    low_stock = Inventory.objects.filter(LOW_STOCK, product__is_active=True).count()
+
+    today_sales = sales['today'] or 0
+    yesterday_sales = sales['yesterday'] or 0
+    return {
+        'orders': {
+            'today': orders['today'],
+            'yesterday': orders['yesterday'],
+            'percentage_change': percentage_change(orders['today'], orders['yesterday']),
+        },
+        'deliveries': {
+            'today': deliveries['today'],
+            'yesterday': deliveries['yesterday'],
+            'percentage_change': percentage_change(deliveries['today'], deliveries['yesterday']),
+            'pending': deliveries['pending'],
+        },
+        'products': {
+            'low_stock': low_stock,
+        },
+        'sales': {
+            'today': today_sales,
+            'yesterday': yesterday_sales,
+            'percentage_change': percentage_change(today_sales, yesterday_sales),
+        },
+    }
+
+
+def refresh_stats(today=None):
+    """Recompute the summary and upsert it into DashboardStat. Returns the rows."""
+    summary = compute_summary(today)
+    stats = []
+    for (stat_type, period), (section, current_key, previous_key, title) in SUMMARY_STATS.items():
+        stat = DashboardStat(
+            title=title,
+            stat_type=stat_type,
+            period=period,
+            current_value=Decimal(summary[section][current_key]),
+            previous_value=Decimal(summary[section][previous_key] if previous_key else 0),
+            is_active=True,
+        )
+        stat.calculate_percentage_change()
+        stats.append(stat)
+
+    with transaction.atomic():
+        DashboardStat.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['stat_type', 'period'],
+            update_fields=['title', 'current_value', 'previous_value', 'percentage_change', 'is_active', 'updated_at'],
+        )
+    return stats
+
+
+def summary_from_stats(stats):
+    """
+    Rebuild the summary from precomputed rows.
+
+    Returns ``(summary, refreshed_at)`` where ``refreshed_at`` is the time
+    of the oldest row used, or ``(None, None)`` when rows are missing.
+    """
+    by_key = {(stat.stat_type, stat.period): stat for stat in stats}
+    if any(key not in by_key for key in SUMMARY_STATS):
+        return None, None
+
+    summary = {section: {} for section, *_ in SUMMARY_STATS.values()}
+    for key, (section, current_key, previous_key, _title) in SUMMARY_STATS.items():
+        stat = by_key[key]
+        convert = int if section in COUNT_SECTIONS else Decimal
+        summary[section][current_key] = convert(stat.current_value)
+        if previous_key:
+            summary[section][previous_key] = convert(stat.previous_value)
+            summary[section]['percentage_change'] = float(stat.percentage_change)
+    return summary, min(stat.updated_at for stat in by_key.values())
+
+
+def is_stale(refreshed_at, now=None):
+    """Whether precomputed stats are older than DASHBOARD_STATS_MAX_AGE."""
+    now = now or timezone.now()
+    return (now - refreshed_at).total_seconds() > settings.DASHBOARD_STATS_MAX_AGE
@@ -1,3 +1,286 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.deliveries.models import Delivery
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.stores.models import Store
+from . import rollups
+from .models import DailySalesRollup, DashboardStat
+from .summary import refresh_stats
+from .timeseries import aggregate_series, bucket_keys, sales_series
+
+User = get_user_model()
+
+
+def create_order(store, total, created_at, product=None, **extra):
+    """Create a backdated order with a single line worth ``total``"""
+    order = Order.objects.create(
+        order_id=f"T{Order.objects.count():011d}",
+        store=store,
+        **extra
+    )
+    # Backdate before adding items so the rollup lands on the right day
+    Order.objects.filter(pk=order.pk).update(created_at=created_at)
+    order.refresh_from_db()
+    if product is None:
+        product, _ = Product.objects.get_or_create(product_id='TEST', defaults={'name': 'Test', 'price': 1})
+    OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=total)
+    return order
+
+
+class SalesSeriesTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='Somewhere', contact='123')
+        self.today = timezone.localdate()
+
+    def at(self, day, hour=12):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+    def test_daily_series_uses_one_query_and_fills_gaps(self):
+        create_order(self.store, Decimal('10.00'), self.at(self.today))
+        create_order(self.store, Decimal('5.50'), self.at(self.today))
+        create_order(self.store, Decimal('7.00'), self.at(self.today - timedelta(days=3)))
+
+        with self.assertNumQueries(1):
+            series = sales_series(self.today - timedelta(days=6), self.today, 'day')
+
+        self.assertEqual(len(series), 7)
+        totals = dict(series)
+        self.assertEqual(totals[self.today], Decimal('15.50'))
+        self.assertEqual(totals[self.today - timedelta(days=3)], Decimal('7.00'))
+        self.assertEqual(totals[self.today - timedelta(days=1)], 0)
+
+    def test_bucket_boundaries_follow_local_time(self):
+        # 23:30 local time belongs to the same day, not the next one
+        create_order(self.store, Decimal('3.00'), self.at(self.today - timedelta(days=1), hour=23.5))
+
+        series = dict(sales_series(self.today - timedelta(days=1), self.today, 'day'))
+
+        self.assertEqual(series[self.today - timedelta(days=1)], Decimal('3.00'))
+        self.assertEqual(series[self.today], 0)
+
+    def test_weekly_and_monthly_buckets(self):
+        create_order(self.store, Decimal('2.00'), self.at(self.today))
+        create_order(self.store, Decimal('4.00'), self.at(self.today - timedelta(days=40)))
+        start = self.today - timedelta(days=60)
+
+        weeks = sales_series(start, self.today, 'week')
+        months = sales_series(start, self.today, 'month')
+
+        self.assertTrue(all(key.weekday() == 0 for key, _ in weeks))
+        self.assertTrue(all(key.day == 1 for key, _ in months))
+        self.assertEqual(sum(value for _, value in weeks), Decimal('6.00'))
+        self.assertEqual(sum(value for _, value in months), Decimal('6.00'))
+
+    def test_long_series_uses_database_truncation(self):
+        create_order(self.store, Decimal('8.00'), self.at(self.today - timedelta(days=80)))
+
+        with self.assertNumQueries(1):
+            series = sales_series(self.today - timedelta(days=89), self.today, 'day')
+
+        self.assertEqual(len(series), 90)
+        self.assertEqual(dict(series)[self.today - timedelta(days=80)], Decimal('8.00'))
+
+    def test_hourly_series(self):
+        create_order(self.store, Decimal('1.00'), self.at(self.today, hour=9))
+        start = self.at(self.today, hour=8)
+
+        series = sales_series(start, start + timedelta(hours=3), 'hour')
+
+        self.assertEqual([value for _, value in series], [0, Decimal('1.00'), 0, 0])
+
+    def test_rejects_unknown_granularity_and_huge_ranges(self):
+        with self.assertRaises(ValueError):
+            aggregate_series(Order.objects.all(), 'created_at', 'total', self.today, self.today, 'decade')
+        with self.assertRaises(ValueError):
+            bucket_keys(self.today - timedelta(days=5000), self.today, 'day')
+
+
+class SalesDataViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='Somewhere', contact='123')
+
+    def test_preset_periods(self):
+        create_order(self.store, Decimal('12.00'), timezone.now())
+
+        week = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+        year = self.client.get('/api/dashboard/sales/', {'period': 'year'})
+
+        self.assertEqual(week.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(week.data['data']), 7)
+        self.assertEqual(week.data['data'][-1]['date'], timezone.localdate().strftime('%Y-%m-%d'))
+        self.assertEqual(week.data['data'][-1]['sales'], Decimal('12.00'))
+        self.assertEqual(len(year.data['data']), 12)
+        self.assertEqual(year.data['data'][-1]['month'], timezone.localdate().strftime('%Y-%m'))
+
+    def test_custom_range(self):
+        response = self.client.get('/api/dashboard/sales/', {
+            'start': '2025-01-01', 'end': '2025-03-31', 'granularity': 'month'
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([point['month'] for point in response.data['data']], ['2025-01', '2025-02', '2025-03'])
+
+    def test_invalid_parameters(self):
+        for params in ({'period': 'decade'}, {'granularity': 'minute'}, {'start': 'yesterday'},
+                       {'start': '2025-02-01', 'end': '2025-01-01'}):
+            response = self.client.get('/api/dashboard/sales/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class DailySalesRollupTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='Somewhere', contact='123')
+        self.cola = Product.objects.create(product_id='COLA', name='Cola', price=Decimal('20.00'))
+        self.water = Product.objects.create(product_id='WATER', name='Water', price=Decimal('10.00'))
+        self.today = timezone.localdate()
+
+    def cell(self, product, day=None):
+        return DailySalesRollup.objects.get(store=self.store, product=product, date=day or self.today)
+
+    def test_item_writes_update_their_cell(self):
+        order = Order.objects.create(order_id='R1', store=self.store)
+        item = OrderItem.objects.create(order=order, product=self.cola, quantity=2, unit_price=Decimal('20.00'))
+        OrderItem.objects.create(order=order, product=self.water, quantity=1, unit_price=Decimal('10.00'))
+
+        self.assertEqual(self.cell(self.cola).revenue, Decimal('40.00'))
+        self.assertEqual(self.cell(self.cola).quantity, 2)
+
+        item.quantity = 3
+        item.save()
+        self.assertEqual(self.cell(self.cola).revenue, Decimal('60.00'))
+
+        item.delete()
+        self.assertFalse(DailySalesRollup.objects.filter(product=self.cola).exists())
+        self.assertEqual(self.cell(self.water).order_count, 1)
+
+    def test_cancelling_an_order_removes_its_sales(self):
+        first = Order.objects.create(order_id='R1', store=self.store)
+        second = Order.objects.create(order_id='R2', store=self.store)
+        OrderItem.objects.create(order=first, product=self.cola, quantity=1, unit_price=Decimal('20.00'))
+        OrderItem.objects.create(order=second, product=self.cola, quantity=1, unit_price=Decimal('20.00'))
+        self.assertEqual(self.cell(self.cola).order_count, 2)
+
+        first = Order.objects.get(pk=first.pk)
+        first.status = 'Cancelled'
+        first.save()
+        self.assertEqual(self.cell(self.cola).revenue, Decimal('20.00'))
+        self.assertEqual(self.cell(self.cola).order_count, 1)
+
+        first.status = 'Pending'
+        first.save()
+        self.assertEqual(self.cell(self.cola).revenue, Decimal('40.00'))
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        create_order(self.store, Decimal('15.00'), yesterday, product=self.cola)
+        create_order(self.store, Decimal('5.00'), timezone.now(), product=self.water)
+        incremental = sorted(DailySalesRollup.objects.values_list('store', 'product', 'date', 'quantity', 'revenue'))
+
+        DailySalesRollup.objects.all().delete()
+        self.assertEqual(rollups.rebuild(), 2)
+
+        rebuilt = sorted(DailySalesRollup.objects.values_list('store', 'product', 'date', 'quantity', 'revenue'))
+        self.assertEqual(rebuilt, incremental)
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='Somewhere', contact='123')
+        create_order(self.store, Decimal('25.00'), timezone.now())
+
+    def test_live_fallback_when_nothing_is_precomputed(self):
+        response = self.client.get('/api/dashboard/summary/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stats']['source'], 'live')
+        self.assertEqual(response.data['summary']['orders']['today'], 1)
+        self.assertEqual(response.data['summary']['sales']['today'], Decimal('25.00'))
+
+    def test_serves_precomputed_stats_from_a_single_read(self):
+        refresh_stats()
+        self.assertEqual(DashboardStat.objects.count(), 5)
+
+        # One read for the stats and one for recent activities
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/dashboard/summary/')
+
+        self.assertEqual(response.data['stats']['source'], 'precomputed')
+        self.assertFalse(response.data['stats']['stale'])
+        self.assertEqual(response.data['summary']['orders']['today'], 1)
+        self.assertEqual(response.data['summary']['sales']['today'], Decimal('25.00'))
+        self.assertEqual(response.data['summary']['products']['low_stock'], 1)
+
+    def test_refresh_updates_rows_in_place(self):
+        refresh_stats()
+        create_order(self.store, Decimal('5.00'), timezone.now())
+        refresh_stats()
+
+        self.assertEqual(DashboardStat.objects.count(), 5)
+        self.assertEqual(DashboardStat.objects.get(stat_type='orders').current_value, 2)
+
+    @override_settings(DASHBOARD_STATS_MAX_AGE=60)
+    def test_reports_stale_stats(self):
+        refresh_stats()
+        DashboardStat.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        response = self.client.get('/api/dashboard/summary/')
+
+        self.assertTrue(response.data['stats']['stale'])
+        self.assertGreaterEqual(response.data['stats']['age_seconds'], 300)
+
+
+class DashboardOverviewTests(TestCase):
+    # Deliveries, sales, low stock and recent orders: one query each
+    QUERY_BUDGET = 4
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.localdate()
+
+    def test_query_budget_does_not_grow_with_data(self):
+        for i in range(5):
+            store = Store.objects.create(name=f'Store {i}', owner_name='Owner', address='Somewhere', contact='123')
+            order = create_order(store, Decimal('10.00'), timezone.now())
+            Delivery.objects.create(
+                order=order,
+                delivery_date=self.today,
+                delivery_time=datetime.min.time(),
+                status='delivered' if i % 2 else 'cancelled',
+            )
+
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get('/api/dashboard/overview/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['recent_orders']), 5)
+        self.assertEqual(response.data['today_deliveries'], 5)
+        self.assertEqual(response.data['total_sales'], Decimal('50.00'))
+        self.assertEqual(response.data['on_time_delivery_percentage'], 40.0)
+        self.assertEqual(response.data['failed_delivery_percentage'], 60.0)
+
+    def test_month_over_month_changes(self):
+        store = Store.objects.create(name='Store', owner_name='Owner', address='Somewhere', contact='123')
+        last_month = self.today.replace(day=1) - timedelta(days=1)
+        create_order(store, Decimal('40.00'), timezone.make_aware(datetime.combine(last_month, datetime.min.time())))
+        create_order(store, Decimal('60.00'), timezone.now())
+
+        response = self.client.get('/api/dashboard/overview/')
+
+        self.assertEqual(response.data['total_sales'], Decimal('60.00'))
+        self.assertEqual(response.data['total_sales_change'], 50.0)
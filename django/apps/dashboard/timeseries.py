@@ -0,0 +1,170 @@
+"""
+Grouped time-series aggregation for dashboard charts.
+
+A series is computed with a single GROUP BY query over a bucketed
+timestamp; buckets without rows are filled in Python so charts always
+receive a contiguous axis.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DateField, DateTimeField, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from apps.orders.models import Order
+from .models import DailySalesRollup
+from .rollups import EXCLUDED_STATUSES
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# Upper bound on the number of buckets a single request may ask for
+MAX_BUCKETS = 1000
+
+# Short series are bucketed with a CASE over precomputed boundaries, which
+# stays in plain SQL comparisons. Longer ones fall back to the database's
+# date truncation (evaluated by a Python function per row on SQLite).
+CASE_BUCKET_LIMIT = 64
+
+_TRUNC_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def bucket_start(value, granularity):
+    """Return the bucket key that ``value`` falls into."""
+    if granularity == 'hour':
+        if not isinstance(value, datetime):
+            value = _as_datetime(value)
+        value = timezone.localtime(value)
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(key, granularity):
+    """Return the key of the bucket following ``key``."""
+    if granularity == 'hour':
+        # Step in UTC so DST transitions never produce duplicate buckets
+        return timezone.localtime(key + timedelta(hours=1))
+    if granularity == 'day':
+        return key + timedelta(days=1)
+    if granularity == 'week':
+        return key + timedelta(weeks=1)
+    if key.month == 12:
+        return key.replace(year=key.year + 1, month=1)
+    return key.replace(month=key.month + 1)
+
+
+def bucket_keys(start, end, granularity):
+    """List every bucket key between ``start`` and ``end`` inclusive."""
+    key = bucket_start(start, granularity)
+    last = bucket_start(end, granularity)
+    keys = []
+    while key <= last:
+        keys.append(key)
+        if len(keys) > MAX_BUCKETS:
+            raise ValueError(f'Range spans more than {MAX_BUCKETS} {granularity} buckets')
+        key = next_bucket(key, granularity)
+    return keys
+
+
+def _as_datetime(key):
+    """Convert a bucket key to an aware datetime at the start of the bucket."""
+    if isinstance(key, datetime):
+        return key
+    return timezone.make_aware(datetime.combine(key, time.min))
+
+
+def _bound(key, with_time):
+    """Convert a bucket key to a filter value for a date or datetime column."""
+    return _as_datetime(key) if with_time else key
+
+
+def _truncate(field, granularity):
+    if granularity == 'hour':
+        return TruncHour(field)
+    return _TRUNC_FUNCTIONS[granularity](field, output_field=DateField())
+
+
+def _bucket_case(field, keys, granularity, with_time):
+    """Map each row to the index of its bucket using boundary comparisons."""
+    boundaries = [_bound(next_bucket(key, granularity), with_time) for key in keys]
+    return Case(
+        *[When(**{f'{field}__lt': boundary}, then=Value(i)) for i, boundary in enumerate(boundaries)],
+        output_field=IntegerField(),
+    )
+
+
+def aggregate_series(queryset, field, value, start, end, granularity, default=Decimal('0')):
+    """
+    Aggregate ``value`` over ``queryset`` into ``granularity`` buckets.
+
+    ``field`` is the date or datetime column used for bucketing and
+    ``value`` is either a field name (summed) or an aggregate expression. Returns a list of
+    ``(bucket_key, value)`` tuples covering ``start`` to ``end`` inclusive,
+    with empty buckets set to ``default``.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Invalid granularity: {granularity}')
+
+    with_time = isinstance(queryset.model._meta.get_field(field), DateTimeField)
+    if granularity == 'hour' and not with_time:
+        raise ValueError(f'{field} has no time component to bucket by hour')
+
+    keys = bucket_keys(start, end, granularity)
+    if not keys:
+        return []
+
+    use_case = len(keys) <= CASE_BUCKET_LIMIT
+    if use_case:
+        bucket = _bucket_case(field, keys, granularity, with_time)
+    else:
+        bucket = _truncate(field, granularity)
+
+    aggregate = Sum(value) if isinstance(value, str) else value
+    rows = (
+        queryset
+        .filter(**{
+            f'{field}__gte': _bound(keys[0], with_time),
+            f'{field}__lt': _bound(next_bucket(keys[-1], granularity), with_time),
+        })
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(value=aggregate)
+        .order_by()
+    )
+    totals = {row['bucket']: row['value'] for row in rows}
+    if use_case:
+        totals = {keys[index]: total for index, total in totals.items()}
+    return [(key, totals.get(key) or default) for key in keys]
+
+
+def sales_series(start, end, granularity):
+    """
+    Sales revenue (order subtotals, excluding cancelled orders) per bucket.
+
+    Day and coarser buckets are read from the daily rollup; hourly buckets
+    need the order timestamps and are aggregated from orders directly.
+    """
+    if granularity == 'hour':
+        orders = Order.objects.exclude(status__in=EXCLUDED_STATUSES)
+        return aggregate_series(orders, 'created_at', 'subtotal', start, end, granularity)
+    return aggregate_series(DailySalesRollup.objects.all(), 'date', 'revenue', start, end, granularity)
+
+
+def format_bucket(key, granularity):
+    """Render a bucket key the way the chart endpoints label it."""
+    if granularity == 'hour':
+        return key.strftime('%Y-%m-%d %H:00')
+    if granularity == 'month':
+        return key.strftime('%Y-%m')
+    return key.strftime('%Y-%m-%d')
@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import DashboardSummaryView, SalesDataView
+from .views import DashboardOverviewView, DashboardSummaryView, SalesDataView
 
 app_name = 'dashboard'
 
 urlpatterns = [
     path('summary/', DashboardSummaryView.as_view(), name='summary'),
+    path('overview/', DashboardOverviewView.as_view(), name='overview'),
     path('sales/', SalesDataView.as_view(), name='sales'),
 ]
 
@@ -1,14 +1,12 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from django.db.models import Sum, Count
 from django.utils import timezone
-from datetime import timedelta
-from apps.orders.models import Order
-from apps.deliveries.models import Delivery
-from apps.products.models import Product
-from apps.inventory.models import InventoryTransaction
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 from .models import DashboardStat, RecentActivity
-from django.db.models import F
+from .serializers import DashboardSummarySerializer
+from .summary import compute_summary, is_stale, summary_from_stats
+from .timeseries import GRANULARITIES, format_bucket, sales_series
 
 
 class DashboardSummaryView(generics.GenericAPIView):
@@ -18,70 +16,29 @@ class DashboardSummaryView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # Get current date and time
-        now = timezone.now()
-        today = now.date()
-        
-        # Get stats from the database if available
-        stats = DashboardStat.objects.filter(is_active=True)
-        
-        # Calculate summary data if no stats are available
-        if not stats.exists():
-            # Orders summary
-            today_orders = Order.objects.filter(created_at__date=today).count()
-            yesterday_orders = Order.objects.filter(created_at__date=today - timedelta(days=1)).count()
-            
-            # Deliveries summary
-            today_deliveries = Delivery.objects.filter(delivery_date=today).count()
-            pending_deliveries = Delivery.objects.filter(status='pending').count()
-            
-            # Products summary
-            low_stock_products = Product.objects.filter(stock_quantity__lte=F('reorder_level')).count()
-            
-            # Sales summary
-            today_sales = Order.objects.filter(created_at__date=today).aggregate(total=Sum('total_amount'))['total'] or 0
-            yesterday_sales = Order.objects.filter(created_at__date=today - timedelta(days=1)).aggregate(total=Sum('total_amount'))['total'] or 0
-            
-            summary_data = {
-                'orders': {
-                    'today': today_orders,
-                    'yesterday': yesterday_orders,
-                    'percentage_change': self._calculate_percentage_change(today_orders, yesterday_orders),
-                },
-                'deliveries': {
-                    'today': today_deliveries,
-                    'pending': pending_deliveries,
-                },
-                'products': {
-                    'low_stock': low_stock_products,
-                },
-                'sales': {
-                    'today': today_sales,
-                    'yesterday': yesterday_sales,
-                    'percentage_change': self._calculate_percentage_change(today_sales, yesterday_sales),
-                }
+        # Serve pre-calculated stats when the precompute job has run
+        stats = list(DashboardStat.objects.filter(is_active=True))
+        summary_data, refreshed_at = summary_from_stats(stats)
+
+        if summary_data is None:
+            # Fall back to live queries until stats have been computed
+            summary_data = compute_summary()
+            meta = {
+                'source': 'live',
+                'refreshed_at': timezone.now(),
+                'age_seconds': 0,
+                'stale': False,
             }
         else:
-            # Use pre-calculated stats
-            summary_data = {
-                'orders': {},
-                'deliveries': {},
-                'products': {},
-                'sales': {},
+            meta = {
+                'source': 'precomputed',
+                'refreshed_at': refreshed_at,
+                'age_seconds': int((timezone.now() - refreshed_at).total_seconds()),
+                'stale': is_stale(refreshed_at),
             }
-            
-            for stat in stats:
-                if stat.stat_type == 'orders':
-                    summary_data['orders'][stat.period] = stat.value
-                elif stat.stat_type == 'deliveries':
-                    summary_data['deliveries'][stat.period] = stat.value
-                elif stat.stat_type == 'products':
-                    summary_data['products'][stat.period] = stat.value
-                elif stat.stat_type == 'sales':
-                    summary_data['sales'][stat.period] = stat.value
         
         # Get recent activities
-        recent_activities = RecentActivity.objects.all()[:10]
+        recent_activities = RecentActivity.objects.select_related('user')[:10]
         activities_data = [
             {
                 'id': activity.id,
@@ -90,115 +47,121 @@ class DashboardSummaryView(generics.GenericAPIView):
                 'description': activity.description,
                 'reference_id': activity.reference_id,
                 'user': activity.user.get_full_name() if activity.user else None,
-                'created_at': activity.created,
+                'created_at': activity.created_at,
             }
             for activity in recent_activities
         ]
         
         return Response({
             'summary': summary_data,
+            'stats': meta,
             'recent_activities': activities_data,
         })
-    
-    def _calculate_percentage_change(self, current, previous):
-        """Calculate percentage change between two values"""
-        if previous == 0:
-            return 0
-        return ((current - previous) / previous) * 100
+
+
+class DashboardOverviewView(generics.GenericAPIView):
+    """
+    API view to get delivery, sales and stock KPIs for the dashboard cards
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = DashboardSummarySerializer
+
+    def get(self, request):
+        serializer = self.get_serializer(timezone.now())
+        return Response(serializer.data)
 
 
 class SalesDataView(generics.GenericAPIView):
     """
     API view to get sales data for charts
+
+    Accepts either a preset ``period`` (week, month, year) or an explicit
+    ``start``/``end``/``granularity`` (hour, day, week, month) range. Every
+    bucket is computed by a single grouped query.
     """
     permission_classes = [permissions.IsAuthenticated]
-    
+
+    PERIODS = {
+        'week': ('day', 6),
+        'month': ('day', 29),
+        'year': ('month', 11),
+    }
+    LABELS = {
+        'hour': 'hour',
+        'day': 'date',
+        'week': 'week',
+        'month': 'month',
+    }
+
     def get(self, request):
-        period = request.query_params.get('period', 'week')
-        
-        if period == 'week':
-            return self._get_weekly_data()
-        elif period == 'month':
-            return self._get_monthly_data()
-        elif period == 'year':
-            return self._get_yearly_data()
+        params = request.query_params
+
+        if any(key in params for key in ('start', 'end', 'granularity')):
+            period = 'custom'
+            try:
+                granularity, start, end = self._parse_range(params)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         else:
-            return Response({'error': 'Invalid period'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    def _get_weekly_data(self):
-        """Get sales data for the past week"""
-        now = timezone.now()
-        start_date = now - timedelta(days=7)
-        
-        # Get daily sales for the past week
-        sales_data = []
-        for i in range(7):
-            date = start_date + timedelta(days=i)
-            sales = Order.objects.filter(created_at__date=date.date()).aggregate(total=Sum('total_amount'))['total'] or 0
-            sales_data.append({
-                'date': date.date().strftime('%Y-%m-%d'),
-                'sales': sales,
-            })
-        
-        return Response({
-            'period': 'week',
-            'data': sales_data,
-        })
-    
-    def _get_monthly_data(self):
-        """Get sales data for the past month"""
-        now = timezone.now()
-        start_date = now - timedelta(days=30)
-        
-        # Group sales by day for the past month
-        sales_data = []
-        for i in range(30):
-            date = start_date + timedelta(days=i)
-            sales = Order.objects.filter(created_at__date=date.date()).aggregate(total=Sum('total_amount'))['total'] or 0
-            sales_data.append({
-                'date': date.date().strftime('%Y-%m-%d'),
-                'sales': sales,
-            })
-        
-        return Response({
-            'period': 'month',
-            'data': sales_data,
-        })
-    
-    def _get_yearly_data(self):
-        """Get sales data for the past year"""
-        now = timezone.now()
-        
-        # Group sales by month for the past year
-        sales_data = []
-        for i in range(12):
-            month = now.month - i
-            year = now.year
-            if month <= 0:
-                month += 12
-                year -= 1
-            
-            start_date = timezone.datetime(year, month, 1)
-            if month == 12:
-                end_date = timezone.datetime(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = timezone.datetime(year, month + 1, 1) - timedelta(days=1)
-            
-            sales = Order.objects.filter(
-                created_at__date__gte=start_date.date(),
-                created_at__date__lte=end_date.date()
-            ).aggregate(total=Sum('total_amount'))['total'] or 0
-            
-            sales_data.append({
-                'month': start_date.strftime('%Y-%m'),
-                'sales': sales,
-            })
-        
-        # Reverse to get chronological order
-        sales_data.reverse()
-        
+            period = params.get('period', 'week')
+            if period not in self.PERIODS:
+                return Response({'error': 'Invalid period'}, status=status.HTTP_400_BAD_REQUEST)
+            granularity, start, end = self._preset_range(period)
+
+        try:
+            series = sales_series(start, end, granularity)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        label = self.LABELS[granularity]
         return Response({
-            'period': 'year',
-            'data': sales_data,
+            'period': period,
+            'granularity': granularity,
+            'data': [
+                {label: format_bucket(key, granularity), 'sales': value}
+                for key, value in series
+            ],
         })
 
+    def _preset_range(self, period):
+        """Return granularity and range for one of the preset periods"""
+        granularity, steps = self.PERIODS[period]
+        today = timezone.localdate()
+        if granularity == 'month':
+            start = today.replace(day=1)
+            for _ in range(steps):
+                start = (start - timedelta(days=1)).replace(day=1)
+        else:
+            start = today - timedelta(days=steps)
+        return granularity, start, today
+
+    def _parse_range(self, params):
+        """Validate the start/end/granularity query parameters"""
+        granularity = params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Invalid granularity, expected one of: {', '.join(GRANULARITIES)}")
+
+        today = timezone.localdate()
+        start = self._parse_bound(params.get('start'), today - timedelta(days=6))
+        end = self._parse_bound(params.get('end'), today)
+
+        if granularity == 'hour':
+            # A bare end date covers the whole day
+            if not isinstance(end, datetime):
+                end = timezone.make_aware(datetime.combine(end, time.max))
+        if self._as_date(start) > self._as_date(end):
+            raise ValueError('start must not be after end')
+        return granularity, start, end
+
+    def _parse_bound(self, value, default):
+        if not value:
+            return default
+        parsed = parse_datetime(value) if 'T' in value or ' ' in value else parse_date(value)
+        if parsed is None:
+            raise ValueError(f'Invalid date: {value}')
+        if isinstance(parsed, datetime) and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def _as_date(self, value):
+        return timezone.localtime(value).date() if isinstance(value, datetime) else value
@@ -0,0 +1,172 @@
+# apps/deliveries/dispatch.py
+"""
+Daily dispatch: split a day's stops across drivers, then route each driver.
+
+Stops are partitioned two ways. The sweep sorts them by angle around the
+depot (or the stops' centre) and cuts that into equal slices. The
+capacity-constrained k-means starts from the sweep's slice centres; each
+iteration assigns stops greedily, hardest decisions first, to the nearest
+centroid that still has room, so no driver gets more than
+``ceil(n / k * (1 + tolerance))`` stops. The partition with the shorter
+nearest neighbour routes wins and every cluster is then ordered with
+``routing.solve_route``.
+
+All distance work is vectorised NumPy; the only Python loop per iteration
+is the greedy pass over the stops, so thousands of stops partition in
+well under a second on one core.
+"""
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import routing
+
+# Drivers may take this fraction more than an equal share of stops
+DEFAULT_BALANCE_TOLERANCE = 0.1
+# Capacity-constrained k-means iterations before settling
+MAX_ITERATIONS = 20
+# Seconds of route improvement shared by all drivers of one dispatch
+DEFAULT_TIME_LIMIT = 10.0
+
+
+@dataclass
+class Dispatch:
+    # Driver key -> Route, in the order the drivers were given
+    routes: dict = field(default_factory=dict)
+
+    @property
+    def distance_km(self):
+        return sum(route.distance_km for route in self.routes.values())
+
+
+def sweep_labels(lats, lngs, k, origin=None):
+    """Cut the stops into ``k`` equal angular slices around ``origin``."""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    if origin is None:
+        origin = (lats.mean(), lngs.mean())
+    # Scale longitude so angles are taken on a locally flat map
+    x = (lngs - origin[1]) * math.cos(math.radians(origin[0]))
+    y = lats - origin[0]
+    order = np.argsort(np.arctan2(y, x), kind='stable')
+    labels = np.empty(len(lats), dtype=int)
+    for label, chunk in enumerate(np.array_split(order, k)):
+        labels[chunk] = label
+    return labels
+
+
+def _centroids(lats, lngs, labels, k, previous=None):
+    counts = np.bincount(labels, minlength=k)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centroid_lats = np.bincount(labels, weights=lats, minlength=k) / counts
+        centroid_lngs = np.bincount(labels, weights=lngs, minlength=k) / counts
+    if previous is not None:
+        # Empty clusters keep their last position
+        empty = counts == 0
+        centroid_lats[empty] = previous[0][empty]
+        centroid_lngs[empty] = previous[1][empty]
+    return centroid_lats, centroid_lngs
+
+
+def _assign(distances, capacity):
+    """
+    Give every stop its nearest cluster with room left.
+
+    Stops that lose the most by not getting their first choice go first.
+    """
+    n, k = distances.shape
+    preferences = np.argsort(distances, axis=1)
+    if k > 1:
+        ranked = np.take_along_axis(distances, preferences[:, :2], axis=1)
+        order = np.argsort(ranked[:, 0] - ranked[:, 1], kind='stable')
+    else:
+        order = np.arange(n)
+
+    loads = [0] * k
+    labels = np.empty(n, dtype=int)
+    preference_lists = preferences.tolist()
+    for stop in order.tolist():
+        for cluster in preference_lists[stop]:
+            if loads[cluster] < capacity:
+                loads[cluster] += 1
+                labels[stop] = cluster
+                break
+    return labels
+
+
+def balanced_labels(lats, lngs, k, origin=None, tolerance=DEFAULT_BALANCE_TOLERANCE,
+                    max_iterations=MAX_ITERATIONS):
+    """Capacity-constrained k-means labels (0..k-1) for the given points."""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    n = len(lats)
+    if n == 0:
+        return np.empty(0, dtype=int)
+    capacity = max(1, math.ceil(n / k * (1 + tolerance)))
+
+    labels = sweep_labels(lats, lngs, k, origin)
+    centroids = _centroids(lats, lngs, labels, k)
+    for _ in range(max_iterations):
+        distances = routing.haversine_matrix(lats, lngs, *centroids)
+        new_labels = _assign(distances, capacity)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centroids = _centroids(lats, lngs, labels, k, centroids)
+    return labels
+
+
+def _partition(stops, labels, k):
+    groups = [[] for _ in range(k)]
+    for stop, label in zip(stops, labels.tolist()):
+        groups[label].append(stop)
+    return groups
+
+
+def _seed_distance(groups, depot, route_options):
+    # A zero time limit stops at the nearest neighbour seed, a cheap length estimate
+    return sum(
+        routing.solve_route(group, depot=depot, time_limit=0, **route_options).distance_km
+        for group in groups
+    )
+
+
+def dispatch(stops, drivers, depot=None, tolerance=DEFAULT_BALANCE_TOLERANCE,
+             time_limit=DEFAULT_TIME_LIMIT, cluster='auto', **route_options):
+    """
+    Partition ``stops`` across ``drivers`` and route each driver's share.
+
+    ``cluster`` is ``'kmeans'`` (balanced k-means), ``'sweep'`` (equal
+    angular slices around the depot) or ``'auto'``, which builds both and
+    keeps the one whose nearest neighbour routes are shorter: slices suit
+    routes fanning out from a depot, compact clusters suit routes that
+    start anywhere. ``time_limit`` seconds of route improvement are shared
+    among the drivers; ``route_options`` are passed on to
+    ``routing.solve_route``. Returns a Dispatch.
+    """
+    drivers = list(drivers)
+    if not drivers:
+        raise ValueError('At least one driver is required.')
+    if cluster not in ('auto', 'kmeans', 'sweep'):
+        raise ValueError(f'Unknown clustering {cluster!r}.')
+
+    k = len(drivers)
+    lats = [stop.lat for stop in stops]
+    lngs = [stop.lng for stop in stops]
+    candidates = []
+    if stops and cluster in ('auto', 'sweep'):
+        candidates.append(_partition(stops, sweep_labels(lats, lngs, k, depot), k))
+    if stops and cluster in ('auto', 'kmeans'):
+        candidates.append(_partition(stops, balanced_labels(lats, lngs, k, depot, tolerance), k))
+    if not candidates:
+        groups = [[] for _ in drivers]
+    elif len(candidates) == 1:
+        groups = candidates[0]
+    else:
+        groups = min(candidates, key=lambda groups: _seed_distance(groups, depot, route_options))
+
+    result = Dispatch()
+    routes = routing.solve_routes(groups, time_limit=time_limit, depot=depot, **route_options)
+    result.routes.update(zip(drivers, routes))
+    return result
@@ -0,0 +1,173 @@
+# apps/deliveries/feed.py
+"""
+Live delivery feed.
+
+Status changes and driver positions are published as small events once
+their transaction commits, and every open dashboard receives them over
+Server-Sent Events from ``/api/deliveries/feed/`` instead of polling the
+deliveries list. The stream needs the ASGI application
+(``k_to_drinks.asgi``); a WSGI worker would buffer it forever.
+
+Events go through the broker named by ``DELIVERY_FEED_BROKER``. The
+default ``InProcessBroker`` only reaches subscribers in the same process,
+which suits a single ASGI worker. With several workers, point the setting
+at a class backed by a shared local broker (Redis, PostgreSQL
+LISTEN/NOTIFY, ...) that offers the same two methods:
+
+``publish(event)``
+    Deliver a JSON-serialisable dict to current subscribers. Called from
+    synchronous code in any thread; must not block.
+
+``subscribe()``
+    Called inside the event loop. Returns a subscription with
+    ``async get(timeout)`` (raises ``asyncio.TimeoutError``) and ``close()``.
+
+Events are not replayed: a dashboard that reconnects should reload the
+list once and then rely on the feed again.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Milliseconds browsers wait before reconnecting a dropped stream
+RECONNECT_MS = 3000
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """One listener of an InProcessBroker, bound to the loop that created it."""
+
+    def __init__(self, broker, max_queued):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_queued)
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop has shut down under us
+            self.close()
+
+    def _put(self, event):
+        if self.queue.full():
+            # A stalled client loses its oldest events rather than growing without bound
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan events out to the subscribers of this process."""
+
+    def __init__(self, max_queued=None):
+        self.max_queued = max_queued or settings.DELIVERY_FEED_QUEUE_SIZE
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            event = dict(event, id=next(self._ids))
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscribe(self):
+        subscription = Subscription(self, self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+def get_broker():
+    """The process-wide broker configured by ``DELIVERY_FEED_BROKER``."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.DELIVERY_FEED_BROKER)()
+        return _broker
+
+
+def delivery_event(delivery, kind):
+    """Feed event for a delivery; ``kind`` is ``'status'`` or ``'location'``."""
+    return {
+        'type': kind,
+        'delivery_id': delivery.pk,
+        'employee_id': delivery.employee_id,
+        'status': delivery.status,
+        'lat': delivery.lat,
+        'lng': delivery.lng,
+        'time': timezone.now().isoformat(),
+    }
+
+
+def publish(events):
+    """Publish events; a broker failure is logged, never raised into the writer."""
+    try:
+        broker = get_broker()
+        for event in events:
+            broker.publish(event)
+    except Exception:
+        logger.exception('Failed to publish delivery feed events')
+
+
+def format_event(event):
+    """Encode an event as one SSE message."""
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f'data: {json.dumps(event, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream(subscription, accept=None, keepalive=None, max_seconds=None):
+    """
+    Yield SSE messages for a subscription until ``max_seconds`` pass.
+
+    Comments are sent after ``keepalive`` idle seconds so proxies keep the
+    connection open; ``accept`` filters events. The subscription is closed
+    when the stream ends or the client goes away.
+    """
+    keepalive = keepalive or settings.DELIVERY_FEED_KEEPALIVE
+    max_seconds = max_seconds or settings.DELIVERY_FEED_MAX_SECONDS
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    try:
+        yield f'retry: {RECONNECT_MS}\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await subscription.get(timeout=min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if accept is None or accept(event):
+                yield format_event(event)
+    finally:
+        subscription.close()
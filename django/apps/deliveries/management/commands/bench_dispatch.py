@@ -0,0 +1,69 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.deliveries import dispatch, routing
+
+
+def grid_stops(count, rng, spacing_km=0.5, jitter=0.3):
+    """Stops on a square grid of stores around Manila, each nudged off its grid point."""
+    side = math.ceil(math.sqrt(count))
+    step = spacing_km / 111.2
+    stops = []
+    for i in range(count):
+        row, column = divmod(i, side)
+        lat = 14.45 + (row + rng.uniform(-jitter, jitter)) * step
+        lng = 120.95 + (column + rng.uniform(-jitter, jitter)) * step / math.cos(math.radians(14.6))
+        stops.append(routing.Stop(i, lat, lng, (8 * 60, 18 * 60)))
+    return stops
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the multi-driver dispatch (sweep, balanced k-means and the '
+        'automatic choice between them, each followed by per-driver routing) '
+        'on synthetic store grids.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[500, 2000, 5000],
+            help='Deliveries per day to benchmark'
+        )
+        parser.add_argument('--stops-per-driver', type=int, default=35)
+        parser.add_argument(
+            '--no-depot', action='store_true',
+            help='Let routes start at their first stop instead of a central depot'
+        )
+        parser.add_argument(
+            '--time-limit', type=float, default=dispatch.DEFAULT_TIME_LIMIT,
+            help='Route improvement seconds shared by all drivers'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            stops = grid_stops(size, random.Random(options['seed']))
+            drivers = list(range(max(1, math.ceil(size / options['stops_per_driver']))))
+            depot = None
+            if not options['no_depot']:
+                depot = (
+                    sum(stop.lat for stop in stops) / size,
+                    sum(stop.lng for stop in stops) / size,
+                )
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{size} deliveries, {len(drivers)} drivers'))
+            for cluster in ('sweep', 'kmeans', 'auto'):
+                started = time.perf_counter()
+                plan = dispatch.dispatch(
+                    stops, drivers, depot=depot, time_limit=options['time_limit'], cluster=cluster
+                )
+                elapsed = time.perf_counter() - started
+                counts = [len(route.stops) for route in plan.routes.values()]
+                late = sum(route.late_minutes for route in plan.routes.values())
+                self.stdout.write(
+                    f'  {cluster:<7} {plan.distance_km:9.1f} km  stops/driver {min(counts)}-{max(counts)}  '
+                    f'late={late:6.0f} min  {elapsed:6.2f} s'
+                )
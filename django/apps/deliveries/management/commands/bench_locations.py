@@ -0,0 +1,82 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.base.benchmarks import SEED_PROFILES, scratch_database, seed_dataset
+from apps.deliveries import tracking
+from apps.deliveries.models import Delivery, DeliveryLocation
+
+
+def save_each(points):
+    """The per-request path of a plain model save: one row and one delivery save per point."""
+    for point in points:
+        DeliveryLocation.objects.create(
+            delivery_id=point['delivery_id'], recorded_at=point['recorded_at'],
+            lat=point['lat'], lng=point['lng'],
+        )
+        delivery = Delivery.objects.get(pk=point['delivery_id'])
+        delivery.lat, delivery.lng, delivery.location_time = point['lat'], point['lng'], point['recorded_at']
+        delivery.save()
+
+
+def buffered(points):
+    """What one flush of the buffer writes."""
+    tracking.record(points)
+
+
+STRATEGIES = (
+    ('save each', save_each),
+    ('buffered', buffered),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks GPS breadcrumb ingestion: saving every point through the models '
+        'against the buffered bulk writes. '
+        'Runs against a throwaway database, the configured one is never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=300, help='Drivers reporting at once')
+        parser.add_argument(
+            '--points', type=int, default=5, help='Points per driver between flushes (one every few seconds)'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        drivers = options['drivers']
+        profile = dict(SEED_PROFILES['test'], orders=drivers, deliveries=drivers)
+
+        # Without an interval points are written straight through, as one flush
+        with scratch_database(), override_settings(LOCATION_FLUSH_INTERVAL=0):
+            seed_dataset(**profile)
+            delivery_ids = list(Delivery.objects.values_list('pk', flat=True))
+            start = timezone.now()
+            for name, fn in STRATEGIES:
+                points = [
+                    {
+                        'delivery_id': delivery_id,
+                        'recorded_at': start + timedelta(seconds=3 * step),
+                        'lat': rng.gauss(14.6, 0.05),
+                        'lng': rng.gauss(121.0, 0.05),
+                    }
+                    for step in range(options['points'])
+                    for delivery_id in delivery_ids
+                ]
+                # Counted with a wrapper, the DEBUG query log stops at 9000 entries
+                queries = []
+                with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                    started = time.perf_counter()
+                    fn(points)
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name:<10} {len(points):,} points  queries={len(queries):<6} '
+                    f'{elapsed * 1000:9.1f} ms  {len(points) / elapsed:10,.0f} points/s'
+                )
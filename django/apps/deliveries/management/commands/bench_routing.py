@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.deliveries import routing
+
+
+def synthetic_stops(count, rng, windows=False):
+    """Stops scattered over Metro Manila, optionally with store-hour style windows."""
+    stops = []
+    for i in range(count):
+        window = None
+        if windows:
+            # Mostly all-day stores, a quarter with a two-hour slot
+            if rng.random() < 0.25:
+                opens = rng.randrange(8 * 60, 16 * 60, 30)
+                window = (opens, opens + 120)
+            else:
+                window = (8 * 60, 18 * 60)
+        stops.append(routing.Stop(i, 14.4 + rng.random() * 0.4, 120.9 + rng.random() * 0.3, window))
+    return stops
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the delivery route optimiser (nearest neighbour seed, then '
+        '2-opt and or-opt) on synthetic stops, with and without time windows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[50, 200, 1000],
+            help='Stop counts to benchmark'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, best is reported')
+        parser.add_argument(
+            '--time-limit', type=float, default=routing.DEFAULT_TIME_LIMIT,
+            help='Improvement time limit per route in seconds'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        depot = (14.6, 121.0)
+
+        for size in options['sizes']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{size} stops'))
+            for windows in (False, True):
+                stops = synthetic_stops(size, rng, windows)
+                # A zero time limit returns the nearest neighbour seed unimproved
+                seed = routing.solve_route(stops, depot=depot, time_limit=0)
+
+                best = None
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    route = routing.solve_route(stops, depot=depot, time_limit=options['time_limit'])
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+
+                label = 'windows' if windows else 'distance'
+                self.stdout.write(
+                    f'  {label:<9} nearest={seed.distance_km:7.1f} km late={seed.late_minutes:8.0f} min  '
+                    f'optimised={route.distance_km:7.1f} km late={route.late_minutes:8.0f} min  '
+                    f'{best * 1000:8.1f} ms'
+                )
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.deliveries.models import DeliveryLocation
+
+
+class Command(BaseCommand):
+    help = 'Deletes GPS breadcrumbs older than the retention period, one day at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Keep this many days of points (default: LOCATION_RETENTION_DAYS)'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.LOCATION_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        oldest = DeliveryLocation.objects.order_by('recorded_at').values_list('recorded_at', flat=True).first()
+        deleted = 0
+        # Day-sized range deletes on the recorded_at index keep each transaction short
+        while oldest is not None and oldest < cutoff:
+            end = min(oldest + timedelta(days=1), cutoff)
+            deleted += DeliveryLocation.objects.filter(recorded_at__lt=end).delete()[0]
+            oldest = end
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} GPS points recorded before {cutoff:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliverystatusupdate',
+            index=models.Index(fields=['delivery', 'update_time'], name='delivery_status_timeline_idx'),
+        ),
+    ]
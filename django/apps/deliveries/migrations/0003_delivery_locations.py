@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0002_status_timeline_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='location_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DeliveryLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('delivery', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='deliveries.delivery')),
+            ],
+            options={
+                'verbose_name': 'Delivery Location',
+                'verbose_name_plural': 'Delivery Locations',
+                'indexes': [models.Index(fields=['delivery', 'recorded_at'], name='delivery_location_trail_idx'), models.Index(fields=['recorded_at'], name='delivery_location_time_idx')],
+            },
+        ),
+    ]
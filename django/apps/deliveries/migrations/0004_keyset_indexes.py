@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0003_delivery_locations'),
+        ('orders', '0004_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['delivery_date', 'delivery_time', 'id'], name='delivery_schedule_idx'),
+        ),
+    ]
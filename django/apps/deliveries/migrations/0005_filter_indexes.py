@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0004_keyset_indexes'),
+        ('orders', '0005_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['status', 'delivery_date', 'delivery_time', 'id'], name='delivery_status_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['employee', 'delivery_date', 'delivery_time', 'id'], name='delivery_employee_schedule_idx'),
+        ),
+    ]
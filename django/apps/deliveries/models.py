@@ -34,11 +34,22 @@ class Delivery(TimeStampedModel):
     signature_image = models.ImageField(upload_to='signatures/', blank=True, null=True)
     lat = models.FloatField(verbose_name="Latitude", blank=True, null=True)
     lng = models.FloatField(verbose_name="Longitude", blank=True, null=True)
+    # When the driver recorded the position in lat/lng
+    location_time = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         verbose_name = 'Delivery'
         verbose_name_plural = 'Deliveries'
         ordering = ['-delivery_date', '-delivery_time']
+        indexes = [
+            # Keyset pages of the delivery list, latest first
+            models.Index(fields=['delivery_date', 'delivery_time', 'id'], name='delivery_schedule_idx'),
+            # The same pages filtered by status, or a driver's deliveries by date
+            models.Index(fields=['status', 'delivery_date', 'delivery_time', 'id'], name='delivery_status_schedule_idx'),
+            models.Index(
+                fields=['employee', 'delivery_date', 'delivery_time', 'id'], name='delivery_employee_schedule_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.id
@@ -63,7 +74,35 @@ class DeliveryStatusUpdate(TimeStampedModel):
         verbose_name = 'Delivery Status Update'
         verbose_name_plural = 'Delivery Status Updates'
         ordering = ['-update_time']
+        indexes = [
+            # A delivery's timeline in order
+            models.Index(fields=['delivery', 'update_time'], name='delivery_status_timeline_idx'),
+        ]
 
     def __str__(self):
         return f"{self.delivery.id} - {self.status} ({self.update_time})"
 
+
+
+class DeliveryLocation(models.Model):
+    """
+    GPS breadcrumb reported by a driver, written in batches by
+    apps.deliveries.tracking. Kept narrow since it is by far the largest table.
+    """
+    delivery = models.ForeignKey(Delivery, on_delete=models.CASCADE, related_name='locations', db_index=False)
+    recorded_at = models.DateTimeField()
+    lat = models.FloatField()
+    lng = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Delivery Location'
+        verbose_name_plural = 'Delivery Locations'
+        indexes = [
+            # A delivery's trail in order
+            models.Index(fields=['delivery', 'recorded_at'], name='delivery_location_trail_idx'),
+            # Time ranges, used to prune old points a day at a time
+            models.Index(fields=['recorded_at'], name='delivery_location_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.delivery_id} @ {self.recorded_at}"
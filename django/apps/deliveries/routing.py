@@ -0,0 +1,495 @@
+# apps/deliveries/routing.py
+"""
+Delivery route optimisation.
+
+Stops are ordered per driver by building a haversine distance matrix with
+NumPy, seeding a route by nearest neighbour and improving it with 2-opt and
+or-opt moves. Moves only reconnect a stop to its nearest neighbours and
+their length changes are scored with vectorised NumPy, so a pass over an
+n-stop route costs n small array operations instead of n^2 Python steps.
+Time windows are checked incrementally from the first changed stop and
+abandoned as soon as a candidate cannot pay off.
+
+Routes are open paths: they start at an optional depot (or at whichever
+stop suits the route best) and end at the last stop. Time windows come from
+``Store.hours`` when it can be parsed, otherwise from the delivery's
+scheduled ``delivery_time``. Lateness is penalised rather than forbidden,
+so an infeasible day still gets the least-late plan.
+
+Without time windows 1000 stops optimise in under a second
+(``bench_routing``). Windowed routes of that size keep improving until the
+time limit, which ``solve_routes`` shares between all the drivers of one
+plan.
+"""
+import re
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Planning defaults, overridable per call
+DEFAULT_SPEED_KMH = 30.0
+DEFAULT_SERVICE_MINUTES = 10.0
+DEFAULT_START_MINUTES = 8 * 60
+# Half-width of the window around delivery_time when the store hours are unknown
+DELIVERY_TIME_TOLERANCE_MINUTES = 60
+
+# Each minute late costs as much as this many kilometres of driving
+LATE_PENALTY_KM_PER_MINUTE = 10.0
+
+# Longest run of consecutive stops or-opt tries to relocate
+OR_OPT_MAX_SEGMENT = 3
+# Moves only reconnect a stop to one of its closest stops
+NEIGHBOURS = 12
+# Earlier positions tried for each late stop
+REPAIR_ATTEMPTS = 5
+# Improvement passes over the whole route before settling for the result
+MAX_ROUNDS = 4
+# Seconds of improvement before the best route so far is returned; shared
+# by all the routes of one ``solve_routes`` call
+DEFAULT_TIME_LIMIT = 5.0
+
+_EPSILON = 1e-9
+# Stops scheduled per step when checking a candidate route
+_SCHEDULE_CHUNK = 32
+_TIME = r'(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?'
+_HOURS_PATTERN = re.compile(rf'{_TIME}\s*(?:-|–|to)\s*{_TIME}', re.IGNORECASE)
+
+
+@dataclass
+class Stop:
+    key: object
+    lat: float
+    lng: float
+    # (earliest, latest) arrival in minutes after midnight, None when unconstrained
+    window: tuple = None
+
+
+@dataclass
+class Route:
+    stops: list
+    distance_km: float = 0.0
+    legs_km: list = field(default_factory=list)
+    arrivals: list = field(default_factory=list)
+    late_minutes: float = 0.0
+
+
+def haversine_matrix(lats, lngs, other_lats=None, other_lngs=None):
+    """Great-circle distances in km between every pair of points (vectorised)."""
+    lat1 = np.radians(np.asarray(lats, dtype=float))[:, None]
+    lng1 = np.radians(np.asarray(lngs, dtype=float))[:, None]
+    if other_lats is None:
+        lat2, lng2 = lat1.T, lng1.T
+    else:
+        lat2 = np.radians(np.asarray(other_lats, dtype=float))[None, :]
+        lng2 = np.radians(np.asarray(other_lngs, dtype=float))[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _minutes(hour, minute, meridiem):
+    hour = int(hour) % 24
+    minute = int(minute or 0)
+    if meridiem:
+        meridiem = meridiem.lower().replace('.', '')
+        hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+    return hour * 60 + minute
+
+
+def parse_hours(text):
+    """
+    Parse opening hours such as ``8:00 AM - 6:00 PM`` or ``08:00-17:00``.
+
+    Returns ``(open, close)`` in minutes after midnight, or None when the
+    text has no recognisable range.
+    """
+    match = _HOURS_PATTERN.search(text or '')
+    if not match:
+        return None
+    h1, m1, p1, h2, m2, p2 = match.groups()
+    closes = _minutes(h2, m2, p2)
+    # "1-5 PM" shares the trailing meridiem, "8-5 PM" opens in the morning
+    opens = _minutes(h1, m1, p1 or p2)
+    if not p1 and p2 and opens >= closes:
+        opens = _minutes(h1, m1, 'am')
+    if closes <= opens:
+        return None
+    return opens, closes
+
+
+def time_window(hours, delivery_time=None, tolerance=DELIVERY_TIME_TOLERANCE_MINUTES):
+    """Arrival window of a stop from its store hours, falling back to the scheduled time."""
+    window = parse_hours(hours)
+    if window is None and delivery_time is not None:
+        scheduled = delivery_time.hour * 60 + delivery_time.minute
+        window = (max(0, scheduled - tolerance), scheduled + tolerance)
+    return window
+
+
+class _Problem:
+    """
+    Distance matrix extended with an optional depot and a free end node.
+
+    Paths are stored as ``[start] + stops + [end]`` where ``end`` is a
+    virtual node at zero distance from everything; ``start`` is the depot
+    or another copy of the free node. Moves only touch the interior, so the
+    zero edges model "no edge" at the open ends.
+    """
+
+    def __init__(self, stops, depot, speed_kmh, service_minutes, start_minutes):
+        self.n = len(stops)
+        lats = [stop.lat for stop in stops]
+        lngs = [stop.lng for stop in stops]
+        if depot is not None:
+            lats.append(depot[0])
+            lngs.append(depot[1])
+        size = len(lats) + 1
+        self.free = size - 1
+        self.start = self.n if depot is not None else self.free
+        self.distance = np.zeros((size, size))
+        self.distance[:size - 1, :size - 1] = haversine_matrix(lats, lngs)
+
+        # Closest stops of every node, the only places moves try to reconnect to
+        count = min(NEIGHBOURS, self.n - 1)
+        stop_distances = self.distance[:, :self.n].copy()
+        stop_distances[np.arange(self.n), np.arange(self.n)] = np.inf
+        if count > 0:
+            self.neighbours = np.argpartition(stop_distances, count - 1, axis=1)[:, :count]
+        else:
+            self.neighbours = np.zeros((size, 0), dtype=int)
+
+        self.travel = self.distance * (60.0 / speed_kmh)
+        self.service = service_minutes
+        self.start_minutes = start_minutes
+        self.opens = [stop.window[0] if stop.window else -np.inf for stop in stops] + [-np.inf] * (size - self.n)
+        self.closes = [stop.window[1] if stop.window else np.inf for stop in stops] + [np.inf] * (size - self.n)
+        self.has_windows = any(stop.window for stop in stops)
+
+    def length(self, path):
+        return float(self.distance[path[:-1], path[1:]].sum())
+
+    def timeline(self, path):
+        """Arrival, departure and cumulative lateness at every position of ``path``."""
+        arrivals = [self.start_minutes]
+        departures = [self.start_minutes]
+        late_prefix = [0.0]
+        clock = self.start_minutes
+        late = 0.0
+        legs = self.travel[path[:-2], path[1:-1]].tolist()
+        for node, leg in zip(path[1:-1].tolist(), legs):
+            clock += leg
+            if clock < self.opens[node]:
+                clock = self.opens[node]
+            if clock > self.closes[node]:
+                late += clock - self.closes[node]
+            arrivals.append(clock)
+            late_prefix.append(late)
+            clock += self.service
+            departures.append(clock)
+        return arrivals, departures, late_prefix
+
+
+class _Tour:
+    """The current path with its stop positions, length, schedule and cost."""
+
+    def __init__(self, problem, path, deadline=None):
+        self.problem = problem
+        self.deadline = deadline
+        self.positions = np.zeros(len(problem.distance), dtype=int)
+        self.adopt(path)
+
+    def adopt(self, path):
+        problem = self.problem
+        self.path = path
+        self.positions[path[1:-1]] = np.arange(1, len(path) - 1)
+        self.length = problem.length(path)
+        self.late = 0.0
+        if problem.has_windows:
+            self.arrivals, self.departures, self.late_prefix = problem.timeline(path)
+            self.late = self.late_prefix[-1]
+        self.cost = self.length + LATE_PENALTY_KM_PER_MINUTE * self.late
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def late_of(self, candidate, first, last, limit):
+        """
+        Total lateness of ``candidate``, which differs from the current path
+        only between positions ``first`` and ``last``.
+
+        Past ``last`` the stops are unchanged, so the walk stops as soon as
+        the schedule lines up with the current one again, or once the
+        current lateness still ahead proves the candidate reaches
+        ``limit``. Returns None in that case.
+        """
+        problem = self.problem
+        clock = self.departures[first - 1]
+        late = self.late_prefix[first - 1]
+        end = len(candidate) - 1
+        position = first
+        while position < end:
+            stop = min(position + _SCHEDULE_CHUNK, end)
+            nodes = candidate[position:stop].tolist()
+            legs = problem.travel[candidate[position - 1:stop - 1], candidate[position:stop]].tolist()
+            for node, leg in zip(nodes, legs):
+                clock += leg
+                if clock < problem.opens[node]:
+                    clock = problem.opens[node]
+                if clock > problem.closes[node]:
+                    late += clock - problem.closes[node]
+                    if late >= limit:
+                        return None
+                clock += problem.service
+                if position > last:
+                    ahead = self.late - self.late_prefix[position]
+                    if abs(clock - self.departures[position]) < _EPSILON:
+                        return late + ahead
+                    if clock > self.departures[position] and late + ahead >= limit:
+                        return None
+                position += 1
+        return late
+
+    def try_move(self, candidate, delta, first, last):
+        """
+        Switch to ``candidate`` if it lowers the cost.
+
+        ``delta`` is its change in length; ``first`` and ``last`` bound the
+        positions that differ from the current path.
+        """
+        problem = self.problem
+        length = self.length + delta
+        if problem.has_windows:
+            limit = (self.cost - _EPSILON - length) / LATE_PENALTY_KM_PER_MINUTE
+            if limit <= 0 or self.late_of(candidate, first, last, limit) is None:
+                return False
+        elif delta >= -_EPSILON:
+            return False
+        self.adopt(candidate)
+        return True
+
+
+def nearest_neighbour(problem):
+    """Seed a path by always driving to the closest unvisited stop."""
+    opens = np.array(problem.opens[:problem.n])
+    if problem.start == problem.free and problem.has_windows:
+        # Without a depot, begin with the stop that opens first
+        first = int(np.argmin(opens))
+    elif problem.start == problem.free:
+        # Start from an extreme stop so the path sweeps instead of doubling back
+        first = int(np.argmax(problem.distance[:problem.n, :problem.n].sum(axis=1)))
+    else:
+        first = int(np.argmin(problem.distance[problem.start, :problem.n]))
+
+    visited = np.zeros(problem.n, dtype=bool)
+    order = [first]
+    visited[first] = True
+    for _ in range(problem.n - 1):
+        row = np.where(visited, np.inf, problem.distance[order[-1], :problem.n])
+        nearest = int(np.argmin(row))
+        order.append(nearest)
+        visited[nearest] = True
+    return np.array([problem.start] + order + [problem.free])
+
+
+def two_opt(tour):
+    """Reverse segments while that lowers the cost, trying neighbour reconnections only."""
+    problem = tour.problem
+    distance = problem.distance
+    improved = True
+    while improved and not tour.expired():
+        improved = False
+        last = len(tour.path) - 2
+        for i in range(1, last):
+            if tour.expired():
+                break
+            path = tour.path
+            a, b = path[i - 1], path[i]
+            # New edges a-c or b-d must join near neighbours; reversing the tail is always tried
+            if a == problem.free:
+                ends = np.arange(i + 1, last + 1)
+            else:
+                ends = np.concatenate([
+                    tour.positions[problem.neighbours[a]],
+                    tour.positions[problem.neighbours[b]] - 1,
+                    [last],
+                ])
+                ends = ends[ends > i]
+            if not ends.size:
+                continue
+            c, d = path[ends], path[ends + 1]
+            deltas = distance[a, c] + distance[b, d] - distance[a, b] - distance[c, d]
+            best = int(np.argmin(deltas))
+            if deltas[best] >= -_EPSILON and not problem.has_windows:
+                continue
+            for index in ([best] if deltas[best] < -_EPSILON else []) or np.argsort(deltas)[:3]:
+                end = int(ends[index])
+                candidate = path.copy()
+                candidate[i:end + 1] = path[i:end + 1][::-1]
+                if tour.try_move(candidate, float(deltas[index]), i, end):
+                    improved = True
+                    break
+    return tour
+
+
+def or_opt(tour, max_segment=OR_OPT_MAX_SEGMENT):
+    """Move runs of 1..max_segment stops, possibly reversed, next to their neighbours."""
+    problem = tour.problem
+    distance = problem.distance
+    improved = True
+    while improved and not tour.expired():
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length <= len(tour.path) - 1 and not tour.expired():
+                path = tour.path
+                last_edge = len(path) - 2
+                segment = path[i:i + length]
+                first, last = segment[0], segment[-1]
+                a, b = path[i - 1], path[i + length]
+                removal = distance[a, first] + distance[last, b] - distance[a, b]
+
+                near = np.concatenate([
+                    tour.positions[problem.neighbours[first]],
+                    tour.positions[problem.neighbours[last]],
+                ])
+                edges = np.concatenate([near, near - 1, [0, last_edge]])
+                # Edges touching the segment itself are not insertion points
+                edges = edges[(edges >= 0) & (edges <= last_edge) & ((edges < i - 1) | (edges > i + length - 1))]
+                if not edges.size:
+                    i += 1
+                    continue
+
+                left, right = path[edges], path[edges + 1]
+                forward = distance[left, first] + distance[last, right] - distance[left, right]
+                backward = distance[left, last] + distance[first, right] - distance[left, right]
+                k_forward = int(np.argmin(forward))
+                k_backward = int(np.argmin(backward))
+                reverse = backward[k_backward] < forward[k_forward]
+                k = int(edges[k_backward if reverse else k_forward])
+                delta = float((backward[k_backward] if reverse else forward[k_forward]) - removal)
+                if delta < -_EPSILON:
+                    moved = segment[::-1] if reverse else segment
+                    rest = np.concatenate([path[:i], path[i + length:]])
+                    position = k + 1 if k < i else k + 1 - length
+                    candidate = np.concatenate([rest[:position], moved, rest[position:]])
+                    if tour.try_move(candidate, delta, min(i, position), max(i, position) + length - 1):
+                        improved = True
+                        continue
+                i += 1
+    return tour
+
+
+def repair_windows(tour, attempts=REPAIR_ATTEMPTS):
+    """
+    Move late stops earlier in the route wherever that lowers the cost.
+
+    Only the ``attempts`` cheapest positions that reach the stop before its
+    window closes are tried for each late stop.
+    """
+    problem = tour.problem
+    if not problem.has_windows or tour.late <= 0:
+        return tour
+    distance = problem.distance
+    late_nodes = [
+        int(node) for node, arrival in zip(tour.path[1:-1].tolist(), tour.arrivals[1:])
+        if arrival > problem.closes[node]
+    ]
+    for node in late_nodes:
+        if tour.expired():
+            break
+        index = int(tour.positions[node])
+        if index < 2:
+            continue
+        path = tour.path
+        removal = distance[path[index - 1], node] + distance[node, path[index + 1]] - distance[path[index - 1], path[index + 1]]
+        # Insert between positions p - 1 and p for p in 1..index - 1
+        left, right = path[:index - 1], path[1:index]
+        departures = np.array(tour.departures[:index - 1])
+        reachable = departures + problem.travel[left, node] <= problem.closes[node]
+        deltas = distance[left, node] + distance[node, right] - distance[left, right] - removal
+        deltas[~reachable] = np.inf
+        rest = np.concatenate([path[:index], path[index + 1:]])
+        for position in np.argsort(deltas)[:attempts] + 1:
+            if not np.isfinite(deltas[position - 1]):
+                break
+            candidate = np.concatenate([rest[:position], [node], rest[position:]])
+            if tour.try_move(candidate, float(deltas[position - 1]), int(position), index):
+                break
+        if tour.late <= 0:
+            break
+    return tour
+
+
+def solve_route(
+    stops,
+    depot=None,
+    speed_kmh=DEFAULT_SPEED_KMH,
+    service_minutes=DEFAULT_SERVICE_MINUTES,
+    start_minutes=DEFAULT_START_MINUTES,
+    time_limit=DEFAULT_TIME_LIMIT,
+):
+    """
+    Order ``stops`` into a short route that respects their time windows.
+
+    ``depot`` is an optional ``(lat, lng)`` the route starts from. The
+    improvement phase stops after ``time_limit`` seconds (None for no limit)
+    and keeps the best route found. Returns a Route whose ``stops`` are in
+    visiting order, with per-leg distances and arrival times in minutes
+    after midnight.
+    """
+    if not stops:
+        return Route(stops=[])
+
+    problem = _Problem(stops, depot, speed_kmh, service_minutes, start_minutes)
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+    tour = _Tour(problem, nearest_neighbour(problem), deadline)
+    if problem.n > 2:
+        previous = np.inf
+        rounds = 0
+        while tour.cost < previous - _EPSILON and rounds < MAX_ROUNDS and not tour.expired():
+            previous = tour.cost
+            rounds += 1
+            repair_windows(tour)
+            two_opt(tour)
+            or_opt(tour)
+
+    path = tour.path
+    # Legs into each stop; the first one is zero when there is no depot
+    legs = problem.distance[path[:-2], path[1:-1]]
+    arrivals = problem.timeline(path)[0][1:]
+    return Route(
+        stops=[stops[node] for node in path[1:-1]],
+        distance_km=float(legs.sum()),
+        legs_km=legs.tolist(),
+        arrivals=arrivals,
+        late_minutes=tour.late,
+    )
+
+
+def solve_routes(groups, time_limit=DEFAULT_TIME_LIMIT, **options):
+    """
+    Solve one route per list of stops in ``groups`` within a single
+    ``time_limit`` (None for no limit), so a request planning many
+    drivers takes no longer than one planning a single driver. Each route
+    gets a share of the time left in proportion to its stops. ``options``
+    are passed on to ``solve_route``. Returns the routes in order.
+    """
+    groups = list(groups)
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+    remaining_stops = sum(len(stops) for stops in groups)
+    routes = []
+    for stops in groups:
+        share = None
+        if deadline is not None and remaining_stops:
+            share = max(0.0, deadline - time.monotonic()) * len(stops) / remaining_stops
+        routes.append(solve_route(stops, time_limit=share, **options))
+        remaining_stops -= len(stops)
+    return routes
+
+
+def format_minutes(minutes):
+    """Render minutes after midnight as HH:MM."""
+    minutes = int(round(minutes))
+    return f'{minutes // 60 % 24:02d}:{minutes % 60:02d}'
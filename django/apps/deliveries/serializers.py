@@ -1,13 +1,16 @@
 # apps/deliveries/serializers.py
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Delivery
-from apps.orders.models import Order
+from django.conf import settings
+from .models import Delivery, DeliveryLocation, DeliveryStatusUpdate
+from apps.base.serializers import SparseFieldsetMixin
+from apps.orders.models import Order, OrderItem
 from apps.orders.serializers import OrderSerializer
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class DeliverySerializer(serializers.ModelSerializer):
+class DeliverySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     order = OrderSerializer(read_only=True)
     order_id = serializers.PrimaryKeyRelatedField(
         queryset=Order.objects.all(),
@@ -21,27 +24,26 @@ class DeliverySerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
-    has_signature = serializers.SerializerMethodField()
+    
+    select_related_fields = {
+        'order': ['order__store', 'order__created_by'],
+        'employee': ['employee'],
+    }
+    prefetch_related_fields = {
+        'order': [Prefetch('order__items', queryset=OrderItem.objects.select_related('product'))],
+    }
     
     class Meta:
         model = Delivery
         fields = [
-            'id', 'delivery_id', 'order', 'order_id', 'employee', 'employee_id',
+            'id', 'order', 'order_id', 'employee', 'employee_id',
             'status', 'delivery_date', 'delivery_time', 'notes', 'has_signature',
-            'created_at', 'updated_at'
+            'lat', 'lng', 'location_time', 'created_at', 'updated_at'
+        ]
+        # The position is only moved by GPS uploads (apps.deliveries.tracking)
+        read_only_fields = [
+            'id', 'has_signature', 'lat', 'lng', 'location_time', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'delivery_id', 'created_at', 'updated_at']
-    
-    def get_has_signature(self, obj):
-        return bool(obj.signature)
-    
-    def create(self, validated_data):
-        # Generate delivery ID
-        import uuid
-        validated_data['delivery_id'] = f"DEL-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Create delivery
-        return super().create(validated_data)
 
 class DeliveryStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=Delivery.STATUS_CHOICES)
@@ -56,4 +58,60 @@ class DeliveryStatusUpdateSerializer(serializers.Serializer):
             instance.notes = validated_data['notes']
         
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class DeliveryStatusBatchSerializer(serializers.Serializer):
+    """One entry of a batch of status updates; use with ``many=True``."""
+    delivery_id = serializers.CharField(max_length=50)
+    status = serializers.ChoiceField(choices=Delivery.STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    update_time = serializers.DateTimeField(required=False)
+
+
+class DeliveryStatusEventSerializer(serializers.ModelSerializer):
+    updated_by = serializers.StringRelatedField(read_only=True)
+    
+    class Meta:
+        model = DeliveryStatusUpdate
+        fields = ['id', 'status', 'notes', 'update_time', 'updated_by']
+
+
+class LocationPointSerializer(serializers.Serializer):
+    delivery_id = serializers.CharField(max_length=50)
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    recorded_at = serializers.DateTimeField()
+
+
+class LocationBatchSerializer(serializers.Serializer):
+    points = LocationPointSerializer(many=True, allow_empty=False, max_length=settings.LOCATION_MAX_BATCH)
+
+
+class DeliveryLocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeliveryLocation
+        fields = ['recorded_at', 'lat', 'lng']
+
+
+class DeliveryDispatchSerializer(serializers.Serializer):
+    delivery_date = serializers.DateField()
+    driver_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    start_lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    start_lng = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    start_time = serializers.TimeField(required=False)
+    dry_run = serializers.BooleanField(default=False)
+    
+    def validate_driver_ids(self, value):
+        # One query for all drivers, keeping the requested order without repeats
+        ids = list(dict.fromkeys(value))
+        drivers = User.objects.filter(status='active', is_active=True).in_bulk(ids)
+        missing = [pk for pk in ids if pk not in drivers]
+        if missing:
+            raise serializers.ValidationError(f'Unknown or inactive drivers: {missing}')
+        return [drivers[pk] for pk in ids]
+    
+    def validate(self, attrs):
+        if ('start_lat' in attrs) != ('start_lng' in attrs):
+            raise serializers.ValidationError('start_lat and start_lng must be given together.')
+        return attrs
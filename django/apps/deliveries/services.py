@@ -0,0 +1,79 @@
+# apps/deliveries/services.py
+"""
+Bulk write paths for delivery status.
+
+Status history is an append-only log of DeliveryStatusUpdate events;
+``Delivery.status`` is only the latest of them. Drivers push updates all
+day, so ``update_statuses`` applies a whole batch with one SELECT, one
+``bulk_update`` of the deliveries and one ``bulk_create`` of their
+events, all inside one transaction. Bulk writes skip the per-row
+signals, so ``delivery_statuses_bulk_updated`` is sent afterwards.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Delivery, DeliveryStatusUpdate
+from .signals import delivery_statuses_bulk_updated
+
+
+class UnknownDeliveryError(ValueError):
+    """Raised when status updates reference deliveries that do not exist."""
+
+    def __init__(self, delivery_ids):
+        self.delivery_ids = sorted(delivery_ids)
+        super().__init__(f"Unknown delivery ids: {', '.join(self.delivery_ids)}")
+
+
+@transaction.atomic
+def update_statuses(updates, user=None):
+    """
+    Apply a batch of status updates and append their events.
+
+    ``updates`` are dicts with ``delivery_id`` and ``status`` and optional
+    ``notes`` and ``update_time``, applied in order so the last update of a
+    delivery wins. An event is recorded for every update that changes the
+    status or carries notes. Returns the recorded events.
+    """
+    delivery_ids = {update['delivery_id'] for update in updates}
+    deliveries = Delivery.objects.select_related('order').in_bulk(delivery_ids)
+    missing = delivery_ids - set(deliveries)
+    if missing:
+        raise UnknownDeliveryError(missing)
+
+    now = timezone.now()
+    events = []
+    changed = {}
+    touched = {}
+    for update in updates:
+        delivery = deliveries[update['delivery_id']]
+        status_changed = update['status'] != delivery.status
+        if not status_changed and 'notes' not in update:
+            continue
+        delivery.status = update['status']
+        if 'notes' in update:
+            delivery.notes = update['notes']
+        delivery.updated_at = now
+        touched[delivery.pk] = delivery
+        if status_changed:
+            changed[delivery.pk] = delivery
+        events.append(DeliveryStatusUpdate(
+            delivery=delivery,
+            status=delivery.status,
+            notes=update.get('notes'),
+            update_time=update.get('update_time') or now,
+            updated_by=user,
+        ))
+
+    if touched:
+        Delivery.objects.bulk_update(touched.values(), ['status', 'notes', 'updated_at'])
+        DeliveryStatusUpdate.objects.bulk_create(events)
+    for delivery in touched.values():
+        # Later saves of these instances compare against the stored status
+        delivery._saved_status = delivery.status
+
+    if changed:
+        delivery_statuses_bulk_updated.send(
+            sender=Delivery, deliveries=list(changed.values()), events=events
+        )
+    return events
+
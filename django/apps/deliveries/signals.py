@@ -1,28 +1,58 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, pre_save
+from django.dispatch import Signal, receiver
 from django.utils import timezone
+from . import feed
 from .models import Delivery, DeliveryStatusUpdate
 
+# Sent by apps.deliveries.services.update_statuses, which bypasses the
+# per-row save signals. Receivers get the ``deliveries`` whose status
+# changed and the ``events`` recorded for them.
+delivery_statuses_bulk_updated = Signal()
+
+
+@receiver(post_init, sender=Delivery)
+def remember_delivery_status(sender, instance, **kwargs):
+    """Keep the loaded status and position so saves can tell a change without querying"""
+    instance._saved_status = instance.__dict__.get('status')
+    instance._saved_location = (instance.__dict__.get('lat'), instance.__dict__.get('lng'))
+
+
+@receiver(pre_save, sender=Delivery)
+def detect_status_change(sender, instance, **kwargs):
+    """Flag status and position changes for the post_save receivers"""
+    location = (instance.lat, instance.lng)
+    instance._status_changed = instance._state.adding or instance._saved_status != instance.status
+    instance._location_changed = instance._saved_location != location
+    instance._saved_status = instance.status
+    instance._saved_location = location
+
 
 @receiver(post_save, sender=Delivery)
 def create_status_update(sender, instance, created, **kwargs):
-    """Create status update when delivery is created or status changes"""
-    if created:
-        # Create initial status update
+    """Append a status event when a delivery is created or its status changes"""
+    if instance._status_changed:
         DeliveryStatusUpdate.objects.create(
             delivery=instance,
             status=instance.status,
             update_time=timezone.now(),
-            updated_by=instance.employee
+            updated_by_id=instance.employee_id
         )
-    else:
-        # Check if status has changed by comparing with the latest status update
-        latest_update = instance.status_updates.order_by('-update_time').first()
-        if latest_update and latest_update.status != instance.status:
-            DeliveryStatusUpdate.objects.create(
-                delivery=instance,
-                status=instance.status,
-                update_time=timezone.now(),
-                updated_by=instance.employee
-            )
 
+
+@receiver(post_save, sender=Delivery)
+def publish_delivery_change(sender, instance, **kwargs):
+    """Push status and position changes to the live feed once committed"""
+    events = []
+    if instance._status_changed:
+        events.append(feed.delivery_event(instance, 'status'))
+    if instance._location_changed and not instance._state.adding:
+        events.append(feed.delivery_event(instance, 'location'))
+    if events:
+        transaction.on_commit(lambda: feed.publish(events))
+
+
+@receiver(delivery_statuses_bulk_updated, sender=Delivery)
+def publish_bulk_status_change(sender, deliveries, **kwargs):
+    events = [feed.delivery_event(delivery, 'status') for delivery in deliveries]
+    transaction.on_commit(lambda: feed.publish(events))
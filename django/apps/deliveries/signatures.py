@@ -0,0 +1,196 @@
+# apps/deliveries/signatures.py
+"""
+Delivery signature ingestion.
+
+Uploads are copied in chunks into a spooled temporary file owned by the
+pipeline, whether they arrive as a multipart file or as base64 text, so
+neither the whole payload nor its decoded copy is held in memory. The
+request only checks the image header. Decoding, downscaling and 1-bit
+PNG compression run in a small thread pool when
+``SIGNATURE_PROCESSING_ASYNC`` is on, so slow uploads and large images
+never hold a worker for longer than the copy.
+
+Processed signatures are stored under their SHA-256, so identical
+signatures share one file. The delivery row is updated with a single
+UPDATE that sets ``signature_image`` and ``has_signature`` together.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Delivery
+
+logger = logging.getLogger(__name__)
+
+# Processed signatures fit in this box, which is plenty for a proof of delivery
+MAX_WIDTH = 600
+MAX_HEIGHT = 240
+# Refuse to decode anything larger (decompression bombs)
+MAX_PIXELS = 16_000_000
+# Grey level below which a pixel counts as ink
+INK_THRESHOLD = 160
+STORAGE_DIR = 'signatures'
+
+# Spooled files stay in memory up to this size, then move to disk
+_SPOOL_BYTES = 256 * 1024
+# Multiple of 4 so every slice decodes on its own
+_BASE64_CHUNK = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class SignatureError(ValueError):
+    """The upload is not a usable signature image."""
+
+
+def spool_upload(upload, max_bytes=None):
+    """Copy an uploaded file into a new spooled temporary file, chunk by chunk."""
+    max_bytes = max_bytes or settings.SIGNATURE_MAX_UPLOAD_BYTES
+    if upload.size is not None and upload.size > max_bytes:
+        raise SignatureError(f'Signature is larger than {max_bytes} bytes.')
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+    for chunk in upload.chunks():
+        spool.write(chunk)
+        if spool.tell() > max_bytes:
+            spool.close()
+            raise SignatureError(f'Signature is larger than {max_bytes} bytes.')
+    spool.seek(0)
+    return spool
+
+
+def spool_base64(data, max_bytes=None):
+    """
+    Decode base64 text (optionally a ``data:`` URL) slice by slice into a
+    spooled temporary file.
+    """
+    max_bytes = max_bytes or settings.SIGNATURE_MAX_UPLOAD_BYTES
+    if data.startswith('data:'):
+        data = data.partition(',')[2]
+    # Base64 inflates by 4/3, reject oversize payloads before decoding any of it
+    if len(data) * 3 // 4 > max_bytes + 3:
+        raise SignatureError(f'Signature is larger than {max_bytes} bytes.')
+    data = ''.join(data.split())
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+    try:
+        for offset in range(0, len(data), _BASE64_CHUNK):
+            spool.write(base64.b64decode(data[offset:offset + _BASE64_CHUNK], validate=True))
+    except (binascii.Error, ValueError):
+        spool.close()
+        raise SignatureError('signature_data is not valid base64.')
+    spool.seek(0)
+    return spool
+
+
+def check_header(source):
+    """Raise SignatureError unless ``source`` starts with a readable image header."""
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        raise SignatureError('Signature is not a valid image.')
+    finally:
+        source.seek(0)
+    if width * height > MAX_PIXELS:
+        raise SignatureError('Signature image is too large.')
+
+
+def process_signature(source):
+    """
+    Decode a signature image and return it as a small 1-bit PNG.
+
+    Transparency is flattened onto white, the image is shrunk to fit
+    MAX_WIDTH x MAX_HEIGHT and thresholded to black ink on white.
+    """
+    try:
+        with Image.open(source) as image:
+            if image.width * image.height > MAX_PIXELS:
+                raise SignatureError('Signature image is too large.')
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+                rgba = image.convert('RGBA')
+                image = Image.new('RGBA', rgba.size, 'white')
+                image.alpha_composite(rgba)
+            image = image.convert('L')
+            image.thumbnail((MAX_WIDTH, MAX_HEIGHT), Image.Resampling.LANCZOS)
+            bilevel = image.point(lambda level: 255 if level >= INK_THRESHOLD else 0, mode='1')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise SignatureError('Signature is not a valid image.')
+
+    output = io.BytesIO()
+    bilevel.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def store_signature(delivery_id, content):
+    """
+    Save processed signature bytes, reusing an identical stored file, and
+    point the delivery at it. Returns the storage name.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    name = f'{STORAGE_DIR}/{digest[:2]}/{digest}.png'
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, ContentFile(content))
+        if saved != name:
+            # Another upload stored the same content in between
+            default_storage.delete(saved)
+    Delivery.objects.filter(pk=delivery_id).update(
+        signature_image=name,
+        has_signature=True,
+        updated_at=timezone.now(),
+    )
+    return name
+
+
+def ingest(delivery_id, source):
+    """Process a spooled upload and attach it to the delivery. Closes ``source``."""
+    try:
+        return store_signature(delivery_id, process_signature(source))
+    finally:
+        source.close()
+
+
+def _run_in_background(delivery_id, source):
+    try:
+        return ingest(delivery_id, source)
+    except Exception:
+        logger.exception('Failed to process the signature of delivery %s', delivery_id)
+        raise
+    finally:
+        # Each worker thread opened its own connection, do not leak it
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.SIGNATURE_WORKERS, thread_name_prefix='signature'
+            )
+        return _executor
+
+
+def submit(delivery_id, source):
+    """
+    Process ``source`` for the delivery, in the background when
+    ``SIGNATURE_PROCESSING_ASYNC`` is set. Returns a Future of the storage
+    name; in synchronous mode it is already resolved (or raises).
+    """
+    if settings.SIGNATURE_PROCESSING_ASYNC:
+        return _get_executor().submit(_run_in_background, delivery_id, source)
+    future = Future()
+    future.set_result(ingest(delivery_id, source))
+    return future
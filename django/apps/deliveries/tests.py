@@ -1,3 +1,646 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import threading
+import os
+import tempfile
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image, ImageDraw
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.dashboard.models import RecentActivity
+from apps.orders.models import Order
+from apps.stores.models import Store
+from . import dispatch, feed, routing, services, signatures, tracking
+from .models import Delivery, DeliveryLocation, DeliveryStatusUpdate
+
+User = get_user_model()
+
+
+class FakeClock:
+    """Routing's clock, advanced by the whole time limit of every route solved."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    @contextmanager
+    def patch_routing(self):
+        solve_route = routing.solve_route
+
+        def solve(stops, time_limit=None, **options):
+            route = solve_route(stops, time_limit=None, **options)
+            self.now += time_limit or 0
+            return route
+
+        with mock.patch.object(routing, 'time', mock.Mock(monotonic=lambda: self.now)), \
+                mock.patch.object(routing, 'solve_route', side_effect=solve) as solve_mock:
+            yield solve_mock
+
+
+class RoutingTests(SimpleTestCase):
+    def test_parse_hours(self):
+        self.assertEqual(routing.parse_hours('8:00 AM - 6:00 PM'), (480, 1080))
+        self.assertEqual(routing.parse_hours('08:00-17:00'), (480, 1020))
+        self.assertEqual(routing.parse_hours('8-5 PM'), (480, 1020))
+        self.assertEqual(routing.parse_hours('1-5pm'), (780, 1020))
+        self.assertIsNone(routing.parse_hours(''))
+        self.assertIsNone(routing.parse_hours('Closed'))
+
+    def test_time_window_falls_back_to_delivery_time(self):
+        self.assertEqual(routing.time_window('', time(10, 30)), (570, 690))
+        self.assertEqual(routing.time_window('9:00 AM - 5:00 PM', time(10, 30)), (540, 1020))
+        self.assertIsNone(routing.time_window(''))
+
+    def test_haversine_matrix(self):
+        matrix = routing.haversine_matrix([14.0, 15.0], [121.0, 121.0])
+        self.assertAlmostEqual(matrix[0, 1], 111.2, places=1)
+        self.assertEqual(matrix[0, 0], 0)
+        self.assertAlmostEqual(matrix[1, 0], matrix[0, 1])
+
+    def test_untangles_shuffled_stops_on_a_line(self):
+        order = [5, 0, 9, 3, 7, 1, 8, 2, 6, 4]
+        stops = [routing.Stop(i, 14.5 + i * 0.01, 121.0) for i in order]
+        route = routing.solve_route(stops, depot=(14.49, 121.0))
+        self.assertEqual([stop.key for stop in route.stops], list(range(10)))
+        self.assertAlmostEqual(route.distance_km, routing.haversine_matrix([14.49, 14.59], [121.0, 121.0])[0, 1])
+        self.assertEqual(len(route.legs_km), 10)
+        self.assertEqual(route.late_minutes, 0)
+
+    def test_time_window_overrides_shortest_order(self):
+        # The far stop closes early, so it has to be visited first
+        stops = [
+            routing.Stop('near', 14.51, 121.0),
+            routing.Stop('middle', 14.52, 121.0),
+            routing.Stop('far', 14.60, 121.0, window=(480, 510)),
+        ]
+        route = routing.solve_route(stops, depot=(14.5, 121.0))
+        self.assertEqual(route.stops[0].key, 'far')
+        self.assertEqual(route.late_minutes, 0)
+        self.assertLessEqual(route.arrivals[0], 510)
+
+        unconstrained = routing.solve_route(
+            [routing.Stop(stop.key, stop.lat, stop.lng) for stop in stops], depot=(14.5, 121.0)
+        )
+        self.assertEqual([stop.key for stop in unconstrained.stops], ['near', 'middle', 'far'])
+        self.assertLess(unconstrained.distance_km, route.distance_km)
+
+    def test_visits_every_stop_once(self):
+        stops = [
+            routing.Stop(i, 14.4 + (i * 7919 % 97) / 250, 120.9 + (i * 104729 % 89) / 300, (480, 1080))
+            for i in range(120)
+        ]
+        route = routing.solve_route(stops, depot=(14.6, 121.0))
+        self.assertEqual(sorted(stop.key for stop in route.stops), list(range(120)))
+        self.assertAlmostEqual(route.distance_km, sum(route.legs_km))
+        self.assertEqual(route.arrivals, sorted(route.arrivals))
+
+    def test_routes_share_one_time_limit(self):
+        groups = [[routing.Stop(i, 14.5, 121.0)] * size for i, size in enumerate([1, 3, 0, 4])]
+        clock = FakeClock()
+        with clock.patch_routing() as solve:
+            routes = routing.solve_routes(groups, time_limit=2.0)
+        self.assertEqual(len(routes), 4)
+        # In proportion to the stops, and done by the deadline even when every route uses its share
+        self.assertEqual([call.kwargs['time_limit'] for call in solve.call_args_list], [0.25, 0.75, 0, 1.0])
+        self.assertEqual(clock.now, 2.0)
+
+
+class DispatchTests(SimpleTestCase):
+    def corner_stops(self):
+        # Two tight groups of stops far apart
+        return [
+            routing.Stop(f'{corner}{i}', lat + i * 0.001, lng)
+            for corner, lat, lng in (('a', 14.4, 120.9), ('b', 14.8, 121.2))
+            for i in range(6)
+        ]
+
+    def test_balanced_labels_respect_capacity(self):
+        lats = [14.5 + (i % 10) * 0.01 for i in range(100)]
+        lngs = [121.0 + (i // 10) * 0.01 for i in range(100)]
+        labels = dispatch.balanced_labels(lats, lngs, 7, tolerance=0.1)
+        counts = [int((labels == label).sum()) for label in range(7)]
+        self.assertEqual(sum(counts), 100)
+        self.assertLessEqual(max(counts), 16)
+
+    def test_sweep_labels_are_equal_slices(self):
+        lats = [14.5 + (i % 10) * 0.01 for i in range(100)]
+        lngs = [121.0 + (i // 10) * 0.01 for i in range(100)]
+        labels = dispatch.sweep_labels(lats, lngs, 4)
+        self.assertEqual(sorted(int((labels == label).sum()) for label in range(4)), [25, 25, 25, 25])
+
+    def test_splits_distant_groups_between_drivers(self):
+        for cluster in ('auto', 'kmeans', 'sweep'):
+            plan = dispatch.dispatch(self.corner_stops(), ['x', 'y'], cluster=cluster)
+            groups = sorted({stop.key[0] for stop in route.stops} for route in plan.routes.values())
+            self.assertEqual(groups, [{'a'}, {'b'}], cluster)
+            self.assertAlmostEqual(plan.distance_km, sum(route.distance_km for route in plan.routes.values()))
+
+    def test_more_drivers_than_stops(self):
+        plan = dispatch.dispatch(self.corner_stops()[:2], ['x', 'y', 'z'])
+        self.assertEqual(list(plan.routes), ['x', 'y', 'z'])
+        self.assertEqual(sorted(len(route.stops) for route in plan.routes.values()), [0, 1, 1])
+
+    def test_requires_drivers(self):
+        with self.assertRaises(ValueError):
+            dispatch.dispatch(self.corner_stops(), [])
+
+
+class DeliveryApiTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='dispatch', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.driver = User.objects.create_user(username='driver', password='pass', role='employee')
+        self.day = date(2025, 3, 3)
+
+    def create_delivery(self, index, lat, lng, employee=None, hours='8:00 AM - 6:00 PM'):
+        store = Store.objects.create(
+            name=f'Store {index}', owner_name='Owner', address=f'{index} Street', contact='-',
+            latitude=lat, longitude=lng, hours=hours,
+        )
+        order = Order.objects.create(order_id=f'R{index:011d}', store=store, created_by=self.user)
+        return Delivery.objects.create(
+            id=f'DEL-{index:06d}', order=order, employee=employee,
+            delivery_date=self.day, delivery_time=time(9, 0),
+        )
+
+
+class DeliveryRoutesTests(DeliveryApiTestCase):
+    def test_requires_delivery_date(self):
+        response = self.client.get('/api/deliveries/deliveries/routes/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_invalid_start(self):
+        for params in ({'start_lat': '14.5'}, {'start_lat': 'x', 'start_lng': '121'}, {'start_time': '8am'}):
+            response = self.client.get(
+                '/api/deliveries/deliveries/routes/', {'delivery_date': self.day.isoformat(), **params}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_routes_are_optimised_per_employee(self):
+        for index, offset in enumerate([3, 1, 4, 2]):
+            self.create_delivery(index, 14.5 + offset * 0.01, 121.0, employee=self.driver)
+        self.create_delivery(10, 14.7, 121.1)
+        self.create_delivery(11, None, None, employee=self.driver)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/deliveries/deliveries/routes/', {
+                'delivery_date': self.day.isoformat(),
+                'start_lat': '14.5',
+                'start_lng': '121.0',
+                'start_time': '07:30',
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        routes = {route['employee_id']: route for route in response.data['routes']}
+        self.assertEqual(set(routes), {self.driver.pk, None})
+        driver_route = routes[self.driver.pk]
+        self.assertEqual(driver_route['employee'], str(self.driver))
+        self.assertEqual(
+            [stop['id'] for stop in driver_route['stops']],
+            ['DEL-000001', 'DEL-000003', 'DEL-000000', 'DEL-000002'],
+        )
+        first = driver_route['stops'][0]
+        self.assertEqual(first['sequence'], 1)
+        self.assertEqual(first['order_id'], 'R00000000001')
+        self.assertEqual(first['address'], '1 Street')
+        self.assertEqual(first['eta'], '08:00')
+        self.assertAlmostEqual(first['distance_from_previous_km'], 1.11, places=2)
+        self.assertAlmostEqual(driver_route['distance_km'], 4.45, places=2)
+        self.assertAlmostEqual(
+            response.data['total_distance_km'],
+            sum(route['distance_km'] for route in response.data['routes']),
+        )
+        self.assertEqual([stop['id'] for stop in response.data['unlocated']], ['DEL-000011'])
+
+    def test_drivers_share_the_time_limit(self):
+        drivers = [
+            User.objects.create_user(username=f'driver{i}', password='pass', role='employee') for i in range(3)
+        ]
+        for index in range(9):
+            self.create_delivery(index, 14.5 + index * 0.01, 121.0, employee=drivers[index % 3])
+        clock = FakeClock()
+        with clock.patch_routing() as solve:
+            response = self.client.get('/api/deliveries/deliveries/routes/', {'delivery_date': self.day.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(solve.call_count, 3)
+        self.assertEqual(sum(len(route['stops']) for route in response.data['routes']), 9)
+        self.assertLessEqual(clock.now, routing.DEFAULT_TIME_LIMIT)
+
+    def test_filters_by_employee(self):
+        self.create_delivery(0, 14.5, 121.0, employee=self.driver)
+        self.create_delivery(1, 14.6, 121.0)
+        response = self.client.get(
+            '/api/deliveries/delivery-routes/',
+            {'delivery_date': self.day.isoformat(), 'employee_id': self.driver.pk},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['routes']), 1)
+        self.assertEqual(response.data['routes'][0]['stops'][0]['id'], 'DEL-000000')
+
+
+class DeliveryDispatchTests(DeliveryApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.second = User.objects.create_user(username='driver2', password='pass', role='employee')
+
+    def dispatch(self, **data):
+        return self.client.post('/api/deliveries/deliveries/dispatch/', {
+            'delivery_date': self.day.isoformat(),
+            'driver_ids': [self.driver.pk, self.second.pk],
+            **data,
+        }, format='json')
+
+    def test_assigns_pending_deliveries_with_one_update(self):
+        for index in range(4):
+            self.create_delivery(index, 14.4 + index * 0.001, 120.9)
+            self.create_delivery(10 + index, 14.8 + index * 0.001, 121.2, employee=self.second)
+        delivered = self.create_delivery(20, 14.4, 120.9)
+        Delivery.objects.filter(pk=delivered.pk).update(status='delivered')
+        self.create_delivery(21, None, None)
+
+        # Drivers, deliveries and one bulk update
+        with self.assertNumQueries(3):
+            response = self.dispatch()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['dry_run'])
+        self.assertEqual(len(response.data['routes']), 2)
+        self.assertEqual([stop['id'] for stop in response.data['unlocated']], ['DEL-000021'])
+
+        assigned = dict(Delivery.objects.values_list('pk', 'employee_id'))
+        south = {assigned[f'DEL-{index:06d}'] for index in range(4)}
+        north = {assigned[f'DEL-{index:06d}'] for index in range(10, 14)}
+        self.assertEqual(len(south), 1)
+        self.assertEqual(len(north), 1)
+        self.assertNotEqual(south, north)
+        self.assertIsNone(assigned['DEL-000020'])
+        self.assertIsNone(assigned['DEL-000021'])
+        self.assertEqual(response.data['reassigned'], 4 if north == {self.second.pk} else 8)
+
+    def test_dry_run_leaves_assignments(self):
+        for index in range(3):
+            self.create_delivery(index, 14.4 + index * 0.01, 120.9)
+        response = self.dispatch(dry_run=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['reassigned'], 3)
+        self.assertFalse(Delivery.objects.filter(employee__isnull=False).exists())
+
+    def test_validates_request(self):
+        inactive = User.objects.create_user(username='gone', password='pass', status='inactive')
+        self.assertEqual(self.dispatch(driver_ids=[]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.dispatch(driver_ids=[inactive.pk]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.dispatch(start_lat=14.5).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def signature_png(size=(1200, 400), seed=0):
+    """A transparent canvas export with a few dark strokes."""
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size[0] - 100, 50):
+        draw.line([(40 + i, size[1] // 2 + (i + seed) % 90), (80 + i, 60)], fill=(20, 20, 80, 255), width=5)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class DeliveryStatusLogTests(DeliveryApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.create_delivery(0, 14.5, 121.0, employee=self.driver)
+        self.second = self.create_delivery(1, 14.6, 121.1, employee=self.driver)
+
+    def test_save_records_changes_without_lookup(self):
+        delivery = Delivery.objects.get(pk=self.first.pk)
+        with self.assertNumQueries(1):
+            delivery.notes = 'Gate code 1234'
+            delivery.save()
+        with self.assertNumQueries(2):
+            delivery.status = 'in-transit'
+            delivery.save()
+        self.assertEqual(
+            list(delivery.status_updates.order_by('update_time').values_list('status', flat=True)),
+            ['pending', 'in-transit'],
+        )
+
+    def test_bulk_update_statuses(self):
+        updates = [
+            {'delivery_id': self.first.pk, 'status': 'in-transit'},
+            {'delivery_id': self.second.pk, 'status': 'pending', 'notes': 'Running late'},
+            {'delivery_id': self.first.pk, 'status': 'delivered'},
+        ]
+        # Savepoint, select, update, insert events, insert completion activities, release
+        with self.assertNumQueries(6):
+            events = services.update_statuses(updates, user=self.user)
+        self.assertEqual([event.status for event in events], ['in-transit', 'pending', 'delivered'])
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.status, 'delivered')
+        self.assertEqual(self.second.notes, 'Running late')
+        self.assertEqual(self.first.status_updates.count(), 3)
+        self.assertEqual(
+            RecentActivity.objects.filter(title=f'Delivery {self.first.pk} completed').count(), 1
+        )
+
+    def test_bulk_update_rejects_unknown_delivery(self):
+        with self.assertRaises(services.UnknownDeliveryError):
+            services.update_statuses([{'delivery_id': 'DEL-NOPE', 'status': 'delivered'}])
+        self.assertEqual(DeliveryStatusUpdate.objects.filter(status='delivered').count(), 0)
+
+    def test_status_updates_endpoint(self):
+        response = self.client.post('/api/deliveries/deliveries/status_updates/', [
+            {'delivery_id': self.first.pk, 'status': 'in-transit', 'update_time': '2025-03-03T09:30:00Z'},
+            {'delivery_id': self.second.pk, 'status': 'cancelled', 'notes': 'Store closed'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['events'][1]['notes'], 'Store closed')
+
+        response = self.client.post('/api/deliveries/deliveries/status_updates/', [
+            {'delivery_id': 'DEL-NOPE', 'status': 'delivered'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(DELIVERY_STATUS_MAX_BATCH=2)
+    def test_status_updates_are_capped(self):
+        updates = [{'delivery_id': self.first.pk, 'status': status_} for status_ in ('in-transit', 'pending', 'delivered')]
+        response = self.client.post('/api/deliveries/deliveries/status_updates/', updates, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.first.status_updates.filter(status='delivered').exists())
+        response = self.client.post('/api/deliveries/deliveries/status_updates/', updates[:2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_timeline_is_one_query(self):
+        services.update_statuses([
+            {'delivery_id': self.first.pk, 'status': 'in-transit'},
+            {'delivery_id': self.first.pk, 'status': 'delivered'},
+        ], user=self.user)
+        url = f'/api/deliveries/deliveries/{self.first.pk}/timeline/'
+        self.client.get(url)  # Warm the session and content type caches
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['status'] for event in response.data], ['pending', 'in-transit', 'delivered'])
+        self.assertEqual(response.data[-1]['updated_by'], str(self.user))
+
+        response = self.client.get('/api/deliveries/deliveries/DEL-NOPE/timeline/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DeliveryFeedTests(DeliveryApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.delivery = self.create_delivery(0, 14.5, 121.0, employee=self.driver)
+        patcher = mock.patch.object(feed, 'publish')
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return [event for call in self.publish.call_args_list for event in call.args[0]]
+
+    def test_changes_are_published_on_commit(self):
+        delivery = Delivery.objects.get(pk=self.delivery.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.notes = 'Side entrance'
+            delivery.save()
+        self.assertEqual(self.published(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.status = 'in-transit'
+            delivery.lat, delivery.lng = 14.51, 121.01
+            delivery.save()
+        self.assertEqual([event['type'] for event in self.published()], ['status', 'location'])
+        self.assertEqual(self.published()[1]['lat'], 14.51)
+
+        self.publish.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            services.update_statuses([{'delivery_id': delivery.pk, 'status': 'delivered'}])
+        self.assertEqual(
+            [(event['type'], event['status']) for event in self.published()], [('status', 'delivered')]
+        )
+
+    def test_broker_fans_out_across_threads(self):
+        async def listen():
+            broker = feed.InProcessBroker(max_queued=2)
+            first, second = broker.subscribe(), broker.subscribe()
+            second.close()
+            thread = threading.Thread(target=broker.publish, args=({'type': 'status', 'delivery_id': 'A'},))
+            thread.start()
+            thread.join()
+            event = await first.get(timeout=1)
+            with self.assertRaises(asyncio.TimeoutError):
+                await second.get(timeout=0.05)
+            return event, len(broker)
+
+        event, subscribers = asyncio.run(listen())
+        self.assertEqual(event, {'type': 'status', 'delivery_id': 'A', 'id': 1})
+        self.assertEqual(subscribers, 1)
+
+    def test_format_event(self):
+        message = feed.format_event({'type': 'location', 'id': 7, 'lat': 1.5})
+        self.assertEqual(message, 'id: 7\nevent: location\ndata: {"type":"location","id":7,"lat":1.5}\n\n')
+
+    def test_feed_requires_token(self):
+        response = self.client.get('/api/deliveries/feed/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/api/deliveries/feed/', {'token': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_feed_streams_matching_events(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await self.async_client.get(
+            '/api/deliveries/feed/', {'token': token, 'delivery_id': self.delivery.pk}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        broker = feed.get_broker()
+        broker.publish({'type': 'status', 'delivery_id': 'DEL-OTHER', 'status': 'delivered'})
+        broker.publish({'type': 'status', 'delivery_id': self.delivery.pk, 'status': 'in-transit'})
+        message = (await asyncio.wait_for(anext(chunks), 1)).decode()
+        self.assertIn('event: status', message)
+        data = json.loads(message.rsplit('data: ', 1)[1])
+        self.assertEqual((data['delivery_id'], data['status']), (self.delivery.pk, 'in-transit'))
+        await chunks.aclose()
+
+
+class DeliveryTrackingTests(DeliveryApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.create_delivery(0, 14.5, 121.0, employee=self.driver)
+        self.second = self.create_delivery(1, 14.6, 121.1, employee=self.driver)
+        self.start = datetime(2025, 3, 3, 1, 0, tzinfo=dt_timezone.utc)
+
+    def points(self, delivery, count, offset=0):
+        return [
+            {
+                'delivery_id': delivery.pk,
+                'recorded_at': self.start + timedelta(seconds=5 * (offset + i)),
+                'lat': 14.5 + (offset + i) / 1000,
+                'lng': 121.0,
+            }
+            for i in range(count)
+        ]
+
+    @override_settings(LOCATION_FLUSH_INTERVAL=60, LOCATION_FLUSH_SIZE=100)
+    def test_points_are_buffered_until_flush(self):
+        with mock.patch.object(tracking, '_start_flusher'):
+            with self.assertNumQueries(0):
+                tracking.record(self.points(self.first, 3) + self.points(self.second, 2))
+            self.assertEqual(tracking.pending(), 5)
+
+            # Savepoint, select deliveries, insert points, update deliveries, release
+            with self.assertNumQueries(5):
+                self.assertEqual(tracking.flush(), 5)
+        self.assertEqual(tracking.pending(), 0)
+        self.assertEqual(DeliveryLocation.objects.count(), 5)
+
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.lat, self.first.location_time), (14.502, self.start + timedelta(seconds=10)))
+
+    @override_settings(LOCATION_FLUSH_INTERVAL=60, LOCATION_FLUSH_SIZE=4)
+    def test_full_buffer_flushes_inline(self):
+        with mock.patch.object(tracking, '_start_flusher'):
+            tracking.record(self.points(self.first, 3))
+            self.assertEqual(DeliveryLocation.objects.count(), 0)
+            tracking.record(self.points(self.first, 1, offset=3))
+        self.assertEqual(tracking.pending(), 0)
+        self.assertEqual(DeliveryLocation.objects.count(), 4)
+
+    @override_settings(LOCATION_FLUSH_INTERVAL=0)
+    def test_late_points_keep_the_newest_position(self):
+        tracking.record(self.points(self.first, 1, offset=10))
+        with self.assertLogs('apps.deliveries.tracking', 'WARNING'):
+            tracking.record(self.points(self.first, 2) + [
+                {'delivery_id': 'DEL-NOPE', 'recorded_at': self.start, 'lat': 0.0, 'lng': 0.0},
+            ])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.lat, 14.51)
+        self.assertEqual(self.first.locations.count(), 3)
+        self.assertEqual(DeliveryLocation.objects.count(), 3)
+
+    @override_settings(LOCATION_FLUSH_INTERVAL=0)
+    def test_upload_and_trail(self):
+        points = [dict(point, recorded_at=point['recorded_at'].isoformat()) for point in self.points(self.first, 3)]
+        response = self.client.post('/api/deliveries/deliveries/locations/', {'points': points}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['accepted'], 3)
+
+        response = self.client.post(
+            '/api/deliveries/deliveries/locations/', {'points': [dict(points[0], lat=91)]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = f'/api/deliveries/deliveries/{self.first.pk}/trail/'
+        response = self.client.get(url)
+        self.assertEqual([point['lat'] for point in response.data], [14.5, 14.501, 14.502])
+        response = self.client.get(url, {'since': points[0]['recorded_at']})
+        self.assertEqual(len(response.data), 2)
+        response = self.client.get(url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/deliveries/deliveries/DEL-NOPE/trail/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DeliverySignatureTests(DeliveryApiTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        patcher = override_settings(MEDIA_ROOT=media.name, SIGNATURE_PROCESSING_ASYNC=False)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+        self.delivery = self.create_delivery(0, 14.5, 121.0)
+        Delivery.objects.filter(pk=self.delivery.pk).update(status='delivered')
+
+    def url(self, delivery=None):
+        return f'/api/deliveries/deliveries/{(delivery or self.delivery).pk}/signature/'
+
+    def stored_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _dirs, files in os.walk(os.path.join(self.media_root, signatures.STORAGE_DIR))
+            for name in files
+        ]
+
+    def test_multipart_upload_is_compressed(self):
+        raw = signature_png()
+        response = self.client.post(
+            self.url(), {'signature': SimpleUploadedFile('sig.png', raw, 'image/png')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['has_signature'])
+
+        self.delivery.refresh_from_db()
+        self.assertTrue(self.delivery.has_signature)
+        with Image.open(self.delivery.signature_image.path) as image:
+            self.assertEqual(image.mode, '1')
+            self.assertLessEqual(image.width, signatures.MAX_WIDTH)
+            self.assertLessEqual(image.height, signatures.MAX_HEIGHT)
+        self.assertLess(self.delivery.signature_image.size * 4, len(raw))
+
+    def test_base64_uploads_are_deduplicated(self):
+        data = 'data:image/png;base64,' + base64.b64encode(signature_png()).decode()
+        other = self.create_delivery(1, 14.6, 121.0)
+        Delivery.objects.filter(pk=other.pk).update(status='delivered')
+
+        for delivery in (self.delivery, other):
+            response = self.client.post(self.url(delivery), {'signature_data': data}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        names = set(Delivery.objects.values_list('signature_image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_rejects_bad_uploads(self):
+        for data in (
+            {},
+            {'signature_data': 'not base64!'},
+            {'signature_data': base64.b64encode(b'plain text').decode()},
+        ):
+            response = self.client.post(self.url(), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+        with override_settings(SIGNATURE_MAX_UPLOAD_BYTES=100):
+            response = self.client.post(
+                self.url(), {'signature_data': base64.b64encode(signature_png()).decode()}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        Delivery.objects.filter(pk=self.delivery.pk).update(status='pending')
+        response = self.client.post(
+            self.url(), {'signature_data': base64.b64encode(signature_png()).decode()}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Delivery.objects.filter(has_signature=True).exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_async_processing_returns_accepted(self):
+        executor = mock.Mock()
+        executor.submit.return_value = Future()
+        with override_settings(SIGNATURE_PROCESSING_ASYNC=True), \
+                mock.patch.object(signatures, '_get_executor', return_value=executor):
+            response = self.client.post(
+                self.url(), {'signature_data': base64.b64encode(signature_png()).decode()}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        function, delivery_id, source = executor.submit.call_args.args
+        self.assertEqual(delivery_id, self.delivery.pk)
+
+        # What the worker runs once it picks the job up
+        with mock.patch.object(signatures.connection, 'close'):
+            function(delivery_id, source)
+        self.assertTrue(Delivery.objects.get(pk=self.delivery.pk).has_signature)
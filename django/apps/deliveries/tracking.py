@@ -0,0 +1,136 @@
+# apps/deliveries/tracking.py
+"""
+Driver GPS breadcrumbs.
+
+Drivers post batches of timestamped points. Each request only appends
+them to an in-process buffer; a background thread flushes the buffer
+every ``LOCATION_FLUSH_INTERVAL`` seconds, or the request that fills it
+to ``LOCATION_FLUSH_SIZE`` points flushes it inline. A flush costs three
+queries however many drivers it covers:
+
+* one SELECT of the deliveries the points belong to (points for
+  unknown deliveries are dropped),
+* one ``bulk_create`` into DeliveryLocation,
+* one ``bulk_update`` moving each delivery's ``lat``/``lng`` to its
+  newest point, unless the row already holds a newer one (batches sent
+  late after a connection drop still land in the trail).
+
+Points buffered when a process dies without flushing are lost, which is
+acceptable for breadcrumbs. Setting the interval to 0 writes every batch
+through immediately.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.base.scheduler import PeriodicTask
+from . import feed
+from .models import Delivery, DeliveryLocation
+
+logger = logging.getLogger(__name__)
+
+_buffer = []
+_lock = threading.Lock()
+# Serialises flushes so the newest-point check is not raced by another flush
+_flush_lock = threading.Lock()
+_flusher = None
+
+
+def record(points):
+    """
+    Queue ``points`` — dicts with ``delivery_id``, ``lat``, ``lng`` and
+    ``recorded_at`` — for the next flush. Returns the number queued.
+    """
+    rows = [(point['delivery_id'], point['recorded_at'], point['lat'], point['lng']) for point in points]
+    if settings.LOCATION_FLUSH_INTERVAL <= 0:
+        _write(rows)
+        return len(rows)
+
+    _start_flusher()
+    with _lock:
+        _buffer.extend(rows)
+        full = len(_buffer) >= settings.LOCATION_FLUSH_SIZE
+    if full:
+        flush()
+    return len(rows)
+
+
+def pending():
+    """Number of points waiting for a flush."""
+    return len(_buffer)
+
+
+def flush():
+    """Write every buffered point. Returns the number of points stored."""
+    with _flush_lock:
+        with _lock:
+            rows = _buffer[:]
+            del _buffer[:]
+        return _write(rows)
+
+
+def _write(rows):
+    if not rows:
+        return 0
+    with transaction.atomic():
+        deliveries = Delivery.objects.only(
+            'pk', 'employee_id', 'status', 'lat', 'lng', 'location_time'
+        ).in_bulk({row[0] for row in rows})
+        unknown = len(rows)
+        rows = [row for row in rows if row[0] in deliveries]
+        unknown -= len(rows)
+        if unknown:
+            logger.warning('Dropped %d GPS points for unknown deliveries', unknown)
+
+        DeliveryLocation.objects.bulk_create(
+            [DeliveryLocation(delivery_id=delivery_id, recorded_at=recorded_at, lat=lat, lng=lng)
+             for delivery_id, recorded_at, lat, lng in rows],
+            batch_size=1000,
+        )
+
+        moved = {}
+        now = timezone.now()
+        for delivery_id, recorded_at, lat, lng in rows:
+            delivery = deliveries[delivery_id]
+            if delivery.location_time is None or recorded_at > delivery.location_time:
+                delivery.lat, delivery.lng, delivery.location_time = lat, lng, recorded_at
+                # bulk_update skips auto_now, so stamp it here
+                delivery.updated_at = now
+                moved[delivery_id] = delivery
+        if moved:
+            Delivery.objects.bulk_update(moved.values(), ['lat', 'lng', 'location_time', 'updated_at'])
+            events = [feed.delivery_event(delivery, 'location') for delivery in moved.values()]
+            transaction.on_commit(lambda: feed.publish(events))
+    return len(rows)
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Failed to flush buffered GPS points')
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = PeriodicTask(flush, settings.LOCATION_FLUSH_INTERVAL, name='gps-flush')
+            _flusher.start()
+            atexit.register(_flush_quietly)
+
+
+def stop_flusher():
+    """Stop the background flush thread, flushing what is left."""
+    global _flusher
+    with _lock:
+        flusher, _flusher = _flusher, None
+    if flusher is not None:
+        flusher.stop()
+    flush()
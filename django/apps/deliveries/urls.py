@@ -1,12 +1,13 @@
 # apps/deliveries/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DeliveryViewSet
+from .views import DeliveryViewSet, delivery_feed
 
 router = DefaultRouter()
 router.register(r'deliveries', DeliveryViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('feed/', delivery_feed, name='delivery-feed'),
     path('delivery-routes/', DeliveryViewSet.as_view({'get': 'routes'}), name='delivery-routes'),
 ]
\ No newline at end of file
@@ -3,11 +3,22 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Delivery
-from .serializers import DeliverySerializer, DeliveryStatusUpdateSerializer
-from django.core.files.base import ContentFile
-import base64
-import uuid
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from apps.base.serializers import requested_fields
+from . import dispatch, feed, routing, services, signatures, tracking
+from .models import Delivery, DeliveryLocation, DeliveryStatusUpdate
+from .serializers import (
+    DeliveryDispatchSerializer, DeliveryLocationSerializer, DeliverySerializer,
+    DeliveryStatusBatchSerializer, DeliveryStatusEventSerializer, DeliveryStatusUpdateSerializer,
+    LocationBatchSerializer,
+)
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import datetime
 
 class DeliveryViewSet(viewsets.ModelViewSet):
     queryset = Delivery.objects.all()
@@ -17,6 +28,12 @@ class DeliveryViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Delivery.objects.all()
         
+        # Load only the relations the response will render
+        if self.action in ('list', 'retrieve'):
+            queryset = self.get_serializer_class().setup_eager_loading(
+                queryset, requested_fields(self.request)
+            )
+        
         # Filter by status
         status = self.request.query_params.get('status')
         if status:
@@ -55,56 +72,141 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         # Return updated delivery
         return Response(DeliverySerializer(delivery).data)
     
+    @action(detail=False, methods=['post'])
+    def status_updates(self, request):
+        """
+        Apply a batch of status updates, e.g. a driver's queued updates.
+
+        Takes a list of ``{delivery_id, status, notes?, update_time?}``,
+        applied in order, and returns the events recorded for them. At most
+        ``DELIVERY_STATUS_MAX_BATCH`` updates per request.
+        """
+        serializer = DeliveryStatusBatchSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.DELIVERY_STATUS_MAX_BATCH
+        )
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            events = services.update_statuses(serializer.validated_data, user=request.user)
+        except services.UnknownDeliveryError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'updated': len({event.delivery_id for event in events}),
+            'events': [
+                dict(DeliveryStatusEventSerializer(event).data, delivery_id=event.delivery_id)
+                for event in events
+            ],
+        })
+    
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """A delivery's status history, oldest first, read from the timeline index."""
+        events = list(
+            DeliveryStatusUpdate.objects.filter(delivery_id=pk)
+            .select_related('updated_by')
+            .order_by('update_time', 'id')
+        )
+        # Every delivery has its creation event, so an empty history is rare
+        if not events and not Delivery.objects.filter(pk=pk).exists():
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DeliveryStatusEventSerializer(events, many=True).data)
+    
     @action(detail=True, methods=['post'])
     def signature(self, request, pk=None):
-        """Upload signature for delivery."""
+        """
+        Upload signature for delivery.
+
+        Accepts a multipart ``signature`` file or base64 ``signature_data``.
+        The upload is validated here; decoding and compression happen in the
+        background when SIGNATURE_PROCESSING_ASYNC is on, in which case the
+        response is 202 and ``has_signature`` flips once it is stored.
+        """
         delivery = self.get_object()
         
         # Check if delivery is in delivered status
-        if delivery.status != Delivery.STATUS_DELIVERED:
+        if delivery.status != 'delivered':
             return Response(
                 {'detail': 'Signature can only be uploaded for delivered deliveries.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Handle signature upload
-        if 'signature' in request.FILES:
-            # Handle file upload
-            delivery.signature = request.FILES['signature']
-            delivery.save()
-        elif 'signature_data' in request.data:
-            # Handle base64 encoded image
-            try:
-                signature_data = request.data['signature_data']
-                
-                # Remove data:image/png;base64, prefix if present
-                if ',' in signature_data:
-                    signature_data = signature_data.split(',')[1]
-                
-                # Decode base64 data
-                signature_bytes = base64.b64decode(signature_data)
-                
-                # Generate filename
-                filename = f"signature_{uuid.uuid4().hex}.png"
-                
-                # Save signature
-                delivery.signature.save(filename, ContentFile(signature_bytes), save=True)
-            except Exception as e:
+        try:
+            if 'signature' in request.FILES:
+                source = signatures.spool_upload(request.FILES['signature'])
+            elif request.data.get('signature_data'):
+                source = signatures.spool_base64(request.data['signature_data'])
+            else:
                 return Response(
-                    {'detail': f'Error processing signature: {str(e)}'},
+                    {'detail': 'No signature provided.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-        else:
+            try:
+                signatures.check_header(source)
+            except signatures.SignatureError:
+                source.close()
+                raise
+            future = signatures.submit(delivery.pk, source)
+        except signatures.SignatureError as e:
             return Response(
-                {'detail': 'No signature provided.'},
+                {'detail': f'Error processing signature: {e}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        return Response(DeliverySerializer(delivery).data)
+        if not future.done():
+            return Response(
+                {'id': delivery.pk, 'detail': 'Signature accepted for processing.'},
+                status=status.HTTP_202_ACCEPTED
+            )
+        delivery.refresh_from_db()
+        return Response(DeliverySerializer(delivery, context=self.get_serializer_context()).data)
+    
+    @action(detail=False, methods=['post'])
+    def locations(self, request):
+        """
+        Accept a batch of GPS points, ``{"points": [{delivery_id, lat, lng,
+        recorded_at}, ...]}``. Points are buffered and written in bulk
+        shortly after, so the response is 202.
+        """
+        serializer = LocationBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accepted = tracking.record(serializer.validated_data['points'])
+        return Response({'accepted': accepted}, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=True, methods=['get'])
+    def trail(self, request, pk=None):
+        """
+        A delivery's GPS points, oldest first, optionally only those
+        recorded after ``since``. Points still buffered are not included.
+        """
+        points = DeliveryLocation.objects.filter(delivery_id=pk).order_by('recorded_at')
+        since = request.query_params.get('since')
+        if since:
+            try:
+                parsed = parse_datetime(since)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                return Response(
+                    {'error': 'since must be an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            points = points.filter(recorded_at__gt=parsed)
+        points = list(points.values('recorded_at', 'lat', 'lng'))
+        if not points and not Delivery.objects.filter(pk=pk).exists():
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DeliveryLocationSerializer(points, many=True).data)
     
     @action(detail=False, methods=['get'])
     def routes(self, request):
-        """Get delivery routes for a specific date and employee."""
+        """
+        Optimised delivery routes for a date, one per employee.
+
+        Optional ``start_lat``/``start_lng`` set the depot every route starts
+        from and ``start_time`` (HH:MM) the departure time used for ETAs.
+        Deliveries whose store has no coordinates are listed as unlocated.
+        """
         delivery_date = request.query_params.get('delivery_date')
         employee_id = request.query_params.get('employee_id')
         
@@ -114,26 +216,205 @@ class DeliveryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset = self.get_queryset().filter(delivery_date=delivery_date)
+        try:
+            depot = self._route_depot(request.query_params)
+            start_minutes = self._route_start(request.query_params.get('start_time'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.get_queryset().filter(delivery_date=delivery_date).select_related(
+            'order__store', 'employee'
+        ).order_by('employee_id', 'delivery_time', 'pk')
         
         if employee_id:
             queryset = queryset.filter(employee_id=employee_id)
         
-        # Get store locations for route planning
-        routes = []
+        # Group located deliveries into one set of stops per employee
+        groups = {}
+        unlocated = []
         for delivery in queryset:
-            store = delivery.order.store
-            if store.lat and store.lng:
-                routes.append({
-                    'id': delivery.id,
-                    'delivery_id': delivery.delivery_id,
-                    'order_id': delivery.order.order_id,
-                    'store_name': store.name,
-                    'address': store.location,
-                    'lat': store.lat,
-                    'lng': store.lng,
-                    'status': delivery.status,
-                    'delivery_time': delivery.delivery_time.strftime('%H:%M')
-                })
-        
-        return Response(routes)
\ No newline at end of file
+            stop = self._delivery_stop(delivery)
+            if stop is None:
+                unlocated.append(self._route_stop(delivery))
+                continue
+            groups.setdefault(delivery.employee_id, (delivery.employee, []))[1].append(stop)
+        
+        # One time budget for the whole plan, however many drivers it has
+        solved = routing.solve_routes(
+            [stops for _, stops in groups.values()], depot=depot, start_minutes=start_minutes
+        )
+        routes = [
+            (employee_id, employee, route)
+            for (employee_id, (employee, _)), route in zip(groups.items(), solved)
+        ]
+        return Response(self._plan_payload(delivery_date, routes, unlocated))
+    
+    @action(detail=False, methods=['post'], url_path='dispatch')
+    def plan_dispatch(self, request):
+        """
+        Assign a day's pending deliveries across the given drivers.
+
+        Deliveries are clustered by location into one balanced share per
+        driver, each share is routed, and the assignments are saved with a
+        single bulk update (skipped with ``dry_run``). Deliveries without
+        coordinates are left as they are and listed as unlocated.
+        """
+        serializer = DeliveryDispatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        drivers = data['driver_ids']
+        depot = (data['start_lat'], data['start_lng']) if 'start_lat' in data else None
+        start = data.get('start_time')
+        start_minutes = start.hour * 60 + start.minute if start else routing.DEFAULT_START_MINUTES
+        
+        deliveries = Delivery.objects.filter(
+            delivery_date=data['delivery_date'], status='pending'
+        ).select_related('order__store', 'employee').order_by('delivery_time', 'pk')
+        
+        stops = []
+        unlocated = []
+        for delivery in deliveries:
+            stop = self._delivery_stop(delivery)
+            if stop is None:
+                unlocated.append(self._route_stop(delivery))
+            else:
+                stops.append(stop)
+        
+        plan = dispatch.dispatch(stops, drivers, depot=depot, start_minutes=start_minutes)
+        
+        changed = []
+        now = timezone.now()
+        for driver, route in plan.routes.items():
+            for stop in route.stops:
+                delivery = stop.key
+                if delivery.employee_id != driver.pk:
+                    delivery.employee = driver
+                    # bulk_update skips auto_now, so stamp it here
+                    delivery.updated_at = now
+                    changed.append(delivery)
+        if changed and not data['dry_run']:
+            Delivery.objects.bulk_update(changed, ['employee', 'updated_at'])
+        
+        routes = [(driver.pk, driver, route) for driver, route in plan.routes.items()]
+        payload = self._plan_payload(data['delivery_date'].isoformat(), routes, unlocated)
+        payload.update({'reassigned': len(changed), 'dry_run': data['dry_run']})
+        return Response(payload)
+    
+    @staticmethod
+    def _delivery_stop(delivery):
+        """A routing stop for a delivery, or None when it has no coordinates."""
+        store = delivery.order.store
+        lat = delivery.lat if delivery.lat is not None else store.latitude
+        lng = delivery.lng if delivery.lng is not None else store.longitude
+        if lat is None or lng is None:
+            return None
+        return routing.Stop(delivery, lat, lng, routing.time_window(store.hours, delivery.delivery_time))
+    
+    def _plan_payload(self, delivery_date, routes, unlocated):
+        """Response body for ``(employee_id, employee, Route)`` triples."""
+        routes = [
+            {
+                'employee_id': employee_id,
+                'employee': str(employee) if employee else None,
+                'distance_km': round(route.distance_km, 2),
+                'late_minutes': round(route.late_minutes),
+                'stops': [
+                    {
+                        'sequence': sequence,
+                        **self._route_stop(stop.key),
+                        'lat': stop.lat,
+                        'lng': stop.lng,
+                        'eta': routing.format_minutes(arrival),
+                        'distance_from_previous_km': round(leg, 2),
+                    }
+                    for sequence, (stop, arrival, leg) in enumerate(
+                        zip(route.stops, route.arrivals, route.legs_km), start=1
+                    )
+                ],
+            }
+            for employee_id, employee, route in routes
+        ]
+        return {
+            'delivery_date': delivery_date,
+            'total_distance_km': round(sum(route['distance_km'] for route in routes), 2),
+            'routes': routes,
+            'unlocated': unlocated,
+        }
+    
+    @staticmethod
+    def _route_stop(delivery):
+        store = delivery.order.store
+        return {
+            'id': delivery.id,
+            'order_id': delivery.order.order_id,
+            'store_name': store.name,
+            'address': store.address,
+            'status': delivery.status,
+            'delivery_time': delivery.delivery_time.strftime('%H:%M'),
+        }
+    
+    @staticmethod
+    def _route_depot(params):
+        start_lat = params.get('start_lat')
+        start_lng = params.get('start_lng')
+        if start_lat is None and start_lng is None:
+            return None
+        try:
+            return float(start_lat), float(start_lng)
+        except (TypeError, ValueError):
+            raise ValueError('start_lat and start_lng must both be numbers.')
+    
+    @staticmethod
+    def _route_start(start_time):
+        if not start_time:
+            return routing.DEFAULT_START_MINUTES
+        try:
+            parsed = datetime.strptime(start_time, '%H:%M')
+        except ValueError:
+            raise ValueError('start_time must be in HH:MM format.')
+        return parsed.hour * 60 + parsed.minute
+
+
+
+def _feed_user(request):
+    """
+    Authenticate a feed request by its JWT, taken from the Authorization
+    header or, since EventSource cannot set headers, the ``token`` parameter.
+    """
+    authentication = JWTAuthentication()
+    token = request.GET.get('token')
+    if token:
+        return authentication.get_user(authentication.get_validated_token(token))
+    result = authentication.authenticate(request)
+    return result[0] if result else None
+
+
+async def delivery_feed(request):
+    """
+    Server-Sent Events stream of delivery status and position changes.
+
+    Optional ``employee_id`` and ``delivery_id`` (comma separated) narrow
+    the stream. See apps.deliveries.feed.
+    """
+    try:
+        user = await sync_to_async(_feed_user)(request)
+    except (AuthenticationFailed, InvalidToken):
+        return JsonResponse({'detail': 'Given token not valid for any token type'}, status=401)
+    if user is None or not user.is_active:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    employee_id = request.GET.get('employee_id')
+    delivery_ids = {value for value in request.GET.get('delivery_id', '').split(',') if value}
+
+    def accept(event):
+        if employee_id and str(event.get('employee_id')) != employee_id:
+            return False
+        return not delivery_ids or event.get('delivery_id') in delivery_ids
+
+    # Subscribe before responding so no event is missed in between
+    subscription = feed.get_broker().subscribe()
+    response = StreamingHttpResponse(feed.stream(subscription, accept), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,6 +1,6 @@
 # apps/inventory/admin.py
 from django.contrib import admin
-from .models import Inventory, InventoryTransaction
+from .models import Inventory, InventoryTransaction, LowStockAlert
 
 @admin.register(Inventory)
 class InventoryAdmin(admin.ModelAdmin):
@@ -14,4 +14,10 @@ class InventoryAdmin(admin.ModelAdmin):
 @admin.register(InventoryTransaction)
 class InventoryTransactionAdmin(admin.ModelAdmin):
     list_display = ('product', 'quantity', 'transaction_type', 'created_at')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(admin.ModelAdmin):
+    list_display = ('product', 'stock', 'threshold', 'raised_at', 'resolved_at')
+    list_select_related = ('product',)
+    ordering = ('-raised_at',)
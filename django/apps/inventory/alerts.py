@@ -0,0 +1,76 @@
+# apps/inventory/alerts.py
+"""
+Low-stock alerts.
+
+Whatever changes stock or a threshold reports each affected row's state
+before and after to ``record_crossings``, which raises a LowStockAlert
+when a product falls to or below its threshold and resolves it when the
+product climbs back above. Rows that stay on one side record nothing, so
+an alert is written once per crossing however many changes follow, and
+the common case costs no query at all.
+
+``low_stock_crossed`` is sent with the raised alerts and the product ids
+that recovered.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import LowStockAlert
+from .signals import low_stock_crossed
+
+
+def record_crossings(states):
+    """
+    Record threshold crossings from ``(product_id, was_low, stock,
+    threshold)`` tuples, ``stock`` and ``threshold`` being the values
+    after the change. Returns the raised alerts.
+    """
+    raised = []
+    recovered = []
+    for product_id, was_low, stock, threshold in states:
+        is_low = stock <= threshold
+        if is_low and not was_low:
+            raised.append(LowStockAlert(product_id=product_id, stock=stock, threshold=threshold))
+        elif was_low and not is_low:
+            recovered.append(product_id)
+    if not raised and not recovered:
+        return []
+
+    if recovered:
+        LowStockAlert.objects.filter(product_id__in=recovered, resolved_at__isnull=True).update(
+            resolved_at=timezone.now()
+        )
+    if raised:
+        raised = _insert_new(raised)
+    if not raised and not recovered:
+        return []
+    low_stock_crossed.send(sender=LowStockAlert, raised=raised, recovered=recovered)
+    return raised
+
+
+def _insert_new(alerts):
+    """
+    Insert the alerts of products without an open one and return those
+    inserted; a product already holding an open alert keeps it.
+    """
+    open_ids = set(
+        LowStockAlert.objects.filter(
+            product_id__in=[alert.product_id for alert in alerts], resolved_at__isnull=True
+        ).values_list('product_id', flat=True)
+    )
+    alerts = [alert for alert in alerts if alert.product_id not in open_ids]
+    try:
+        with transaction.atomic():
+            return LowStockAlert.objects.bulk_create(alerts)
+    except IntegrityError:
+        pass
+    # Another writer opened one of them since the check, so one at a time
+    inserted = []
+    for alert in alerts:
+        try:
+            with transaction.atomic():
+                alert.save()
+        except IntegrityError:
+            continue
+        inserted.append(alert)
+    return inserted
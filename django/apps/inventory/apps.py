@@ -7,4 +7,4 @@ class InventoryConfig(AppConfig):
 
     def ready(self):
         # Import signals
-        import apps.inventory.signals
\ No newline at end of file
+        import apps.inventory.signals
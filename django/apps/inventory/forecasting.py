@@ -0,0 +1,217 @@
+# apps/inventory/forecasting.py
+"""
+Demand forecasting and reorder points.
+
+Daily demand per product comes from the sales rollup (order items per
+store, product and day, cancelled orders excluded) and is loaded into one
+products x days matrix, so every step below is vectorised NumPy over the
+whole catalog at once:
+
+* Weekday seasonality. Stores are served on a fixed ``Store.day``, so a
+  product's demand clusters on the weekdays its stores order. Each
+  product gets seven weekday indices (mean demand on that weekday over
+  the overall mean), shrunk towards the catalog-wide profile when the
+  product sold in only a few weeks, and scaled to average 1.
+* A rolling seven-day mean has no weekday pattern left in it;
+  exponentially smoothing it gives the level (units per day), and the
+  one-step-ahead errors of the same pass give the demand's spread.
+* The forecast for a day is the level times that weekday's index. The
+  reorder point covers the lead time's forecast plus safety stock for
+  the service level; the suggested order tops stock up to cover the lead
+  time and one review period.
+
+``run`` writes the reorder point into ``Inventory.low_stock_threshold``
+(so low-stock alerts fire when it is time to reorder), along with the
+daily demand and suggested order quantity, with one ``bulk_update``.
+Products that sold nothing in the window keep their threshold.
+"""
+import math
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.dashboard.models import DailySalesRollup
+from .alerts import record_crossings
+from .models import Inventory
+
+# Days of sales history the forecast learns from (twelve weekly cycles)
+DEFAULT_HISTORY_DAYS = 84
+# Smoothing factor of the level; higher follows recent days more closely
+DEFAULT_ALPHA = 0.2
+# Days between placing a purchase order and the stock arriving
+DEFAULT_LEAD_TIME_DAYS = 7
+# Days between two purchase orders of the same product
+DEFAULT_REVIEW_DAYS = 7
+# Chance of not running out before a reorder arrives
+DEFAULT_SERVICE_LEVEL = 0.95
+# Weeks of sales the catalog-wide weekday profile counts for
+PRIOR_WEEKS = 2
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Forecast:
+    product_ids: np.ndarray
+    # Smoothed units per day at the end of the history
+    level: np.ndarray
+    # Products x 7 weekday indices, Monday first
+    seasonal: np.ndarray
+    # Standard deviation of one day's demand around the forecast
+    sigma: np.ndarray
+    # Units sold over the history window
+    sold: np.ndarray
+    # First forecast day
+    start: object
+
+    def daily(self, days):
+        """Products x ``days`` matrix of forecast demand from ``start`` on."""
+        weekdays = (self.start.weekday() + np.arange(days)) % 7
+        return self.level[:, None] * self.seasonal[:, weekdays]
+
+
+def demand_matrix(product_ids, start, days):
+    """Products x days matrix of units sold from ``start``, one grouped query."""
+    index = {product_id: row for row, product_id in enumerate(product_ids)}
+    demand = np.zeros((len(product_ids), days))
+    rows = (
+        DailySalesRollup.objects.filter(date__gte=start, date__lt=start + timedelta(days=days))
+        .values('product_id', 'date')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+        .values_list('product_id', 'date', 'quantity')
+    )
+    for product_id, day, quantity in rows:
+        if product_id in index:
+            demand[index[product_id], (day - start).days] = quantity
+    return demand
+
+
+def weekday_profile(demand, first_weekday):
+    """Products x 7 seasonal indices averaging 1, shrunk towards the catalog."""
+    weekdays = (first_weekday + np.arange(demand.shape[1])) % 7
+    # Mean demand per weekday: products x 7, and the same for the catalog
+    counts = np.bincount(weekdays, minlength=7)
+    by_weekday = np.stack([demand[:, weekdays == weekday].sum(axis=1) for weekday in range(7)], axis=1)
+    by_weekday /= np.maximum(counts, 1)
+    overall = by_weekday.mean(axis=1, keepdims=True)
+    catalog = by_weekday.sum(axis=0)
+    prior = catalog / catalog.mean() if catalog.mean() > 0 else np.ones(7)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw = np.where(overall > 0, by_weekday / overall, prior)
+    # The weeks a product sold in decide how far its own profile is trusted
+    weekly = np.add.reduceat(demand, np.arange(0, demand.shape[1], 7), axis=1) if demand.size else demand
+    weeks = (weekly > 0).sum(axis=1, keepdims=True)
+    seasonal = (weeks * raw + PRIOR_WEEKS * prior) / (weeks + PRIOR_WEEKS)
+    mean = seasonal.mean(axis=1, keepdims=True)
+    return np.divide(seasonal, mean, out=np.ones_like(seasonal), where=mean > 0)
+
+
+def smooth(demand, seasonal, first_weekday, alpha=DEFAULT_ALPHA):
+    """
+    Exponentially smooth the rolling seven-day mean demand of every
+    product at once. Returns the final levels and the spread of the
+    one-step-ahead daily errors.
+    """
+    products, days = demand.shape
+    if days < 7:
+        return demand.mean(axis=1) if days else np.zeros(products), np.zeros(products)
+    weekdays = (first_weekday + np.arange(days)) % 7
+    factors = seasonal[:, weekdays]
+    totals = np.cumsum(demand, axis=1)
+    rolling = totals[:, 6:].copy()
+    rolling[:, 1:] -= totals[:, :-7]
+    rolling /= 7
+
+    # rolling[:, i] is the week ending on day i + 6
+    level = rolling[:, 0]
+    squared_errors = np.zeros(products)
+    for day in range(7, days):
+        error = demand[:, day] - level * factors[:, day]
+        squared_errors += error * error
+        level = alpha * rolling[:, day - 6] + (1 - alpha) * level
+    return level, np.sqrt(squared_errors / max(days - 7, 1))
+
+
+def forecast(product_ids, today=None, history_days=DEFAULT_HISTORY_DAYS, alpha=DEFAULT_ALPHA):
+    """Fit every product in ``product_ids`` on the ``history_days`` before ``today``."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=history_days)
+    product_ids = np.asarray(product_ids)
+    demand = demand_matrix(product_ids.tolist(), start, history_days)
+    seasonal = weekday_profile(demand, start.weekday())
+    level, sigma = smooth(demand, seasonal, start.weekday(), alpha)
+    return Forecast(product_ids, level, seasonal, sigma, demand.sum(axis=1), today)
+
+
+def reorder_plan(fit, stock, lead_time=DEFAULT_LEAD_TIME_DAYS, review_days=DEFAULT_REVIEW_DAYS,
+                 service_level=DEFAULT_SERVICE_LEVEL):
+    """
+    Reorder points and suggested order quantities (integer arrays) for
+    the products of ``fit`` holding ``stock`` units.
+    """
+    z = NormalDist().inv_cdf(service_level)
+    daily = fit.daily(lead_time + review_days)
+    # Day-to-day errors are taken as independent, so the spread grows with sqrt(days)
+    reorder_point = daily[:, :lead_time].sum(axis=1) + z * fit.sigma * math.sqrt(lead_time)
+    order_up_to = daily.sum(axis=1) + z * fit.sigma * math.sqrt(lead_time + review_days)
+    reorder_point = np.ceil(reorder_point).astype(int)
+    order_quantity = np.maximum(np.ceil(order_up_to).astype(int) - np.asarray(stock), 0)
+    return reorder_point, order_quantity
+
+
+def run(today=None, history_days=DEFAULT_HISTORY_DAYS, lead_time=DEFAULT_LEAD_TIME_DAYS,
+        review_days=DEFAULT_REVIEW_DAYS, service_level=DEFAULT_SERVICE_LEVEL, alpha=DEFAULT_ALPHA,
+        dry_run=False):
+    """
+    Forecast the whole catalog and store the results. Returns a summary
+    dict; with ``dry_run`` nothing is written.
+    """
+    started = time.perf_counter()
+    inventories = list(
+        Inventory.objects.filter(product__is_active=True)
+        .only('pk', 'product_id', 'stock', 'low_stock_threshold')
+        .order_by('product_id')
+    )
+    fit = forecast([inventory.product_id for inventory in inventories], today, history_days, alpha)
+    reorder_point, order_quantity = reorder_plan(
+        fit, [inventory.stock for inventory in inventories], lead_time, review_days, service_level
+    )
+
+    daily_demand = fit.daily(7).mean(axis=1)
+    now = timezone.now()
+    updated = []
+    crossings = []
+    for row in np.flatnonzero(fit.sold > 0).tolist():
+        inventory = inventories[row]
+        was_low = inventory.is_low_stock
+        inventory.low_stock_threshold = int(reorder_point[row])
+        inventory.reorder_quantity = int(order_quantity[row])
+        inventory.daily_demand = round(float(daily_demand[row]), 3)
+        inventory.forecast_at = now
+        updated.append(inventory)
+        crossings.append((inventory.product_id, was_low, inventory.stock, inventory.low_stock_threshold))
+
+    if updated and not dry_run:
+        with transaction.atomic():
+            Inventory.objects.bulk_update(
+                updated, ['low_stock_threshold', 'reorder_quantity', 'daily_demand', 'forecast_at'],
+                batch_size=BATCH_SIZE,
+            )
+            # New thresholds can put stock on the other side of them
+            record_crossings(crossings)
+
+    return {
+        'products': len(inventories),
+        'forecast': len(updated),
+        'to_reorder': sum(1 for inventory in updated if inventory.is_low_stock),
+        'seconds': time.perf_counter() - started,
+        'dry_run': dry_run,
+    }
@@ -0,0 +1,241 @@
+# apps/inventory/ledger.py
+"""
+Point-in-time stock.
+
+``Inventory.stock`` only holds the present. Past stock follows from the
+InventoryTransaction ledger, which records every change, but replaying it
+grows with the history. Instead the ledger is checkpointed once a day
+into InventorySnapshot (each product's stock at the end of the day) and
+stock at any moment is the last snapshot before it plus the transactions
+in between, at most a day of them:
+
+* ``take_snapshots(day)`` writes the snapshots of one day, run shortly
+  after midnight by the ``snapshot_inventory`` command (or the
+  ``run_schedulers`` job enabled by ``INVENTORY_SNAPSHOT_INTERVAL``);
+  ``backfill`` fills a range of past days in one pass over the ledger.
+* ``stock_at(moment)`` answers "what was the stock at X" for a set of
+  products with a constant number of queries.
+* ``history(product_id, start, end)`` gives one product's end-of-day
+  stock for charts.
+
+Products without a snapshot before the moment (for example before the
+first checkpoint) fall back to replaying the ledger backwards from the
+current stock.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.base.dates import day_bounds
+from apps.base.scheduler import PeriodicTask
+from .models import Inventory, InventorySnapshot, InventoryTransaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+_scheduler = None
+
+
+def _net(queryset, *group_by):
+    """Signed sum of ``queryset``'s transactions, grouped by the given fields."""
+    signed = Case(
+        When(transaction_type=InventoryTransaction.INCREASE, then=F('quantity')),
+        default=-F('quantity'),
+        output_field=IntegerField(),
+    )
+    return queryset.values(*group_by).annotate(net=Sum(signed)).order_by()
+
+
+def _snapshot_end(day):
+    """The moment a snapshot of ``day`` describes: the start of the next day."""
+    return day_bounds(day)[1]
+
+
+def _save(snapshots):
+    InventorySnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['product', 'date'],
+        update_fields=['stock'],
+        batch_size=BATCH_SIZE,
+    )
+    return len(snapshots)
+
+
+def take_snapshots(day=None):
+    """
+    Snapshot every product's stock at the end of ``day`` (yesterday by
+    default), overwriting existing snapshots of that day. Returns the
+    number written.
+
+    The stock is the current stock minus what the ledger moved since, so
+    it should run soon after the day ends.
+    """
+    day = day or timezone.localdate() - timedelta(days=1)
+    stock = dict(Inventory.objects.values_list('product_id', 'stock'))
+    moved = {
+        row['product_id']: row['net']
+        for row in _net(
+            InventoryTransaction.objects.filter(created_at__gte=_snapshot_end(day)), 'product_id'
+        )
+    }
+    return _save([
+        InventorySnapshot(product_id=product_id, date=day, stock=current - moved.get(product_id, 0))
+        for product_id, current in stock.items()
+    ])
+
+
+def backfill(start, end=None):
+    """
+    Snapshot every day from ``start`` to ``end`` (yesterday by default),
+    walking back from the current stock with one grouped pass over the
+    ledger since ``start``. Returns the number of snapshots written.
+    """
+    end = end or timezone.localdate() - timedelta(days=1)
+    if start > end:
+        return 0
+    stock = dict(Inventory.objects.values_list('product_id', 'stock'))
+    daily = defaultdict(dict)
+    for row in _net(
+        InventoryTransaction.objects.filter(created_at__gte=_snapshot_end(start))
+        .annotate(day=TruncDate('created_at')),
+        'day', 'product_id',
+    ):
+        daily[row['day']][row['product_id']] = row['net']
+
+    # Undo every day after ``end`` first, then step back one day at a time
+    for day in [day for day in daily if day > end]:
+        for product_id, net in daily.pop(day).items():
+            stock[product_id] = stock.get(product_id, 0) - net
+    snapshots = []
+    day = end
+    while day >= start:
+        snapshots.extend(
+            InventorySnapshot(product_id=product_id, date=day, stock=current)
+            for product_id, current in stock.items()
+        )
+        # The stock at the end of the previous day is this one minus its changes
+        for product_id, net in daily.get(day, {}).items():
+            stock[product_id] = stock.get(product_id, 0) - net
+        day -= timedelta(days=1)
+    return _save(snapshots)
+
+
+def stock_at(moment, product_ids=None):
+    """
+    ``{product_id: stock}`` at ``moment`` (an aware datetime) for
+    ``product_ids``, or every product with an inventory row.
+    """
+    inventories = Inventory.objects.all()
+    if product_ids is not None:
+        inventories = inventories.filter(product_id__in=product_ids)
+    if moment >= timezone.now():
+        return dict(inventories.values_list('product_id', 'stock'))
+
+    # The last snapshot describing a moment no later than ``moment``
+    last_day = timezone.localtime(moment).date() - timedelta(days=1)
+    latest = InventorySnapshot.objects.filter(
+        product=OuterRef('product_id'), date__lte=last_day
+    ).order_by('-date')
+    rows = inventories.annotate(
+        snapshot_date=Subquery(latest.values('date')[:1]),
+        snapshot_stock=Subquery(latest.values('stock')[:1]),
+    ).values_list('product_id', 'stock', 'snapshot_date', 'snapshot_stock')
+
+    stock = {}
+    by_date = defaultdict(list)
+    unsnapshotted = []
+    for product_id, current, snapshot_date, snapshot_stock in rows:
+        if snapshot_date is None:
+            stock[product_id] = current
+            unsnapshotted.append(product_id)
+        else:
+            stock[product_id] = snapshot_stock
+            by_date[snapshot_date].append(product_id)
+
+    # Snapshots are daily, so this is one query, or a few after missed days
+    for day, ids in by_date.items():
+        for row in _net(
+            InventoryTransaction.objects.filter(
+                product_id__in=ids, created_at__gte=_snapshot_end(day), created_at__lt=moment
+            ),
+            'product_id',
+        ):
+            stock[row['product_id']] += row['net']
+    if unsnapshotted:
+        for row in _net(
+            InventoryTransaction.objects.filter(product_id__in=unsnapshotted, created_at__gte=moment),
+            'product_id',
+        ):
+            stock[row['product_id']] -= row['net']
+    return stock
+
+
+def history(product_id, start, end):
+    """
+    ``[(day, stock)]`` with the product's stock at the end of each day
+    from ``start`` to ``end``. Days without a snapshot (today, missed
+    checkpoints) are completed from the ledger.
+    """
+    snapshots = dict(
+        InventorySnapshot.objects.filter(product_id=product_id, date__range=(start, end))
+        .values_list('date', 'stock')
+    )
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    missing = [day for day in days if day not in snapshots]
+    if not missing:
+        return [(day, snapshots[day]) for day in days]
+
+    first, last = day_bounds(missing[0])[0], day_bounds(missing[-1])[1]
+    daily = {
+        row['day']: row['net']
+        for row in _net(
+            InventoryTransaction.objects.filter(product_id=product_id, created_at__gte=first, created_at__lt=last)
+            .annotate(day=TruncDate('created_at')),
+            'day',
+        )
+    }
+    series = []
+    previous = None
+    for day in days:
+        if day in snapshots:
+            previous = snapshots[day]
+        else:
+            if previous is None:
+                previous = stock_at(day_bounds(day)[0], [product_id]).get(product_id, 0)
+            previous += daily.get(day, 0)
+        series.append((day, previous))
+    return series
+
+
+def take_yesterdays_snapshots():
+    """Checkpoint yesterday unless it already is; cheap enough to run often."""
+    yesterday = timezone.localdate() - timedelta(days=1)
+    if not InventorySnapshot.objects.filter(date=yesterday).exists():
+        written = take_snapshots(yesterday)
+        logger.info('Took %d inventory snapshots for %s', written, yesterday)
+
+
+def start_snapshot_scheduler():
+    """Start the checkpoint thread if configured. Returns the running task or None."""
+    global _scheduler
+    interval = settings.INVENTORY_SNAPSHOT_INTERVAL
+    if interval <= 0:
+        return None
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = PeriodicTask(take_yesterdays_snapshots, interval, name='inventory-snapshots')
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_snapshot_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.base.benchmarks import SEED_PROFILES, scratch_database, seed_dataset
+from apps.inventory import services, stocktake
+from apps.inventory.models import Inventory
+
+
+def restock_each(counts):
+    """One adjustment per line, as importing through the restock endpoint would."""
+    stock = dict(Inventory.objects.values_list('product__product_id', 'product_id'))
+    for code, counted in counts.items():
+        with transaction.atomic():
+            current = Inventory.objects.get(product_id=stock[code]).stock
+            if counted != current:
+                services.apply_stock_changes([{'product_id': stock[code], 'quantity': counted - current}])
+
+
+def import_counts(counts):
+    stocktake.import_counts(counts)
+
+
+STRATEGIES = (
+    ('per line', restock_each),
+    ('import', import_counts),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks stock-count imports: one adjustment per line against the bulk import. '
+        'Runs against a throwaway database, the configured one is never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000, help='Products counted')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        lines = options['lines']
+        profile = dict(SEED_PROFILES['test'], products=lines)
+
+        with scratch_database():
+            seed_dataset(**profile)
+            codes = list(Inventory.objects.values_list('product__product_id', flat=True))
+            for name, fn in STRATEGIES:
+                # Most shelves match the books, some are off by a few units
+                stock = dict(Inventory.objects.values_list('product__product_id', 'stock'))
+                counts = {
+                    code: max(0, stock[code] + (rng.randint(-5, 5) if rng.random() < 0.3 else 0))
+                    for code in codes
+                }
+                # Counted with a wrapper, the DEBUG query log stops at 9000 entries
+                queries = []
+                with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+                    started = time.perf_counter()
+                    fn(counts)
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{name:<9} {len(counts):,} lines  queries={len(queries):<6} '
+                    f'{elapsed * 1000:9.1f} ms  {len(counts) / elapsed:10,.0f} lines/s'
+                )
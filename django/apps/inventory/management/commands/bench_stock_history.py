@@ -0,0 +1,65 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.base.benchmarks import SEED_PROFILES, explicit_timestamps, scratch_database, seed_dataset
+from apps.inventory import ledger
+from apps.inventory.models import Inventory, InventorySnapshot, InventoryTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks point-in-time stock queries: replaying the ledger against daily snapshots. '
+        'Runs against a throwaway database, the configured one is never touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=1_000_000, help='Ledger rows')
+        parser.add_argument('--days', type=int, default=365, help='Days the ledger spans')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        days = options['days']
+        with scratch_database():
+            seed_dataset(**SEED_PROFILES['test'])
+            product_ids = list(Inventory.objects.values_list('product_id', flat=True))
+            now = timezone.now()
+            batch = []
+            for i in range(options['transactions']):
+                batch.append(InventoryTransaction(
+                    product_id=rng.choice(product_ids), quantity=rng.randint(1, 20),
+                    transaction_type=rng.choice((InventoryTransaction.INCREASE, InventoryTransaction.DECREASE)),
+                    created_at=now - timedelta(seconds=rng.uniform(0, days * 86400)),
+                ))
+                if len(batch) == 50_000:
+                    self._insert(batch)
+            self._insert(batch)
+            moments = [now - timedelta(days=days_ago, hours=5) for days_ago in (1, days // 4, days // 2, days - 2)]
+
+            self._time('replay', lambda: [ledger.stock_at(moment) for moment in moments], len(moments))
+            started = time.perf_counter()
+            written = ledger.backfill(timezone.localdate() - timedelta(days=days))
+            self.stdout.write(f'backfill   {written:,} snapshots in {time.perf_counter() - started:.1f} s')
+            self._time('snapshots', lambda: [ledger.stock_at(moment) for moment in moments], len(moments))
+            self.stdout.write(f'({InventorySnapshot.objects.count():,} snapshots, '
+                              f'{InventoryTransaction.objects.count():,} ledger rows)')
+
+    def _insert(self, batch):
+        with explicit_timestamps(InventoryTransaction):
+            InventoryTransaction.objects.bulk_create(batch, batch_size=5000)
+        batch.clear()
+
+    def _time(self, name, fn, count):
+        queries = []
+        with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name:<10} {count} lookups  queries={len(queries):<4} {elapsed / count * 1000:9.1f} ms per as_of'
+        )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory import forecasting
+
+
+class Command(BaseCommand):
+    help = (
+        'Forecasts daily demand for every active product from its sales history and stores '
+        'the reorder point as its low-stock threshold, with a suggested order quantity. '
+        'Run it daily, after the sales rollup is current.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=forecasting.DEFAULT_HISTORY_DAYS)
+        parser.add_argument('--lead-time', type=int, default=forecasting.DEFAULT_LEAD_TIME_DAYS,
+                            help='Days for a purchase order to arrive')
+        parser.add_argument('--review-days', type=int, default=forecasting.DEFAULT_REVIEW_DAYS,
+                            help='Days between purchase orders')
+        parser.add_argument('--service-level', type=float, default=forecasting.DEFAULT_SERVICE_LEVEL,
+                            help='Chance of not running out before a reorder arrives (0-1)')
+        parser.add_argument('--alpha', type=float, default=forecasting.DEFAULT_ALPHA, help='Smoothing factor (0-1)')
+        parser.add_argument('--dry-run', action='store_true', help='Report without writing')
+
+    def handle(self, *args, **options):
+        if options['history_days'] < 14:
+            raise CommandError('--history-days must cover at least two weeks')
+        if options['lead_time'] < 1 or options['review_days'] < 0:
+            raise CommandError('--lead-time must be positive and --review-days not negative')
+        if not 0.5 <= options['service_level'] < 1:
+            raise CommandError('--service-level must be at least 0.5 and below 1')
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError('--alpha must be in (0, 1]')
+
+        summary = forecasting.run(
+            history_days=options['history_days'],
+            lead_time=options['lead_time'],
+            review_days=options['review_days'],
+            service_level=options['service_level'],
+            alpha=options['alpha'],
+            dry_run=options['dry_run'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would update' if summary['dry_run'] else 'Updated'} {summary['forecast']} of "
+            f"{summary['products']} products, {summary['to_reorder']} at or below their reorder point "
+            f"({summary['seconds']:.2f} s)"
+        ))
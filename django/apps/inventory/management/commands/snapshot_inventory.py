@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.inventory import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Checkpoints the inventory ledger: snapshots every product's stock at the end of "
+        "yesterday (run it daily shortly after midnight), or of a range of past days with --start."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to snapshot (YYYY-MM-DD), defaults to yesterday')
+        parser.add_argument('--start', help='Backfill every day from this one (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to backfill (YYYY-MM-DD), defaults to yesterday')
+
+    def handle(self, *args, **options):
+        day = self._parse(options['date'])
+        start = self._parse(options['start'])
+        end = self._parse(options['end'])
+        if day and (start or end):
+            raise CommandError('--date cannot be combined with --start/--end')
+        if end and not start:
+            raise CommandError('--end needs --start')
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        written = ledger.backfill(start, end) if start else ledger.take_snapshots(day)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} inventory snapshots'))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'Invalid date: {value}')
+        return parsed
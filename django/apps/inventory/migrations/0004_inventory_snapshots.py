@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_remove_inventory_last_restocked_inventory_created_at_and_more'),
+        ('products', '0003_product_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('stock', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['product', 'created_at'], name='inventory_txn_product_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='inventorysnapshot',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='products.product'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorysnapshot',
+            index=models.Index(fields=['date'], name='inventory_snapshot_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventorysnapshot',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='unique_inventory_snapshot'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_alerts_for_low_stock(apps, schema_editor):
+    # Products already low start with an open alert, so recovering resolves it
+    Inventory = apps.get_model('inventory', 'Inventory')
+    LowStockAlert = apps.get_model('inventory', 'LowStockAlert')
+    LowStockAlert.objects.bulk_create(
+        [
+            LowStockAlert(product_id=product_id, stock=stock, threshold=threshold)
+            for product_id, stock, threshold in Inventory.objects.filter(
+                stock__lte=models.F('low_stock_threshold')
+            ).values_list('product_id', 'stock', 'low_stock_threshold')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventory_snapshots'),
+        ('products', '0003_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(help_text='Stock when the alert was raised')),
+                ('threshold', models.PositiveIntegerField()),
+                ('raised_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-raised_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('stock__lte', models.F('low_stock_threshold'))), fields=['product'], name='inventory_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alerts', to='products.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='lowstockalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('product',), name='unique_open_low_stock_alert'),
+        ),
+        migrations.RunPython(open_alerts_for_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_low_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='daily_demand',
+            field=models.FloatField(blank=True, help_text='Forecast units per day', null=True),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='forecast_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='reorder_quantity',
+            field=models.PositiveIntegerField(default=0, help_text='Suggested units to order'),
+        ),
+    ]
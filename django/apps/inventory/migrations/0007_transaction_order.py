@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:44
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ORDER_NOTES = re.compile(r'^(?:Reserved for|Released from) order (\S+)(?: \((cancelled|reopened)\))?$')
+
+
+def link_order_transactions(apps, schema_editor):
+    # Reservations recorded before the link existed carry the order in their notes
+    InventoryTransaction = apps.get_model('inventory', 'InventoryTransaction')
+    Order = apps.get_model('orders', 'Order')
+    rows = InventoryTransaction.objects.filter(
+        models.Q(notes__startswith='Reserved for order ') | models.Q(notes__startswith='Released from order ')
+    ).values_list('pk', 'notes')
+    matches = {pk: ORDER_NOTES.match(notes) for pk, notes in rows}
+    matches = {pk: match for pk, match in matches.items() if match}
+    orders = dict(
+        Order.objects.filter(order_id__in={match[1] for match in matches.values()}).values_list('order_id', 'pk')
+    )
+    updated = []
+    for pk, match in matches.items():
+        if match[1] in orders:
+            updated.append(InventoryTransaction(pk=pk, order_id=orders[match[1]], reason=match[2] or 'items'))
+    InventoryTransaction.objects.bulk_update(updated, ['order', 'reason'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_inventory_forecast'),
+        ('orders', '0005_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_transactions', to='orders.order'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='reason',
+            field=models.CharField(blank=True, choices=[('items', 'Order items'), ('cancelled', 'Order cancelled'), ('reopened', 'Order reopened')], max_length=10),
+        ),
+        migrations.RunPython(link_order_transactions, migrations.RunPython.noop),
+    ]
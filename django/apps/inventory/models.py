@@ -2,6 +2,10 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 
+# Inventory rows at or below their threshold. Filter with this exact
+# predicate so the database can answer from the partial index below.
+LOW_STOCK = models.Q(stock__lte=models.F('low_stock_threshold'))
+
 class InventoryTransaction(models.Model):
     INCREASE = 'increase'
     DECREASE = 'decrease'
@@ -9,6 +13,15 @@ class InventoryTransaction(models.Model):
         (INCREASE, 'Increase'),
         (DECREASE, 'Decrease'),
     ]
+    # Why an order's stock moved; blank for changes not made for an order
+    ORDER_ITEMS = 'items'
+    ORDER_CANCELLED = 'cancelled'
+    ORDER_REOPENED = 'reopened'
+    REASONS = [
+        (ORDER_ITEMS, 'Order items'),
+        (ORDER_CANCELLED, 'Order cancelled'),
+        (ORDER_REOPENED, 'Order reopened'),
+    ]
 
     product = models.ForeignKey(
         'products.Product',
@@ -26,11 +39,24 @@ class InventoryTransaction(models.Model):
         null=True,
         blank=True
     )
+    # Set only by apps.inventory.services.order_changes, never from client input
+    order = models.ForeignKey(
+        'orders.Order',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_transactions'
+    )
+    reason = models.CharField(max_length=10, choices=REASONS, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Replaying one product's ledger since its last snapshot
+            models.Index(fields=['product', 'created_at'], name='inventory_txn_product_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_transaction_type_display()} of {self.quantity} for {self.product}"
@@ -43,15 +69,83 @@ class Inventory(models.Model):
     )
     stock = models.PositiveIntegerField(default=0)
     low_stock_threshold = models.PositiveIntegerField(default=10)
+    # Written by the forecast_demand job (apps.inventory.forecasting)
+    daily_demand = models.FloatField(blank=True, null=True, help_text='Forecast units per day')
+    reorder_quantity = models.PositiveIntegerField(default=0, help_text='Suggested units to order')
+    forecast_at = models.DateTimeField(blank=True, null=True)
     last_updated = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name_plural = "Inventory"
+        indexes = [
+            # Holds only the low rows, so counting and listing them is an index lookup
+            models.Index(fields=['product'], condition=LOW_STOCK, name='inventory_low_stock_idx'),
+        ]
 
     def __str__(self):
         return f"Inventory for {self.product.name}"
 
     @property
     def is_low_stock(self):
-        return self.stock <= self.low_stock_threshold
\ No newline at end of file
+        return self.stock <= self.low_stock_threshold
+
+
+class LowStockAlert(models.Model):
+    """
+    A product's stock falling to or below its threshold.
+
+    Raised once when the stock crosses the threshold and resolved when it
+    climbs back above it (see ``apps.inventory.alerts``); a product has at
+    most one open alert.
+    """
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='low_stock_alerts'
+    )
+    stock = models.IntegerField(help_text='Stock when the alert was raised')
+    threshold = models.PositiveIntegerField()
+    raised_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-raised_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'], condition=models.Q(resolved_at__isnull=True), name='unique_open_low_stock_alert'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Low stock for {self.product}: {self.stock} (threshold {self.threshold})"
+
+
+class InventorySnapshot(models.Model):
+    """
+    A product's stock at the end of a local calendar day.
+
+    Checkpoints the InventoryTransaction ledger (see
+    ``apps.inventory.ledger``) so past stock is a snapshot plus at most a
+    day of transactions instead of a replay of the whole history.
+    """
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='inventory_snapshots'
+    )
+    date = models.DateField()
+    stock = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_inventory_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='inventory_snapshot_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.date}: {self.stock}"
@@ -1,6 +1,7 @@
 # apps/inventory/serializers.py
 from rest_framework import serializers
-from .models import Inventory
+from . import services
+from .models import Inventory, LowStockAlert
 
 class InventorySerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -21,15 +22,69 @@ class InventorySerializer(serializers.ModelSerializer):
             'stock',
             'low_stock_threshold',
             'is_low_stock',
+            'daily_demand',
+            'reorder_quantity',
+            'forecast_at',
             'last_updated',
             'is_active'  # Useful for frontend filtering
         ]
         extra_kwargs = {
-            'product': {'write_only': True}
+            'product': {'write_only': True},
+            'daily_demand': {'read_only': True},
+            'reorder_quantity': {'read_only': True},
+            'forecast_at': {'read_only': True},
         }
 
+    def create(self, validated_data):
+        stock = validated_data.pop('stock', 0)
+        instance = super().create(validated_data)
+        self._set_stock(instance, stock)
+        return instance
+
+    def update(self, instance, validated_data):
+        stock = validated_data.pop('stock', None)
+        if validated_data:
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            # Only the edited fields: the loaded stock may already be stale
+            instance.save(update_fields=[*validated_data, 'last_updated'])
+        if stock is not None:
+            self._set_stock(instance, stock)
+        return instance
+
+    def _set_stock(self, instance, stock):
+        # Edits go through the ledger like any other change, so past stock
+        # stays exact; the correction is worked out against the locked row
+        request = self.context.get('request')
+        services.apply_stock_changes(
+            [{'product_id': instance.product_id, 'stock': stock, 'notes': 'Manual correction'}],
+            user=getattr(request, 'user', None),
+        )
+        instance.refresh_from_db(fields=['stock', 'last_updated'])
+
     def to_representation(self, instance):
         # Skip serialization if product is inactive
         if not instance.product.is_active:
             return None
-        return super().to_representation(instance)
\ No newline at end of file
+        return super().to_representation(instance)
+
+
+class StockChangeSerializer(serializers.Serializer):
+    """One entry of a batch adjustment; use with ``many=True``."""
+    product_id = serializers.IntegerField(help_text='Product primary key')
+    quantity = serializers.IntegerField(help_text='Units to add, negative to remove')
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_quantity(self, value):
+        if value == 0:
+            raise serializers.ValidationError('Quantity must not be zero.')
+        return value
+
+
+class LowStockAlertSerializer(serializers.ModelSerializer):
+    product_id = serializers.CharField(source='product.product_id', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = LowStockAlert
+        fields = ['id', 'product', 'product_id', 'product_name', 'stock', 'threshold', 'raised_at', 'resolved_at']
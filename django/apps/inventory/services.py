@@ -0,0 +1,213 @@
+# apps/inventory/services.py
+"""
+Stock changes.
+
+Every change to ``Inventory.stock`` goes through ``apply_stock_changes``,
+which applies a whole batch (say, every line of an order) in one
+transaction and a constant number of queries:
+
+* the affected inventory rows are read with ``select_for_update`` in
+  product order, so concurrent batches lock rows in the same order and
+  cannot deadlock, and shortages are reported before anything is written;
+* one UPDATE moves every row by its delta with ``F('stock') + CASE ...``,
+  so the arithmetic happens in the database and no concurrent update is
+  lost. The ``stock >= 0`` check constraint makes that same statement
+  refuse to oversell on databases without row locks (SQLite);
+* one ``bulk_create`` writes an InventoryTransaction per change.
+
+Rows crossing their low-stock threshold are passed to
+``apps.inventory.alerts``, which only queries when one does.
+
+Bulk writes skip the per-row signals, so ``stock_adjusted`` is sent
+afterwards.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .alerts import record_crossings
+from .models import Inventory, InventoryTransaction
+from .signals import stock_adjusted
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a batch would take a product's stock below zero."""
+
+    def __init__(self, shortages):
+        # product id -> (quantity requested, quantity available)
+        self.shortages = dict(sorted(shortages.items()))
+        details = ', '.join(
+            f'{product_id} (requested {requested}, available {available})'
+            for product_id, (requested, available) in self.shortages.items()
+        )
+        super().__init__(f"Insufficient stock for products: {details}")
+
+
+def _shortages(totals, stock):
+    return {
+        product_id: (-total, stock.get(product_id, 0))
+        for product_id, total in totals.items()
+        if stock.get(product_id, 0) + total < 0
+    }
+
+
+class _StockMoved(Exception):
+    """The guarded UPDATE hit the stock check constraint."""
+
+    def __init__(self, totals):
+        super().__init__()
+        self.totals = totals
+
+
+def apply_stock_changes(changes, user=None, source='manual'):
+    """
+    Apply signed stock changes and record a transaction for each.
+
+    ``changes`` are dicts with ``product_id``, a signed ``quantity`` (or
+    the target ``stock``, turned into a quantity against the locked row so
+    a concurrent change is not undone) and optional ``notes``, ``user_id``
+    (defaults to ``user``) and the ``order_id`` and ``reason`` set by
+    ``order_changes``; zero quantities are skipped. Nothing is written
+    when any product would go below zero, InsufficientStockError is
+    raised instead. ``source`` is
+    passed on to ``stock_adjusted`` receivers (``'manual'`` or
+    ``'order'``). Returns the created transactions.
+    """
+    changes = [change for change in changes if 'stock' in change or change['quantity']]
+    if not changes:
+        return []
+
+    try:
+        return _apply(changes, user, source)
+    except _StockMoved as exc:
+        # Stock moved between the read and the update (no row locks here),
+        # the batch was rolled back; report the stock as it is now
+        stock = dict(Inventory.objects.filter(product_id__in=exc.totals).values_list('product_id', 'stock'))
+        raise InsufficientStockError(_shortages(exc.totals, stock))
+
+
+@transaction.atomic
+def _apply(changes, user, source):
+    thresholds = {}
+    stock = {}
+    for product_id, current, threshold in (
+        Inventory.objects.select_for_update()
+        .filter(product_id__in={change['product_id'] for change in changes})
+        .order_by('product_id')
+        .values_list('product_id', 'stock', 'low_stock_threshold')
+    ):
+        stock[product_id] = current
+        thresholds[product_id] = threshold
+
+    totals = {}
+    resolved = []
+    for change in changes:
+        product_id = change['product_id']
+        if 'stock' in change:
+            # A target counts from the locked stock plus earlier changes in the batch
+            change = dict(change, quantity=change['stock'] - stock.get(product_id, 0) - totals.get(product_id, 0))
+        if change['quantity']:
+            totals[product_id] = totals.get(product_id, 0) + change['quantity']
+            resolved.append(change)
+    changes = resolved
+    if not changes:
+        return []
+    shortages = _shortages(totals, stock)
+    if shortages:
+        raise InsufficientStockError(shortages)
+    missing = [product_id for product_id in totals if product_id not in stock]
+    if missing:
+        # Only increases get here, a decrease of a missing row is a shortage
+        Inventory.objects.bulk_create([Inventory(product_id=product_id) for product_id in missing])
+
+    delta = Case(
+        *[When(product_id=product_id, then=Value(total)) for product_id, total in totals.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    try:
+        Inventory.objects.filter(product_id__in=totals).update(
+            stock=F('stock') + delta, last_updated=timezone.now()
+        )
+    except IntegrityError:
+        raise _StockMoved(totals)
+
+    # The rows are locked, so what was read plus the deltas is what was written
+    record_crossings(
+        (product_id, stock[product_id] <= threshold, stock[product_id] + totals[product_id], threshold)
+        for product_id, threshold in thresholds.items()
+    )
+
+    transactions = InventoryTransaction.objects.bulk_create([
+        InventoryTransaction(
+            product_id=change['product_id'],
+            quantity=abs(change['quantity']),
+            transaction_type=(
+                InventoryTransaction.INCREASE if change['quantity'] > 0 else InventoryTransaction.DECREASE
+            ),
+            notes=change.get('notes'),
+            user_id=change['user_id'] if 'user_id' in change else getattr(user, 'pk', None),
+            order_id=change.get('order_id'),
+            reason=change.get('reason', ''),
+        )
+        for change in changes
+    ])
+    stock_adjusted.send(sender=Inventory, transactions=transactions, source=source)
+    return transactions
+
+
+def restock(product_id, quantity, user=None, notes=None):
+    """Add ``quantity`` units of a product. Returns the transaction."""
+    return apply_stock_changes(
+        [{'product_id': product_id, 'quantity': quantity, 'notes': notes or 'Restock'}], user=user
+    )[0]
+
+
+# Why an order's stock moved; a cancellation's releases are what
+# reopening the order reserves again
+ITEMS = InventoryTransaction.ORDER_ITEMS
+CANCELLED = InventoryTransaction.ORDER_CANCELLED
+REOPENED = InventoryTransaction.ORDER_REOPENED
+
+
+def order_changes(order, quantities, reason=ITEMS):
+    """
+    Stock changes for one order from ``{product_id: quantity}``, the units
+    the order now holds minus those it held before (positive quantities
+    are taken from stock). The transactions are linked to the order with
+    ``reason`` (ITEMS, CANCELLED or REOPENED).
+    """
+    suffix = f' ({reason})' if reason != ITEMS else ''
+    return [
+        {
+            'product_id': product_id,
+            'quantity': -quantity,
+            'notes': f"{'Reserved for' if quantity > 0 else 'Released from'} order {order.order_id}{suffix}",
+            'user_id': order.created_by_id,
+            'order_id': order.pk,
+            'reason': reason,
+        }
+        for product_id, quantity in quantities.items()
+        if quantity
+    ]
+
+
+def order_ledger(order):
+    """
+    ``{reason: {product_id: quantity}}`` of the units ``order_changes`` took
+    from stock for ``order`` (negative when given back). Items written
+    around apps.orders.services (the admin, plain model saves) never show
+    up here.
+    """
+    ledger = {reason: {} for reason in (ITEMS, CANCELLED, REOPENED)}
+    rows = (
+        InventoryTransaction.objects.filter(order=order)
+        .values_list('reason', 'product_id', 'transaction_type')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    for reason, product_id, transaction_type, quantity in rows:
+        taken = ledger[reason]
+        sign = 1 if transaction_type == InventoryTransaction.DECREASE else -1
+        taken[product_id] = taken.get(product_id, 0) + sign * quantity
+    return ledger
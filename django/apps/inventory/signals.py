@@ -1,9 +1,20 @@
 # apps/inventory/signals.py
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_init, post_save
+from django.dispatch import Signal, receiver
 from apps.products.models import Product
 from .models import Inventory
 
+# Sent by apps.inventory.services.apply_stock_changes and
+# apps.inventory.stocktake.import_counts, which write their
+# InventoryTransactions with bulk_create. Receivers get the created
+# ``transactions`` and their ``source``: 'order' for order reservations,
+# 'count' for stock-count imports, 'manual' otherwise.
+stock_adjusted = Signal()
+
+# Sent by apps.inventory.alerts.record_crossings with the ``raised``
+# LowStockAlerts and the product ids that ``recovered``.
+low_stock_crossed = Signal()
+
 @receiver(post_save, sender=Product)
 def create_inventory_for_product(sender, instance, created, **kwargs):
     """
@@ -14,4 +25,29 @@ def create_inventory_for_product(sender, instance, created, **kwargs):
             product=instance,
             stock=0,  # Default to 0 stock
             low_stock_threshold=10  # Default threshold
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_init, sender=Inventory)
+def remember_low_stock(sender, instance, **kwargs):
+    """Stash whether a loaded row was low, to spot a crossing when it is saved"""
+    deferred = instance.get_deferred_fields()
+    if instance.pk is None or {'stock', 'low_stock_threshold'} & deferred:
+        instance._was_low = None
+    else:
+        instance._was_low = instance.is_low_stock
+
+
+@receiver(post_save, sender=Inventory)
+def track_low_stock(sender, instance, created, **kwargs):
+    """
+    Record low-stock crossings made by saving a row (threshold edits, the
+    admin). Stock changes through the services are tracked there; a new
+    row has not crossed anything yet.
+    """
+    from .alerts import record_crossings
+
+    was_low = getattr(instance, '_was_low', None)
+    if not created and was_low is not None:
+        record_crossings([(instance.product_id, was_low, instance.stock, instance.low_stock_threshold)])
+    instance._was_low = instance.is_low_stock
@@ -0,0 +1,211 @@
+# apps/inventory/stocktake.py
+"""
+Stock-count imports.
+
+A stock take reports the counted stock of many products at once as
+``(product_id, counted_stock)`` lines, where ``product_id`` is the
+product code printed on the shelf (``Product.product_id``). The whole
+count is applied in one transaction with batched statements rather
+than a query per line:
+
+* one SELECT reads (and locks) the current stock of every counted
+  product, joined with its code and name;
+* a ``bulk_update`` sets the counted stock on the rows that differ, and
+  a ``bulk_create`` adds rows for products that never had one;
+* a ``bulk_create`` records an InventoryTransaction per difference.
+
+Counted stock is absolute, so a count replaces whatever the row held;
+unknown codes are skipped and listed in the report. ``stock_adjusted``
+is sent with source ``'count'`` and low-stock crossings are recorded.
+"""
+import csv
+import io
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.products.models import Product
+from .alerts import record_crossings
+from .models import Inventory, InventoryTransaction
+from .signals import stock_adjusted
+
+BATCH_SIZE = 1000
+# Validation errors reported back before giving up on a file
+MAX_ERRORS = 50
+
+NOTES = 'Stock count'
+
+
+class StockCountError(ValueError):
+    """A stock count that cannot be read; ``errors`` is a list of ``(line, message)``."""
+
+    def __init__(self, errors):
+        self.errors = errors[:MAX_ERRORS]
+        super().__init__('; '.join(f'line {line}: {message}' for line, message in self.errors))
+
+
+def parse_rows(rows, first_line=1):
+    """
+    Validate ``(line, product_id, counted_stock)`` rows into a
+    ``{product_id: counted_stock}`` dict, raising StockCountError with
+    every problem found. A product may only be counted once.
+    """
+    counts = {}
+    errors = []
+    for line, code, counted in rows:
+        code = str(code).strip() if code is not None else ''
+        if not code:
+            errors.append((line, 'product_id is required'))
+            continue
+        try:
+            counted = int(str(counted).strip())
+        except (TypeError, ValueError):
+            errors.append((line, f'counted_stock must be a whole number, got {counted!r}'))
+            continue
+        if counted < 0:
+            errors.append((line, 'counted_stock must not be negative'))
+        elif code in counts:
+            errors.append((line, f'{code} is counted more than once'))
+        else:
+            counts[code] = counted
+        if len(errors) >= MAX_ERRORS:
+            break
+    if errors:
+        raise StockCountError(errors)
+    if not counts:
+        raise StockCountError([(first_line, 'the count is empty')])
+    if len(counts) > settings.STOCK_COUNT_MAX_LINES:
+        raise StockCountError([
+            (first_line, f'at most {settings.STOCK_COUNT_MAX_LINES} lines can be imported at once')
+        ])
+    return counts
+
+
+def parse_csv(data):
+    """Read a CSV count (bytes or text) with ``product_id`` and ``counted_stock`` columns."""
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise StockCountError([(1, 'the file is not UTF-8 text')])
+    reader = csv.DictReader(io.StringIO(data))
+    missing = {'product_id', 'counted_stock'} - set(reader.fieldnames or ())
+    if missing:
+        raise StockCountError([(1, f"missing column(s): {', '.join(sorted(missing))}")])
+    return parse_rows(
+        ((reader.line_num, row['product_id'], row['counted_stock']) for row in reader), first_line=2
+    )
+
+
+def parse_json(data):
+    """Read a count given as a list of ``{product_id, counted_stock}`` objects."""
+    if not isinstance(data, list):
+        raise StockCountError([(1, 'expected a list of {product_id, counted_stock}')])
+    rows = []
+    for line, item in enumerate(data, 1):
+        if not isinstance(item, dict):
+            raise StockCountError([(line, 'expected an object')])
+        rows.append((line, item.get('product_id'), item.get('counted_stock')))
+    return parse_rows(rows)
+
+
+def import_counts(counts, user=None, dry_run=False):
+    """
+    Set the stock of each product in ``{product_id: counted_stock}`` and
+    return the diff report. With ``dry_run`` nothing is written, the
+    report shows what the count would change.
+    """
+    with transaction.atomic():
+        # of=('self',): lock the inventory rows, not the joined products
+        current = {}
+        thresholds = {}
+        for inventory_id, product_id, code, name, stock, threshold in (
+            Inventory.objects.select_for_update(of=('self',))
+            .filter(product__product_id__in=counts)
+            .values_list('pk', 'product_id', 'product__product_id', 'product__name', 'stock', 'low_stock_threshold')
+        ):
+            current[code] = (inventory_id, product_id, name, stock)
+            thresholds[product_id] = threshold
+        # Products bulk-created without the inventory signal have no row yet
+        uncounted = [code for code in counts if code not in current]
+        if uncounted:
+            for product_id, code, name in Product.objects.filter(product_id__in=uncounted).values_list(
+                'pk', 'product_id', 'name'
+            ):
+                current[code] = (None, product_id, name, 0)
+
+        changes = []
+        for code, counted in counts.items():
+            if code in current and counted != current[code][3]:
+                inventory_id, product_id, name, stock = current[code]
+                changes.append({
+                    'inventory_id': inventory_id,
+                    'product': product_id,
+                    'product_id': code,
+                    'name': name,
+                    'previous': stock,
+                    'counted': counted,
+                    'delta': counted - stock,
+                })
+        # Counted products get a row even when their count matches the assumed zero
+        new_rows = [
+            Inventory(product_id=current[code][1], stock=counted)
+            for code, counted in counts.items()
+            if code in current and current[code][0] is None
+        ]
+        if not dry_run and (changes or new_rows):
+            _write(changes, new_rows, user)
+            record_crossings(
+                (change['product'], change['previous'] <= thresholds[change['product']],
+                 change['counted'], thresholds[change['product']])
+                for change in changes if change['inventory_id'] is not None
+            )
+
+    unknown = sorted(code for code in counts if code not in current)
+    return {
+        'dry_run': dry_run,
+        'lines': len(counts),
+        'matched': len(counts) - len(unknown),
+        'changed': len(changes),
+        'unchanged': len(counts) - len(unknown) - len(changes),
+        'units_added': sum(change['delta'] for change in changes if change['delta'] > 0),
+        'units_removed': -sum(change['delta'] for change in changes if change['delta'] < 0),
+        'unknown': unknown,
+        'changes': [
+            {key: change[key] for key in ('product_id', 'name', 'previous', 'counted', 'delta')}
+            for change in changes
+        ],
+    }
+
+
+def _write(changes, new_rows, user):
+    now = timezone.now()
+    # bulk_update skips auto_now, so stamp it here
+    Inventory.objects.bulk_update(
+        [
+            Inventory(pk=change['inventory_id'], stock=change['counted'], last_updated=now)
+            for change in changes if change['inventory_id'] is not None
+        ],
+        ['stock', 'last_updated'],
+        batch_size=BATCH_SIZE,
+    )
+    Inventory.objects.bulk_create(new_rows, batch_size=BATCH_SIZE)
+    if not changes:
+        return
+    transactions = InventoryTransaction.objects.bulk_create(
+        [
+            InventoryTransaction(
+                product_id=change['product'],
+                quantity=abs(change['delta']),
+                transaction_type=(
+                    InventoryTransaction.INCREASE if change['delta'] > 0 else InventoryTransaction.DECREASE
+                ),
+                notes=f"{NOTES}: {change['previous']} -> {change['counted']}",
+                user_id=getattr(user, 'pk', None),
+            )
+            for change in changes
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    stock_adjusted.send(sender=Inventory, transactions=transactions, source='count')
@@ -0,0 +1,546 @@
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.dashboard.models import DailySalesRollup, RecentActivity
+from apps.base.dates import day_bounds
+from apps.orders import services as order_services
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.stores.models import Store
+from . import forecasting, ledger, services, stocktake
+from .alerts import record_crossings
+from .models import LOW_STOCK, Inventory, InventorySnapshot, InventoryTransaction, LowStockAlert
+from .serializers import InventorySerializer
+
+User = get_user_model()
+
+
+class StockServiceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='stock', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='-', contact='-')
+        # Created one by one so the inventory signal gives each a stock row
+        self.products = [
+            Product.objects.create(product_id=f'S{i}', name=f'Product {i}', price=Decimal('5.00'))
+            for i in range(3)
+        ]
+        Inventory.objects.update(stock=10)
+
+    def stock(self, product):
+        return Inventory.objects.get(product=product).stock
+
+    def test_restock_adds_in_the_database(self):
+        inventory = Inventory.objects.get(product=self.products[0])
+        # A stale copy must not matter
+        Inventory.objects.filter(pk=inventory.pk).update(stock=15)
+        response = self.client.post(f'/api/inventory/{inventory.pk}/restock/', {'quantity': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 20)
+
+        transaction = InventoryTransaction.objects.get()
+        self.assertEqual((transaction.quantity, transaction.transaction_type), (5, 'increase'))
+        self.assertEqual(transaction.user, self.user)
+        self.assertTrue(RecentActivity.objects.filter(activity_type='inventory').exists())
+
+    def test_batch_adjustment_is_all_or_nothing(self):
+        changes = [
+            {'product_id': self.products[0].pk, 'quantity': 4},
+            {'product_id': self.products[1].pk, 'quantity': -11},
+        ]
+        with self.assertRaises(services.InsufficientStockError) as caught:
+            services.apply_stock_changes(changes)
+        self.assertEqual(caught.exception.shortages, {self.products[1].pk: (11, 10)})
+        self.assertEqual(self.stock(self.products[0]), 10)
+        self.assertFalse(InventoryTransaction.objects.exists())
+
+        changes[1]['quantity'] = -10
+        # Savepoint, lock rows, update, resolve the low-stock alert of the product
+        # now above its threshold, insert transactions, select names, insert activities, release
+        with self.assertNumQueries(8):
+            services.apply_stock_changes(changes, user=self.user)
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [14, 0])
+
+    def test_adjust_endpoint(self):
+        response = self.client.post('/api/inventory/adjust/', [
+            {'product_id': self.products[0].pk, 'quantity': -3, 'notes': 'Damaged'},
+            {'product_id': self.products[2].pk, 'quantity': 7},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transactions'], 2)
+        self.assertEqual({row['product_id']: row['stock'] for row in response.data['inventory']}, {'S0': 7, 'S2': 17})
+
+        response = self.client.post('/api/inventory/adjust/', [
+            {'product_id': self.products[0].pk, 'quantity': -100},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/inventory/adjust/', [{'product_id': 999999, 'quantity': 1}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(STOCK_ADJUST_MAX_CHANGES=2)
+    def test_adjust_is_capped(self):
+        changes = [{'product_id': product.pk, 'quantity': 1} for product in self.products]
+        response = self.client.post('/api/inventory/adjust/', changes, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(InventoryTransaction.objects.exists())
+        response = self.client.post('/api/inventory/adjust/', changes[:2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_orders_reserve_and_release_stock(self):
+        order = order_services.create_orders([{
+            'store': self.store,
+            'order_items': [
+                {'product_id': self.products[0].pk, 'quantity': 4},
+                {'product_id': self.products[1].pk, 'quantity': 2},
+            ],
+        }], user=self.user)[0]
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [6, 8])
+        self.assertEqual(
+            InventoryTransaction.objects.filter(notes=f'Reserved for order {order.order_id}').count(), 2
+        )
+        # The order activity covers its reservations
+        self.assertFalse(RecentActivity.objects.filter(activity_type='inventory').exists())
+
+        order_services.update_order_items(order, [
+            {'product_id': self.products[0].pk, 'quantity': 1},
+            {'product_id': self.products[2].pk, 'quantity': 5},
+        ])
+        self.assertEqual([self.stock(product) for product in self.products], [9, 10, 5])
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = 'Cancelled'
+        order.save()
+        self.assertEqual([self.stock(product) for product in self.products], [10, 10, 10])
+        order.status = 'Pending'
+        order.save()
+        self.assertEqual([self.stock(product) for product in self.products], [9, 10, 5])
+
+    def test_cancelling_releases_only_reserved_stock(self):
+        order = order_services.create_orders([{
+            'store': self.store,
+            'order_items': [{'product_id': self.products[0].pk, 'quantity': 4}],
+        }], user=self.user)[0]
+        # Saved around the services (as the admin inline does), so never reserved
+        OrderItem.objects.create(order=order, product=self.products[1], quantity=3, unit_price=Decimal('2.00'))
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [6, 10])
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = 'Cancelled'
+        order.save()
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [10, 10])
+        order.status = 'Pending'
+        order.save()
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [6, 10])
+
+    def test_notes_do_not_count_as_reservations(self):
+        order = order_services.create_orders([{
+            'store': self.store,
+            'order_items': [{'product_id': self.products[0].pk, 'quantity': 4}],
+        }], user=self.user)[0]
+        response = self.client.post('/api/inventory/adjust/', [
+            {'product_id': self.products[1].pk, 'quantity': -5, 'notes': f'Reserved for order {order.order_id}'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [6, 5])
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = 'Cancelled'
+        order.save()
+        self.assertEqual([self.stock(product) for product in self.products[:2]], [10, 5])
+        self.assertEqual(
+            set(InventoryTransaction.objects.filter(order=order).values_list('reason', flat=True)),
+            {InventoryTransaction.ORDER_ITEMS, InventoryTransaction.ORDER_CANCELLED}
+        )
+
+    def test_order_beyond_stock_is_rejected(self):
+        response = self.client.post('/api/orders/orders/', {
+            'store_id': self.store.pk,
+            'order_items': [
+                {'product_id': self.products[0].pk, 'quantity': 2},
+                {'product_id': self.products[1].pk, 'quantity': 11},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Insufficient stock', str(response.data))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.products[0]), 10)
+
+
+class StockCountImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='counter', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            Product.objects.create(product_id=f'C{i}', name=f'Counted {i}', price=Decimal('2.00'))
+        Inventory.objects.update(stock=10)
+
+    def stocks(self):
+        return dict(Inventory.objects.values_list('product__product_id', 'stock'))
+
+    def test_csv_upload_returns_diff_report(self):
+        upload = SimpleUploadedFile(
+            'count.csv', b'\xef\xbb\xbfproduct_id,counted_stock\nC0,12\nC1,10\nC2,4\nNOPE,1\n', 'text/csv'
+        )
+        response = self.client.post('/api/inventory/stock-count/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = response.data
+        self.assertEqual(
+            (report['lines'], report['matched'], report['changed'], report['unchanged']), (4, 3, 2, 1)
+        )
+        self.assertEqual((report['units_added'], report['units_removed']), (2, 6))
+        self.assertEqual(report['unknown'], ['NOPE'])
+        self.assertEqual(report['changes'][1], {
+            'product_id': 'C2', 'name': 'Counted 2', 'previous': 10, 'counted': 4, 'delta': -6,
+        })
+        self.assertEqual(self.stocks(), {'C0': 12, 'C1': 10, 'C2': 4})
+
+        transactions = InventoryTransaction.objects.order_by('product__product_id')
+        self.assertEqual(
+            [(t.quantity, t.transaction_type) for t in transactions], [(2, 'increase'), (6, 'decrease')]
+        )
+        self.assertEqual(transactions[0].user, self.user)
+        self.assertEqual(RecentActivity.objects.filter(title='Stock count imported').count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.client.post(
+            '/api/inventory/stock-count/?dry_run=1', [{'product_id': 'C0', 'counted_stock': 0}], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changes'][0]['delta'], -10)
+        self.assertEqual(self.stocks()['C0'], 10)
+        self.assertFalse(InventoryTransaction.objects.exists())
+
+    def test_invalid_lines_are_reported_and_nothing_applied(self):
+        response = self.client.post('/api/inventory/stock-count/', [
+            {'product_id': 'C0', 'counted_stock': 3},
+            {'product_id': 'C1', 'counted_stock': -1},
+            {'product_id': 'C0', 'counted_stock': 'many'},
+            {'product_id': 'C0', 'counted_stock': 4},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(self.stocks()['C0'], 10)
+
+        upload = SimpleUploadedFile('count.csv', b'sku,qty\nC0,1\n', 'text/csv')
+        response = self.client.post('/api/inventory/stock-count/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('counted_stock', response.data['errors'][0]['error'])
+
+    def test_query_count_does_not_grow_with_the_count(self):
+        # Bulk-created products have no inventory row until they are counted
+        Product.objects.bulk_create([
+            Product(product_id=f'B{i}', name=f'Bulk {i}', price=Decimal('1.00')) for i in range(1500)
+        ])
+        counts = {f'B{i}': i % 7 for i in range(1500)}
+        counts.update({'C0': 1, 'C1': 2})
+        # Two reads, then batched writes: SQLite fits at most 999 parameters in
+        # one INSERT, so 1500 new rows take a dozen statements per table, not 1500
+        with CaptureQueriesContext(connection) as queries:
+            report = stocktake.import_counts(counts, user=self.user)
+        self.assertLess(len(queries), 40)
+        self.assertEqual(report['changed'], 1502 - 1500 // 7 - 1)
+        stocks = self.stocks()
+        self.assertEqual((stocks['B8'], stocks['C1']), (1, 2))
+        self.assertEqual(Inventory.objects.count(), 1503)
+
+
+class InventoryLedgerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='ledger', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(product_id='L1', name='Ledger', price=Decimal('1.00'))
+        self.other = Product.objects.create(product_id='L2', name='Other', price=Decimal('1.00'))
+        self.today = timezone.localdate()
+        # Stock 0 until five days ago, then +10, -3, +5 on consecutive days and -2 today
+        for days_ago, quantity in ((4, 10), (3, -3), (2, 5), (0, -2)):
+            self.entry(self.product, quantity, days_ago)
+        self.entry(self.other, 4, 3)
+
+    def entry(self, product, quantity, days_ago):
+        services.apply_stock_changes([{'product_id': product.pk, 'quantity': quantity}])
+        InventoryTransaction.objects.filter(pk=InventoryTransaction.objects.latest('pk').pk).update(
+            created_at=self.noon(days_ago)
+        )
+
+    def noon(self, days_ago, hours_later=0):
+        return day_bounds(self.today - timedelta(days=days_ago))[0] + timedelta(hours=12 + hours_later)
+
+    def test_stock_at_matches_the_ledger_with_and_without_snapshots(self):
+        expected = {5: 0, 4: 10, 3: 7, 2: 12, 1: 12}
+        # An hour after each day's change
+        replayed = {days_ago: ledger.stock_at(self.noon(days_ago, 1))[self.product.pk] for days_ago in expected}
+        self.assertEqual(replayed, expected)
+
+        written = ledger.backfill(self.today - timedelta(days=5))
+        self.assertEqual(written, 2 * 5)
+        self.assertEqual(
+            InventorySnapshot.objects.get(product=self.product, date=self.today - timedelta(days=3)).stock, 7
+        )
+        for days_ago, stock in expected.items():
+            # Snapshots with their stock, then the day's transactions
+            with self.assertNumQueries(2):
+                self.assertEqual(ledger.stock_at(self.noon(days_ago, 1))[self.product.pk], stock)
+        self.assertEqual(ledger.stock_at(timezone.now()), {self.product.pk: 10, self.other.pk: 4})
+
+    def test_daily_snapshot_is_idempotent(self):
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(ledger.take_snapshots(), 2)
+        self.assertEqual(ledger.take_snapshots(), 2)
+        self.assertEqual(
+            dict(InventorySnapshot.objects.filter(date=yesterday).values_list('product_id', 'stock')),
+            {self.product.pk: 12, self.other.pk: 4},
+        )
+
+    def test_history_fills_days_without_snapshots(self):
+        ledger.take_snapshots(self.today - timedelta(days=3))
+        series = ledger.history(self.product.pk, self.today - timedelta(days=5), self.today)
+        self.assertEqual([stock for _, stock in series], [0, 10, 7, 12, 12, 10])
+
+        inventory = Inventory.objects.get(product=self.product)
+        response = self.client.get(f'/api/inventory/{inventory.pk}/history/', {
+            'start': str(self.today - timedelta(days=2)), 'end': str(self.today),
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([point['stock'] for point in response.data['history']], [12, 12, 10])
+        response = self.client.get(f'/api/inventory/{inventory.pk}/history/', {'start': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_as_of(self):
+        day = self.today - timedelta(days=3)
+        response = self.client.get('/api/inventory/', {'as_of': str(day)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({row['product_id']: row['stock'] for row in response.data['results']}, {'L1': 7, 'L2': 4})
+        response = self.client.get('/api/inventory/', {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stock_edits_are_recorded_in_the_ledger(self):
+        inventory = Inventory.objects.get(product=self.product)
+        response = self.client.patch(f'/api/inventory/{inventory.pk}/', {'stock': 6}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 6)
+        correction = InventoryTransaction.objects.latest('pk')
+        self.assertEqual((correction.quantity, correction.transaction_type), (4, 'decrease'))
+        self.assertEqual(ledger.stock_at(timezone.now() - timedelta(seconds=1))[self.product.pk], 10)
+
+    def test_stock_edit_counts_from_the_current_stock(self):
+        inventory = Inventory.objects.get(product=self.product)
+        # A reservation lands between reading the row and saving the edit
+        services.apply_stock_changes([{'product_id': self.product.pk, 'quantity': -3}])
+        serializer = InventorySerializer(inventory, data={'stock': 6, 'low_stock_threshold': 5}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        inventory = Inventory.objects.get(product=self.product)
+        self.assertEqual((inventory.stock, inventory.low_stock_threshold), (6, 5))
+        correction = InventoryTransaction.objects.filter(notes='Manual correction').get()
+        self.assertEqual((correction.quantity, correction.transaction_type), (1, 'decrease'))
+
+
+class LowStockAlertTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alerts', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(product_id='A1', name='Alerted', price=Decimal('1.00'))
+        self.plenty = Product.objects.create(product_id='A2', name='Plenty', price=Decimal('1.00'))
+        Inventory.objects.update(stock=20)
+
+    def change(self, quantity):
+        services.apply_stock_changes([{'product_id': self.product.pk, 'quantity': quantity}])
+
+    def test_alert_is_raised_once_per_crossing(self):
+        self.change(-5)
+        self.assertFalse(LowStockAlert.objects.exists())
+        self.change(-6)
+        self.change(-1)
+        alert = LowStockAlert.objects.get()
+        self.assertEqual((alert.stock, alert.threshold, alert.resolved_at), (9, 10, None))
+
+        self.change(10)
+        alert.refresh_from_db()
+        self.assertIsNotNone(alert.resolved_at)
+        self.change(-10)
+        self.assertEqual(LowStockAlert.objects.count(), 2)
+        self.assertEqual(LowStockAlert.objects.filter(resolved_at__isnull=True).count(), 1)
+        self.assertEqual(RecentActivity.objects.filter(title='Low stock: Alerted').count(), 2)
+
+    def test_same_crossing_recorded_twice_is_one_activity(self):
+        # Two writers that both saw the product above its threshold
+        crossing = [(self.product.pk, False, 5, 10)]
+        self.assertEqual(len(record_crossings(crossing)), 1)
+        self.assertEqual(record_crossings(crossing), [])
+        self.assertEqual(LowStockAlert.objects.count(), 1)
+        self.assertEqual(RecentActivity.objects.filter(title='Low stock: Alerted').count(), 1)
+
+    def test_changes_that_stay_on_one_side_cost_no_query(self):
+        # Savepoint, lock rows, update, insert transactions, select names, insert activities, release
+        with self.assertNumQueries(7):
+            self.change(-1)
+
+    def test_threshold_edits_and_stock_counts_cross_too(self):
+        inventory = Inventory.objects.get(product=self.product)
+        response = self.client.patch(f'/api/inventory/{inventory.pk}/', {'low_stock_threshold': 25}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(LowStockAlert.objects.filter(product=self.product, resolved_at__isnull=True).exists())
+
+        stocktake.import_counts({'A1': 30, 'A2': 3})
+        self.assertEqual(
+            list(LowStockAlert.objects.filter(resolved_at__isnull=True).values_list('product__product_id', flat=True)),
+            ['A2'],
+        )
+
+    def test_low_stock_filter_and_alerts_endpoint(self):
+        self.change(-15)
+        response = self.client.get('/api/inventory/', {'low_stock': 'true'})
+        self.assertEqual([row['product_id'] for row in response.data['results']], ['A1'])
+        response = self.client.get('/api/inventory/', {'low_stock': 'false'})
+        self.assertEqual([row['product_id'] for row in response.data['results']], ['A2'])
+
+        response = self.client.get('/api/inventory/alerts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(alert['product_id'], alert['stock']) for alert in response.data['results']], [('A1', 5)])
+        self.assertEqual(self.client.get('/api/inventory/alerts/', {'status': 'resolved'}).data['results'], [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan text is SQLite specific')
+    def test_low_stock_count_uses_the_partial_index(self):
+        plan = Inventory.objects.filter(LOW_STOCK, product__is_active=True).explain()
+        self.assertIn('inventory_low_stock_idx', plan)
+
+
+class DemandForecastTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='-', contact='-')
+        self.weekly = Product.objects.create(product_id='F1', name='Monday seller', price=Decimal('1.00'))
+        self.daily = Product.objects.create(product_id='F2', name='Daily seller', price=Decimal('1.00'))
+        self.unsold = Product.objects.create(product_id='F3', name='Unsold', price=Decimal('1.00'))
+        Inventory.objects.update(stock=50)
+        # Twelve weeks ending on a Sunday: 12 units every Monday, 3 units every day
+        self.today = timezone.localdate()
+        self.today -= timedelta(days=self.today.weekday())
+        start = self.today - timedelta(days=forecasting.DEFAULT_HISTORY_DAYS)
+        rows = []
+        for offset in range(forecasting.DEFAULT_HISTORY_DAYS):
+            day = start + timedelta(days=offset)
+            if day.weekday() == 0:
+                rows.append(DailySalesRollup(store=self.store, product=self.weekly, date=day, quantity=12))
+            rows.append(DailySalesRollup(store=self.store, product=self.daily, date=day, quantity=3))
+        DailySalesRollup.objects.bulk_create(rows)
+
+    def test_forecast_follows_the_weekday_pattern(self):
+        fit = forecasting.forecast([self.weekly.pk, self.daily.pk, self.unsold.pk], self.today)
+        week = fit.daily(7)
+        # Forecasts start on a Monday
+        self.assertGreater(week[0, 0], 9)
+        self.assertLess(week[0, 1:].max(), 1)
+        self.assertAlmostEqual(week[0].sum(), 12, places=6)
+        self.assertAlmostEqual(week[1].sum(), 21, places=6)
+        self.assertEqual(week[2].sum(), 0)
+
+    def test_run_writes_reorder_points_back(self):
+        # Read the catalog and its demand, then one bulk update in a transaction,
+        # whatever the catalog size
+        with self.assertNumQueries(5):
+            summary = forecasting.run(today=self.today)
+        self.assertEqual((summary['products'], summary['forecast']), (3, 2))
+
+        weekly, daily, unsold = (
+            Inventory.objects.get(product=product) for product in (self.weekly, self.daily, self.unsold)
+        )
+        # A week of lead time covers one Monday, or seven days of the daily seller,
+        # plus a little safety stock
+        self.assertTrue(12 <= weekly.low_stock_threshold <= 16)
+        self.assertTrue(21 <= daily.low_stock_threshold <= 25)
+        # 50 units already cover two weeks of either
+        self.assertEqual((weekly.reorder_quantity, daily.reorder_quantity), (0, 0))
+        self.assertAlmostEqual(daily.daily_demand, 3)
+        self.assertIsNotNone(daily.forecast_at)
+        self.assertEqual((unsold.low_stock_threshold, unsold.forecast_at), (10, None))
+
+    def test_new_thresholds_raise_alerts(self):
+        Inventory.objects.filter(product=self.daily).update(stock=15)
+        forecasting.run(today=self.today)
+        self.assertEqual(
+            list(LowStockAlert.objects.values_list('product__product_id', flat=True)), ['F2']
+        )
+        # Topped up to two weeks of demand plus safety stock
+        self.assertTrue(42 - 15 <= Inventory.objects.get(product=self.daily).reorder_quantity <= 50 - 15)
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    """Many threads changing one SKU at once must not lose or oversell a unit."""
+
+    threads = 8
+    changes_per_thread = 10
+    initial_stock = 40
+
+    def setUp(self):
+        self.product = Product.objects.create(product_id='HOT', name='Hot seller', price=Decimal('1.00'))
+        Inventory.objects.filter(product=self.product).update(stock=self.initial_stock)
+
+    def hammer(self, quantity):
+        """Run ``changes_per_thread`` changes of ``quantity`` in each thread; count outcomes."""
+        applied = []
+        refused = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def work():
+            try:
+                start.wait()
+                for _ in range(self.changes_per_thread):
+                    while True:
+                        try:
+                            services.apply_stock_changes([{'product_id': self.product.pk, 'quantity': quantity}])
+                            applied.append(1)
+                        except services.InsufficientStockError:
+                            refused.append(1)
+                        except OperationalError as exc:
+                            # SQLite's shared test database reports contention instead of waiting
+                            if 'locked' not in str(exc):
+                                raise
+                            time.sleep(0.001)
+                            continue
+                        break
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        workers = [threading.Thread(target=work) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        return len(applied), len(refused)
+
+    def stock(self):
+        return Inventory.objects.get(product=self.product).stock
+
+    def test_concurrent_restocks_are_not_lost(self):
+        applied, _ = self.hammer(3)
+        self.assertEqual(applied, self.threads * self.changes_per_thread)
+        self.assertEqual(self.stock(), self.initial_stock + 3 * applied)
+        self.assertEqual(InventoryTransaction.objects.filter(product=self.product).count(), applied)
+
+    def test_concurrent_reservations_never_oversell(self):
+        # Twice the stock is requested, one unit at a time
+        applied, refused = self.hammer(-1)
+        self.assertEqual((applied, refused), (self.initial_stock, self.initial_stock))
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(InventoryTransaction.objects.filter(product=self.product).count(), self.initial_stock)
@@ -1,14 +1,102 @@
 # apps/inventory/views.py
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Inventory
-from .serializers import InventorySerializer
+from apps.base.dates import day_bounds
+from apps.products.models import Product
+from . import ledger, services, stocktake
+from .models import LOW_STOCK, Inventory, LowStockAlert
+from .serializers import InventorySerializer, LowStockAlertSerializer, StockChangeSerializer
 
 class InventoryViewSet(viewsets.ModelViewSet):
-    queryset = Inventory.objects.filter(product__is_active=True) 
+    queryset = Inventory.objects.filter(product__is_active=True).select_related('product')
     serializer_class = InventorySerializer
 
+    # Longest stock history served in one request
+    MAX_HISTORY_DAYS = 366
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # ?low_stock=true lists only rows at or below their threshold, from the partial index
+        low_stock = self.request.query_params.get('low_stock', '').lower()
+        if low_stock in ('1', 'true', 'yes'):
+            queryset = queryset.filter(LOW_STOCK)
+        elif low_stock in ('0', 'false', 'no'):
+            queryset = queryset.exclude(LOW_STOCK)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Inventory rows; with ``?as_of=`` (a date, meaning the end of that
+        day, or a datetime) ``stock`` is the stock at that moment.
+        """
+        as_of = request.query_params.get('as_of')
+        if not as_of:
+            return super().list(request, *args, **kwargs)
+        try:
+            moment = self._parse_moment(as_of)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        inventories = list(queryset if page is None else page)
+        stock = ledger.stock_at(moment, [inventory.product_id for inventory in inventories])
+        for inventory in inventories:
+            # Only serialized, never saved
+            inventory.stock = stock.get(inventory.product_id, inventory.stock)
+        serializer = self.get_serializer(inventories, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def _parse_moment(self, value):
+        parsed = parse_datetime(value) if 'T' in value or ' ' in value else parse_date(value)
+        if parsed is None:
+            raise ValueError(f'Invalid date: {value}')
+        if not isinstance(parsed, datetime):
+            return day_bounds(parsed)[1]
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        The product's stock at the end of each day from ``start`` to
+        ``end`` (dates, the last 30 days by default), for charts.
+        """
+        inventory = self.get_object()
+        today = timezone.localdate()
+        try:
+            start, end = (
+                parse_date(request.query_params[name]) if request.query_params.get(name) else default
+                for name, default in (('start', today - timedelta(days=29)), ('end', today))
+            )
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            return Response({'error': 'start and end must be dates (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= self.MAX_HISTORY_DAYS:
+            return Response(
+                {'error': f'start must not be after end, and at most {self.MAX_HISTORY_DAYS} days apart.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'product_id': inventory.product.product_id,
+            'product_name': inventory.product.name,
+            'history': [
+                {'date': day, 'stock': stock}
+                for day, stock in ledger.history(inventory.product_id, start, end)
+            ],
+        })
+
     @action(detail=True, methods=['post'], url_path='restock')
     def restock(self, request, pk=None):
         inventory = self.get_object()
@@ -22,8 +110,9 @@ class InventoryViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
-            inventory.stock += quantity
-            inventory.save()
+            # Added in the database, so concurrent restocks and orders are never lost
+            services.restock(inventory.product_id, quantity, user=request.user, notes=request.data.get('notes'))
+            inventory.refresh_from_db(fields=['stock', 'last_updated'])
             serializer = self.get_serializer(inventory)
             return Response(serializer.data)
             
@@ -31,4 +120,85 @@ class InventoryViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": "Invalid quantity"},
                 status=status.HTTP_400_BAD_REQUEST
-            )
\ No newline at end of file
+            )
+
+    @action(detail=False, methods=['post'])
+    def adjust(self, request):
+        """
+        Apply several stock changes in one transaction, all or nothing.
+
+        Takes a list of ``{product_id, quantity, notes?}`` where a negative
+        quantity removes stock; fails with 400 if any product would go below
+        zero. At most ``STOCK_ADJUST_MAX_CHANGES`` changes per request.
+        """
+        serializer = StockChangeSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.STOCK_ADJUST_MAX_CHANGES
+        )
+        serializer.is_valid(raise_exception=True)
+        changes = serializer.validated_data
+        
+        product_ids = {change['product_id'] for change in changes}
+        missing = product_ids - set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        if missing:
+            return Response(
+                {'error': f"Unknown product ids: {', '.join(map(str, sorted(missing)))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            transactions = services.apply_stock_changes(changes, user=request.user)
+        except services.InsufficientStockError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        inventories = Inventory.objects.filter(product_id__in=product_ids).select_related('product')
+        return Response({
+            'transactions': len(transactions),
+            'inventory': self.get_serializer(inventories, many=True).data,
+        })
+
+    @action(detail=False, methods=['post'], url_path='stock-count')
+    def stock_count(self, request):
+        """
+        Import a stock take and return what it changed.
+
+        Takes a CSV upload in ``file`` with ``product_id`` and
+        ``counted_stock`` columns, or a JSON list of such objects, where
+        ``product_id`` is the product code. Every product is set to its
+        counted stock in one transaction. With ``?dry_run=1`` the report
+        is returned without writing anything.
+        """
+        try:
+            upload = request.FILES.get('file')
+            if upload is not None:
+                counts = stocktake.parse_csv(upload.read())
+            else:
+                counts = stocktake.parse_json(request.data)
+        except stocktake.StockCountError as exc:
+            return Response(
+                {'errors': [{'line': line, 'error': message} for line, message in exc.errors]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        return Response(stocktake.import_counts(counts, user=request.user, dry_run=dry_run))
+
+    @action(detail=False, methods=['get'])
+    def alerts(self, request):
+        """
+        Low-stock alerts, newest first: open ones by default,
+        ``?status=resolved`` or ``?status=all`` for the rest.
+        """
+        alerts = LowStockAlert.objects.select_related('product')
+        state = request.query_params.get('status', 'open')
+        if state == 'open':
+            alerts = alerts.filter(resolved_at__isnull=True)
+        elif state == 'resolved':
+            alerts = alerts.filter(resolved_at__isnull=False)
+        elif state != 'all':
+            return Response(
+                {'error': 'status must be open, resolved or all.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(alerts)
+        if page is not None:
+            return self.get_paginated_response(LowStockAlertSerializer(page, many=True).data)
+        return Response(LowStockAlertSerializer(alerts, many=True).data)
+
@@ -6,4 +6,4 @@ class OrdersConfig(AppConfig):
     name = 'apps.orders'
 
     def ready(self):
-        pass  # Disable signals temporarily during debugging
\ No newline at end of file
+        import apps.orders.signals  # noqa
\ No newline at end of file
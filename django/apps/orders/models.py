@@ -1,3 +1,4 @@
+from decimal import Decimal
 from django.db import models
 from django.conf import settings
 from apps.base.models import TimeStampedModel
@@ -15,6 +16,7 @@ class Order(TimeStampedModel):
         ('Completed', 'Completed'),
         ('Cancelled', 'Cancelled'),
     ]
+    TAX_RATE = Decimal('0.02')
 
     order_id = models.CharField(max_length=12, unique=True)
     store = models.ForeignKey(
@@ -47,6 +49,13 @@ class Order(TimeStampedModel):
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pages of the order list, newest first
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # The same pages filtered by status or by store (and a date range)
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+            models.Index(fields=['store', 'created_at', 'id'], name='order_store_created_idx'),
+        ]
 
     def __str__(self):
         return self.order_id
@@ -54,7 +63,7 @@ class Order(TimeStampedModel):
     def calculate_totals(self):
         """Calculate order totals"""
         self.subtotal = sum(item.total for item in self.items.all())
-        self.tax = self.subtotal * 0.02  # 2% tax
+        self.tax = self.subtotal * self.TAX_RATE  # 2% tax
         self.total = self.subtotal + self.tax
         self.save()
 
@@ -0,0 +1,339 @@
+# apps/orders/receipts.py
+"""
+PDF receipt rendering and its on-disk cache.
+
+A receipt is rendered once per order version. The cache key hashes the
+order id, the order and store ``updated_at`` and the layout version, so
+any edit produces a new file and stale ones simply age out. Files are
+evicted oldest-access first once the cache exceeds
+``RECEIPT_CACHE_MAX_BYTES``. Each process keeps a running total of the
+cache size (from its last scan plus what it wrote since), so the
+directory is only walked when that total crosses the limit rather than
+on every miss. The key doubles as the HTTP ETag.
+
+``stream_zip`` exports many receipts at once, rendering cache misses in a
+process pool and streaming the archive as entries become ready.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+# Bump whenever the rendered layout changes so cached receipts are replaced
+LAYOUT_VERSION = 1
+
+COLUMN_WIDTHS = [2.5 * inch, 1 * inch, 0.9 * inch, 1.1 * inch, 1.1 * inch]
+
+# Bytes believed to be in each cache directory: the total found by this
+# process's last eviction scan plus what it has written since. Other
+# processes' writes only show up at the next scan.
+_cache_bytes = {}
+_cache_bytes_lock = threading.Lock()
+
+
+def receipt_key(order):
+    """Content key of an order's current receipt (also used as its ETag)."""
+    parts = [
+        str(order.pk),
+        order.updated_at.isoformat(),
+        order.store.updated_at.isoformat(),
+        str(LAYOUT_VERSION),
+    ]
+    return hashlib.sha256(':'.join(parts).encode()).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(settings.RECEIPT_CACHE_DIR, key[:2], f'{key}.pdf')
+
+
+def _draw_footer(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica-Oblique', 8)
+    canvas.drawString(1 * inch, 0.6 * inch, 'Thank you for your business! - K-TO-DRINKS TRADING')
+    canvas.drawRightString(letter[0] - 1 * inch, 0.6 * inch, f'Page {doc.page}')
+    canvas.restoreState()
+
+
+def receipt_context(order, items):
+    """
+    Snapshot everything a receipt shows as plain, picklable data.
+
+    ``items`` should have their products loaded. Rendering from a snapshot
+    keeps the ORM out of ``render_receipt`` so it can run in worker
+    processes.
+    """
+    return {
+        'order_id': order.order_id,
+        'date': order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'store': {
+            'name': order.store.name,
+            'address': order.store.address,
+            'contact': order.store.contact,
+        },
+        'items': [
+            (item.product.name, item.product.size or '', item.quantity, item.unit_price, item.total)
+            for item in items
+        ],
+        'subtotal': order.subtotal,
+        'tax': order.tax,
+        'total': order.total,
+    }
+
+
+def render_receipt(context):
+    """
+    Render a receipt PDF from a ``receipt_context`` snapshot and return its bytes.
+
+    The item table is a LongTable repeating its header, so long orders flow
+    over as many pages as needed.
+    """
+    styles = getSampleStyleSheet()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        title=f"Order Receipt - {context['order_id']}",
+        leftMargin=1 * inch,
+        rightMargin=1 * inch,
+        topMargin=1 * inch,
+        bottomMargin=1 * inch,
+    )
+
+    story = [
+        Paragraph('K-TO-DRINKS TRADING', styles['Title']),
+        Paragraph('Order Receipt', styles['Normal']),
+        Spacer(1, 0.2 * inch),
+        Paragraph(f"<b>Order ID: {context['order_id']}</b>", styles['Normal']),
+        Paragraph(f"Date: {context['date']}", styles['Normal']),
+        Spacer(1, 0.1 * inch),
+        Paragraph(f"Store: {context['store']['name']}", styles['Normal']),
+        Paragraph(f"Address: {context['store']['address']}", styles['Normal']),
+        Paragraph(f"Contact: {context['store']['contact']}", styles['Normal']),
+        Spacer(1, 0.3 * inch),
+    ]
+
+    data = [['Product', 'Size', 'Quantity', 'Unit Price', 'Total']]
+    for name, size, quantity, unit_price, total in context['items']:
+        data.append([
+            Paragraph(name, styles['BodyText']),
+            size,
+            str(quantity),
+            f'₱{unit_price:.2f}',
+            f'₱{total:.2f}',
+        ])
+    data.append(['', '', '', 'Subtotal:', f"₱{context['subtotal']:.2f}"])
+    data.append(['', '', '', 'Tax (2%):', f"₱{context['tax']:.2f}"])
+    data.append(['', '', '', 'Total:', f"₱{context['total']:.2f}"])
+
+    table = LongTable(data, colWidths=COLUMN_WIDTHS, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('VALIGN', (0, 1), (-1, -1), 'MIDDLE'),
+        ('BACKGROUND', (0, 1), (-1, -4), colors.white),
+        ('BACKGROUND', (0, -3), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (3, -3), (-1, -1), 'Helvetica-Bold'),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -4), 1, colors.black),
+        ('LINEBELOW', (3, -3), (-1, -1), 1, colors.black),
+    ]))
+    story.append(table)
+
+    doc.build(story, onFirstPage=_draw_footer, onLaterPages=_draw_footer)
+    return buffer.getvalue()
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def evict(max_bytes=None):
+    """Delete least recently used receipts until the cache fits ``max_bytes``."""
+    max_bytes = settings.RECEIPT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _dirs, files in os.walk(settings.RECEIPT_CACHE_DIR):
+        for name in files:
+            if not name.endswith('.pdf'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    removed = 0
+    for _mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    with _cache_bytes_lock:
+        _cache_bytes[settings.RECEIPT_CACHE_DIR] = total
+    return removed
+
+
+def _record_write(size):
+    """Count ``size`` written bytes, evicting once the cache may be over its limit."""
+    with _cache_bytes_lock:
+        total = _cache_bytes.get(settings.RECEIPT_CACHE_DIR)
+        if total is not None:
+            total = _cache_bytes[settings.RECEIPT_CACHE_DIR] = total + size
+            if total <= settings.RECEIPT_CACHE_MAX_BYTES:
+                return
+    evict()
+
+
+def _touch(path):
+    """Mark a cached receipt as used; False when it is not cached."""
+    try:
+        # Hits refresh the modification time so eviction is least-recently-used
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def open_receipt(order, key=None):
+    """
+    Open the cached receipt of ``order``, rendering it on a miss.
+
+    Returns a binary file object positioned at the start of the PDF.
+    """
+    key = key or receipt_key(order)
+    path = _cache_path(key)
+    if _touch(path):
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            # Evicted in between, render it again
+            pass
+
+    items = order.items.select_related('product').order_by('pk')
+    content = render_receipt(receipt_context(order, items))
+    _write_atomic(path, content)
+    _record_write(len(content))
+    return io.BytesIO(content)
+
+
+def render_to_path(context, path):
+    """Render a receipt straight into the cache. Runs in worker processes."""
+    _write_atomic(path, render_receipt(context))
+    return path
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only sink collecting what ZipFile writes until it is drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _zip_entry(archive, buffer, name, path, chunk_size):
+    with open(path, 'rb') as source, archive.open(name, 'w') as target:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            target.write(chunk)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream_zip(orders, max_workers=None, chunk_size=64 * 1024):
+    """
+    Yield a zip archive of the receipts of ``orders`` chunk by chunk.
+
+    ``orders`` need their store and items (with products) loaded. Cached
+    receipts are sent first while misses render in a process pool of
+    ``max_workers`` (``RECEIPT_EXPORT_WORKERS``, by default one per CPU);
+    each is added as soon as it is ready. Only one chunk of one receipt is
+    held in memory at a time.
+    """
+    if max_workers is None:
+        max_workers = settings.RECEIPT_EXPORT_WORKERS or os.cpu_count() or 1
+
+    cached = []
+    misses = []
+    for order in orders:
+        name = f'order_{order.order_id}.pdf'
+        path = _cache_path(receipt_key(order))
+        if _touch(path):
+            cached.append((name, path))
+        else:
+            misses.append((name, path, receipt_context(order, order.items.all())))
+
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, path in cached:
+            yield from _zip_entry(archive, buffer, name, path, chunk_size)
+
+        if len(misses) > 1 and max_workers > 1:
+            pool = ProcessPoolExecutor(max_workers=min(max_workers, len(misses)))
+            try:
+                futures = {
+                    pool.submit(render_to_path, context, path): name
+                    for name, path, context in misses
+                }
+                for future in as_completed(futures):
+                    yield from _zip_entry(archive, buffer, futures[future], future.result(), chunk_size)
+            finally:
+                # Stop pending renders if the client went away mid-download
+                pool.shutdown(cancel_futures=True)
+        else:
+            for name, path, context in misses:
+                yield from _zip_entry(archive, buffer, name, render_to_path(context, path), chunk_size)
+    yield buffer.drain()
+
+    written = 0
+    for _name, path, _context in misses:
+        try:
+            written += os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    if misses:
+        _record_write(written)
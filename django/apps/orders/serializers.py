@@ -1,5 +1,10 @@
 # apps/orders/serializers.py
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
+from apps.base.serializers import PreloadedPrimaryKeyRelatedField, SparseFieldsetMixin
+from apps.inventory.services import InsufficientStockError
+from . import services
 from .models import Order, OrderItem
 from apps.stores.models import Store
 from apps.products.models import Product
@@ -17,7 +22,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         max_digits=10,
         decimal_places=2,
         read_only=True,
-        source='total_price'
+        source='total'
     )
     
     class Meta:
@@ -25,16 +30,24 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_id', 'quantity', 'unit_price', 'total_price']
         read_only_fields = ['id']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderLineSerializer(serializers.Serializer):
+    """An incoming order line, as sent in ``order_items``"""
+    id = serializers.IntegerField(required=False)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     store = StoreSerializer(read_only=True)
-    store_id = serializers.PrimaryKeyRelatedField(
+    store_id = PreloadedPrimaryKeyRelatedField(
         queryset=Store.objects.all(),
         source='store',
         write_only=True
     )
     items = OrderItemSerializer(many=True, read_only=True)
-    order_items = serializers.ListField(
-        child=serializers.DictField(),
+    order_items = OrderLineSerializer(
+        many=True,
         write_only=True,
         required=False
     )
@@ -42,9 +55,18 @@ class OrderSerializer(serializers.ModelSerializer):
         max_digits=10,
         decimal_places=2,
         read_only=True,
-        source='total_amount'
+        source='total'
     )
     created_by = serializers.StringRelatedField(read_only=True)
+
+    # Relations read by each field, loaded only when the field is rendered
+    select_related_fields = {
+        'store': ['store'],
+        'created_by': ['created_by'],
+    }
+    prefetch_related_fields = {
+        'items': [Prefetch('items', queryset=OrderItem.objects.select_related('product'))],
+    }
     
     class Meta:
         model = Order
@@ -57,75 +79,28 @@ class OrderSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         # Get the current user from the request
-        user = self.context['request'].user
-        validated_data['created_by'] = user
-        
-        # Generate order ID
-        import uuid
-        validated_data['order_id'] = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Extract and remove order items data
-        order_items_data = validated_data.pop('order_items', [])
-        
-        # Create order
-        order = super().create(validated_data)
-        
-        # Create order items
-        for item_data in order_items_data:
-            product_id = item_data.get('product_id')
-            quantity = item_data.get('quantity', 1)
-            unit_price = item_data.get('unit_price')
-            
-            try:
-                product = Product.objects.get(id=product_id)
-                
-                # If unit_price is not provided, use product's unit_price
-                if not unit_price:
-                    unit_price = product.unit_price
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    unit_price=unit_price
-                )
-            except Product.DoesNotExist:
-                pass
-        
-        return order
+        validated_data['created_by'] = self.context['request'].user
+        try:
+            order = services.create_orders([validated_data])[0]
+        except (services.UnknownProductError, InsufficientStockError) as exc:
+            raise serializers.ValidationError({'order_items': [str(exc)]})
+        # Reload with the relations the response renders
+        return self.setup_eager_loading(Order.objects.filter(pk=order.pk)).get()
     
     def update(self, instance, validated_data):
         # Extract and remove order items data
         order_items_data = validated_data.pop('order_items', [])
         
-        # Update order
-        instance = super().update(instance, validated_data)
-        
-        # If order items are provided, replace existing items
-        if order_items_data:
-            # Delete existing items
-            instance.items.all().delete()
-            
-            # Create new items
-            for item_data in order_items_data:
-                product_id = item_data.get('product_id')
-                quantity = item_data.get('quantity', 1)
-                unit_price = item_data.get('unit_price')
+        try:
+            with transaction.atomic():
+                # Update order (reopening a cancelled order reserves its stock again)
+                instance = super().update(instance, validated_data)
                 
-                try:
-                    product = Product.objects.get(id=product_id)
-                    
-                    # If unit_price is not provided, use product's unit_price
-                    if not unit_price:
-                        unit_price = product.unit_price
-                    
-                    OrderItem.objects.create(
-                        order=instance,
-                        product=product,
-                        quantity=quantity,
-                        unit_price=unit_price
-                    )
-                except Product.DoesNotExist:
-                    pass
+                # If order items are provided, apply only the changed lines
+                if order_items_data:
+                    services.update_order_items(instance, order_items_data)
+        except (services.UnknownProductError, InsufficientStockError) as exc:
+            raise serializers.ValidationError({'order_items': [str(exc)]})
         
-        return instance
\ No newline at end of file
+        # Reload with the relations the response renders
+        return self.setup_eager_loading(Order.objects.filter(pk=instance.pk)).get()
@@ -0,0 +1,216 @@
+# apps/orders/services.py
+"""
+Bulk write paths for orders.
+
+Saving an OrderItem recalculates and re-saves its order, so creating an
+N-line order through the models costs O(N^2) work. These helpers resolve
+products in one query, insert orders and items with ``bulk_create`` and
+compute totals once, all inside one transaction. Updates diff incoming
+lines against the stored items so only changed rows are written. Since
+bulk writes skip the per-row signals, ``order_items_bulk_saved`` is sent
+afterwards.
+
+Orders hold stock: the units they take are reserved in the same
+transaction through apps.inventory.services, and creating or growing an
+order fails with InsufficientStockError when stock runs short. Cancelled
+orders hold none (see apps.orders.signals).
+"""
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.inventory import services as inventory
+from apps.products.models import Product
+from .models import Order, OrderItem
+from .signals import order_items_bulk_saved
+
+
+class UnknownProductError(ValueError):
+    """Raised when order lines reference products that do not exist."""
+
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Unknown product ids: {', '.join(map(str, self.product_ids))}")
+
+
+def generate_order_id():
+    return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+
+
+def resolve_products(lines):
+    """Fetch the products referenced by ``lines`` in one query."""
+    product_ids = {line['product_id'] for line in lines}
+    products = Product.objects.in_bulk(product_ids)
+    missing = product_ids - set(products)
+    if missing:
+        raise UnknownProductError(missing)
+    return products
+
+
+def build_item(order, line, products):
+    """Build an unsaved OrderItem for one line; unit price defaults to the product price."""
+    product = products[line['product_id']]
+    quantity = line.get('quantity') or 1
+    unit_price = line.get('unit_price') or product.price
+    return OrderItem(
+        order=order,
+        product=product,
+        quantity=quantity,
+        unit_price=unit_price,
+        total=quantity * unit_price,
+    )
+
+
+def apply_totals(order, items):
+    """Set the order totals from its (unsaved) items."""
+    order.subtotal = sum((item.total for item in items), Decimal('0'))
+    order.tax = order.subtotal * Order.TAX_RATE
+    order.total = order.subtotal + order.tax
+
+
+def create_orders(orders_data, user=None):
+    """
+    Create several orders with their lines in one transaction.
+
+    Each entry of ``orders_data`` holds Order field values plus an optional
+    ``order_items`` list of ``{'product_id', 'quantity', 'unit_price'}``
+    dicts. Returns the created orders.
+    """
+    orders_data = [dict(data) for data in orders_data]
+    lines = [line for data in orders_data for line in data.get('order_items') or []]
+    products = resolve_products(lines)
+
+    orders = []
+    items = []
+    for data in orders_data:
+        order_lines = data.pop('order_items', None) or []
+        data.setdefault('order_id', generate_order_id())
+        if user is not None:
+            data.setdefault('created_by', user)
+        order = Order(**data)
+        order_items = [build_item(order, line, products) for line in order_lines]
+        apply_totals(order, order_items)
+        orders.append(order)
+        items.extend(order_items)
+
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        # Items pick up their order's new primary key when inserted
+        OrderItem.objects.bulk_create(items)
+        reserve_stock(orders, items)
+        order_items_bulk_saved.send(sender=Order, orders=orders, items=items, created=True)
+    return orders
+
+
+def holds_stock(status):
+    """Whether orders in ``status`` keep their units out of stock."""
+    return status != 'Cancelled'
+
+
+def held_quantities(items):
+    """Units per product held by ``items``."""
+    quantities = Counter()
+    for item in items:
+        quantities[item.product_id] += item.quantity
+    return quantities
+
+
+def reserve_stock(orders, items):
+    """Take the units of newly created orders' items from stock, in one batch."""
+    items_by_order = {}
+    for item in items:
+        items_by_order.setdefault(id(item.order), []).append(item)
+    changes = []
+    for order in orders:
+        if holds_stock(order.status):
+            changes.extend(inventory.order_changes(order, held_quantities(items_by_order.get(id(order), []))))
+    inventory.apply_stock_changes(changes, source='order')
+
+
+def refresh_totals(order):
+    """Recompute an order's totals with one SQL aggregate and one UPDATE."""
+    subtotal = order.items.aggregate(subtotal=Sum('total'))['subtotal'] or Decimal('0')
+    order.subtotal = subtotal
+    order.tax = subtotal * Order.TAX_RATE
+    order.total = subtotal + order.tax
+    # update() bypasses auto_now, so the timestamp is set explicitly
+    order.updated_at = timezone.now()
+    Order.objects.filter(pk=order.pk).update(
+        subtotal=order.subtotal,
+        tax=order.tax,
+        total=order.total,
+        updated_at=order.updated_at,
+    )
+
+
+def update_order_items(order, lines):
+    """
+    Make ``order``'s items match ``lines`` by applying only the differences.
+
+    A line updates the existing item with the same ``id`` when given, else
+    the first unmatched item for the same product; other lines are inserted
+    and unmatched items deleted. A matched line without ``unit_price``
+    keeps the stored price. Returns ``{'created', 'updated', 'deleted'}``
+    counts.
+    """
+    products = resolve_products(lines)
+    existing = list(order.items.all())
+    by_id = {item.pk: item for item in existing}
+    held_before = held_quantities(existing)
+
+    to_create = []
+    to_update = []
+    matched_ids = set()
+    for line in lines:
+        item = by_id.get(line.get('id'))
+        if item is None or item.pk in matched_ids:
+            item = next(
+                (candidate for candidate in existing
+                 if candidate.product_id == line['product_id'] and candidate.pk not in matched_ids),
+                None
+            )
+        if item is None:
+            to_create.append(build_item(order, line, products))
+            continue
+
+        matched_ids.add(item.pk)
+        product = products[line['product_id']]
+        quantity = line.get('quantity') or 1
+        unit_price = line.get('unit_price')
+        if not unit_price:
+            unit_price = item.unit_price if item.product_id == product.pk else product.price
+        if (item.product_id, item.quantity, item.unit_price) != (product.pk, quantity, unit_price):
+            item.product = product
+            item.quantity = quantity
+            item.unit_price = unit_price
+            item.total = quantity * unit_price
+            to_update.append(item)
+    to_delete = [item for item in existing if item.pk not in matched_ids]
+    held = held_quantities([item for item in existing if item.pk in matched_ids] + to_create)
+    held.subtract(held_before)
+
+    now = timezone.now()
+    for item in to_update:
+        item.updated_at = now
+    with transaction.atomic():
+        if to_delete:
+            OrderItem.objects.filter(pk__in=[item.pk for item in to_delete]).delete()
+        if to_update:
+            OrderItem.objects.bulk_update(to_update, ['product', 'quantity', 'unit_price', 'total', 'updated_at'])
+        if to_create:
+            OrderItem.objects.bulk_create(to_create)
+        if holds_stock(order.status):
+            inventory.apply_stock_changes(inventory.order_changes(order, held), source='order')
+        if to_delete or to_update or to_create:
+            refresh_totals(order)
+            order_items_bulk_saved.send(
+                sender=Order,
+                orders=[order],
+                items=to_create + to_update + to_delete,
+                created=False,
+            )
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
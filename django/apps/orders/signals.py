@@ -1,10 +1,49 @@
 # apps/orders/signals.py
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_init, post_save
+from django.dispatch import Signal, receiver
 from .models import Order
 
+# Sent by the bulk order paths in apps.orders.services, which bypass the
+# per-row save signals. Receivers get the ``orders`` and ``items`` that were
+# written and ``created`` (True when the orders are new).
+order_items_bulk_saved = Signal()
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    """Keep the loaded status so saves can tell a cancellation without querying"""
+    instance._stock_status = instance.__dict__.get('status')
+
+
 @receiver(post_save, sender=Order)
 def update_inventory_on_order(sender, instance, created, **kwargs):
-    if created:
-        from apps.inventory.models import InventoryTransaction  # Local import
-        # Your signal logic here
\ No newline at end of file
+    """
+    Release an order's stock when it is cancelled and reserve it again when
+    it is reopened. Stock for new and edited items is reserved by
+    apps.orders.services as they are written; items saved any other way
+    reserve nothing, so the ledger, not the items, says what to release,
+    and reopening takes back only what the cancellation released.
+    """
+    from apps.inventory import services as inventory  # Local import
+    from . import services
+
+    previous, instance._stock_status = instance._stock_status, instance.status
+    if created or previous is None:
+        return
+    held_before = services.holds_stock(previous)
+    if held_before == services.holds_stock(instance.status):
+        return
+
+    ledger = inventory.order_ledger(instance)
+    # Cancelling gives back everything held; reopening takes back what
+    # cancellations gave and no reopening has taken yet
+    reason = inventory.CANCELLED if held_before else inventory.REOPENED
+    held = {}
+    for key in ledger if held_before else (inventory.CANCELLED, inventory.REOPENED):
+        for product_id, quantity in ledger[key].items():
+            held[product_id] = held.get(product_id, 0) + quantity
+    quantities = {
+        product_id: -quantity for product_id, quantity in held.items()
+        if (quantity > 0 if held_before else quantity < 0)
+    }
+    inventory.apply_stock_changes(inventory.order_changes(instance, quantities, reason), source='order')
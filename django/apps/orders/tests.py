@@ -0,0 +1,404 @@
+import io
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.base.dates import day_bounds
+from apps.dashboard.models import DailySalesRollup, RecentActivity
+from apps.inventory.models import Inventory
+from apps.products.models import Product
+from apps.stores.models import Store
+from . import receipts, services
+from .models import Order, OrderItem
+
+User = get_user_model()
+
+
+def stock(products, quantity=1000):
+    """Give bulk-created products (which skip the inventory signal) stock to order from."""
+    Inventory.objects.bulk_create([Inventory(product=product, stock=quantity) for product in products])
+
+
+class OrderListQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='orders', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.products = Product.objects.bulk_create([
+            Product(product_id=f'P{i}', name=f'Product {i}', price=Decimal('10.00'))
+            for i in range(3)
+        ])
+
+    def create_orders(self, count):
+        for i in range(count):
+            store = Store.objects.create(name=f'Store {i}', owner_name='Owner', address='-', contact='-')
+            order = Order.objects.create(
+                order_id=f'Q{Order.objects.count():011d}', store=store, created_by=self.user
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=2, unit_price=product.price, total=product.price * 2)
+                for product in self.products
+            ])
+            order.calculate_totals()
+
+    def test_list_query_count_does_not_grow_with_orders(self):
+        self.create_orders(2)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/orders/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.create_orders(5)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/orders/')
+        self.assertEqual(len(response.data['results']), 7)
+        first = response.data['results'][0]
+        self.assertEqual(first['total_amount'], '61.20')
+        self.assertEqual(first['created_by'], 'orders')
+        self.assertEqual(len(first['items']), 3)
+        self.assertEqual(first['items'][0]['total_price'], '20.00')
+
+    def test_sparse_fieldset_skips_relations(self):
+        self.create_orders(3)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/orders/', {'fields': 'id,order_id,status,total_amount'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'order_id', 'status', 'total_amount'})
+
+    def test_retrieve_with_items_only(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/orders/orders/{order.pk}/', {'fields': 'order_id,items'})
+        self.assertEqual(set(response.data), {'order_id', 'items'})
+        self.assertEqual(len(response.data['items']), 3)
+
+    def test_date_range_is_local_days(self):
+        self.create_orders(3)
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        late, early, _ = Order.objects.order_by('pk')
+        # The last minute of yesterday and the first of today, local time
+        Order.objects.filter(pk=late.pk).update(created_at=day_bounds(yesterday)[1] - timedelta(minutes=1))
+        Order.objects.filter(pk=early.pk).update(created_at=day_bounds(today)[0])
+
+        def listed(**params):
+            response = self.client.get('/api/orders/orders/', {'fields': 'order_id', **params})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return {order['order_id'] for order in response.data['results']}
+
+        self.assertEqual(listed(end_date=yesterday.isoformat()), {late.order_id})
+        self.assertEqual(listed(start_date=yesterday.isoformat(), end_date=yesterday.isoformat()), {late.order_id})
+        self.assertNotIn(late.order_id, listed(start_date=today.isoformat()))
+        self.assertIn(early.order_id, listed(start_date=today.isoformat()))
+        response = self.client.get('/api/orders/orders/', {'start_date': '2024-02-30'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderBulkCreateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='bulk', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.stores = [
+            Store.objects.create(name=f'Store {i}', owner_name='Owner', address='-', contact='-')
+            for i in range(3)
+        ]
+        self.products = Product.objects.bulk_create([
+            Product(product_id=f'B{i}', name=f'Product {i}', price=Decimal('5.00'))
+            for i in range(20)
+        ])
+        stock(self.products)
+
+    def lines(self, count):
+        return [{'product_id': product.pk, 'quantity': 2} for product in self.products[:count]]
+
+    def test_create_computes_totals_once(self):
+        response = self.client.post(
+            '/api/orders/orders/',
+            {'store_id': self.stores[0].pk, 'order_items': self.lines(20)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(order.subtotal, Decimal('200.00'))
+        self.assertEqual(order.total, Decimal('204.00'))
+        self.assertEqual(order.created_by, self.user)
+
+    def test_create_query_count_does_not_grow_with_lines(self):
+        def post(count):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(
+                    '/api/orders/orders/',
+                    {'store_id': self.stores[0].pk, 'order_items': self.lines(count)},
+                    format='json'
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(post(2), post(20))
+
+    def test_unknown_product_is_rejected(self):
+        response = self.client.post(
+            '/api/orders/orders/',
+            {'store_id': self.stores[0].pk, 'order_items': [{'product_id': 999999}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_batch_creates_orders_and_updates_rollup(self):
+        payload = [
+            {'store_id': store.pk, 'order_items': self.lines(5)}
+            for store in self.stores for _ in range(4)
+        ]
+        response = self.client.post('/api/orders/orders/batch/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(Order.objects.count(), 12)
+        self.assertEqual(OrderItem.objects.count(), 60)
+        self.assertEqual(RecentActivity.objects.filter(activity_type='order').count(), 12)
+        self.assertEqual(
+            DailySalesRollup.objects.aggregate(total=Sum('revenue'))['total'],
+            Decimal('600.00')
+        )
+
+    def test_batch_query_count_does_not_grow_with_orders(self):
+        def post(count):
+            payload = [{'store_id': self.stores[i % 3].pk, 'order_items': self.lines(3)} for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/orders/orders/batch/', payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(post(3), post(30))
+
+    def test_batch_is_all_or_nothing(self):
+        payload = [
+            {'store_id': self.stores[0].pk, 'order_items': self.lines(2)},
+            {'store_id': self.stores[1].pk, 'order_items': [{'product_id': 999999}]},
+        ]
+        response = self.client.post('/api/orders/orders/batch/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_batch_rejects_unknown_store(self):
+        payload = [{'store_id': 999999, 'order_items': self.lines(1)}]
+        response = self.client.post('/api/orders/orders/batch/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderItemDiffUpdateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='diff', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(name='Store', owner_name='Owner', address='-', contact='-')
+        self.products = Product.objects.bulk_create([
+            Product(product_id=f'D{i}', name=f'Product {i}', price=Decimal('2.00'))
+            for i in range(52)
+        ])
+        stock(self.products)
+        response = self.client.post(
+            '/api/orders/orders/',
+            {'store_id': self.store.pk, 'order_items': [
+                {'product_id': product.pk, 'quantity': 1} for product in self.products[:50]
+            ]},
+            format='json'
+        )
+        self.order = Order.objects.get(pk=response.data['id'])
+
+    def lines(self):
+        return [
+            {'id': item.pk, 'product_id': item.product_id, 'quantity': item.quantity}
+            for item in self.order.items.order_by('pk')
+        ]
+
+    def patch(self, lines):
+        return self.client.patch(
+            f'/api/orders/orders/{self.order.pk}/', {'order_items': lines}, format='json'
+        )
+
+    def test_single_quantity_change_touches_one_row(self):
+        lines = self.lines()
+        lines[10]['quantity'] = 5
+        item_ids = set(self.order.items.values_list('pk', flat=True))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.patch(lines)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Reserving the extra stock adds a constant five queries
+        self.assertLess(len(ctx.captured_queries), 25)
+
+        self.assertEqual(set(self.order.items.values_list('pk', flat=True)), item_ids)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('108.00'))
+        self.assertEqual(response.data['total_amount'], '110.16')
+        rollup = DailySalesRollup.objects.get(product=self.products[10])
+        self.assertEqual(rollup.quantity, 5)
+
+    def test_lines_are_added_removed_and_repriced(self):
+        lines = self.lines()[:2]
+        lines[1]['product_id'] = self.products[51].pk
+        lines.append({'product_id': self.products[50].pk, 'quantity': 3, 'unit_price': '1.50'})
+
+        response = self.patch(lines)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        items = {item.product_id: item for item in self.order.items.all()}
+        self.assertEqual(set(items), {self.products[0].pk, self.products[51].pk, self.products[50].pk})
+        self.assertEqual(items[self.products[50].pk].total, Decimal('4.50'))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('8.50'))
+        self.assertFalse(DailySalesRollup.objects.filter(product=self.products[1]).exists())
+        self.assertEqual(DailySalesRollup.objects.get(product=self.products[51]).quantity, 1)
+
+    def test_unchanged_lines_write_nothing(self):
+        updated_at = self.order.items.values_list('updated_at', flat=True).first()
+        response = self.patch(self.lines())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.order.items.values_list('updated_at', flat=True).first(), updated_at)
+
+
+class OrderReceiptPdfTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        overrides = override_settings(RECEIPT_CACHE_DIR=self.cache_dir.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='pdf', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(name='Store', owner_name='Owner', address='1 Road', contact='0917')
+        products = Product.objects.bulk_create([
+            Product(product_id=f'R{i}', name=f'Product {i}', price=Decimal('3.00'), size='1L')
+            for i in range(120)
+        ])
+        stock(products)
+        self.order = services.create_orders([{
+            'store': store,
+            'order_items': [{'product_id': product.pk, 'quantity': 1} for product in products],
+        }], user=self.user)[0]
+        self.url = f'/api/orders/orders/{self.order.pk}/pdf/'
+
+    def cached_files(self):
+        return [name for _root, _dirs, files in os.walk(self.cache_dir.name) for name in files]
+
+    def test_renders_once_and_revalidates_with_etag(self):
+        with mock.patch.object(receipts, 'render_receipt', wraps=receipts.render_receipt) as render:
+            first = self.client.get(self.url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            content = b''.join(first.streaming_content)
+            self.assertTrue(content.startswith(b'%PDF'))
+            etag = first['ETag']
+
+            second = self.client.get(self.url)
+            self.assertEqual(b''.join(second.streaming_content), content)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(len(self.cached_files()), 1)
+
+    def test_order_change_produces_new_receipt(self):
+        etag = self.client.get(self.url)['ETag']
+        self.order.notes = 'Leave at the back door'
+        self.order.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_long_orders_span_pages(self):
+        content = b''.join(self.client.get(self.url).streaming_content)
+        self.assertGreater(content.count(b'/Type /Page\n'), 1)
+
+    def test_eviction_keeps_cache_under_limit(self):
+        self.client.get(self.url)
+        self.order.save()
+        with override_settings(RECEIPT_CACHE_MAX_BYTES=0):
+            self.client.get(self.url)
+        self.assertEqual(self.cached_files(), [])
+
+    def test_misses_scan_the_cache_only_near_the_limit(self):
+        with mock.patch.object(receipts.os, 'walk', wraps=os.walk) as walk:
+            for _ in range(3):
+                self.order.save()
+                self.client.get(self.url)
+            # One scan to learn the size, then the running total covers it
+            self.assertEqual(walk.call_count, 1)
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _dirs, files in os.walk(self.cache_dir.name) for name in files)
+            with override_settings(RECEIPT_CACHE_MAX_BYTES=size):
+                self.order.save()
+                self.client.get(self.url)
+        self.assertEqual(len(self.cached_files()), 3)
+
+    def test_receipt_data_uses_store_fields(self):
+        response = self.client.get(f'/api/orders/orders/{self.order.pk}/receipt/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['store']['location'], '1 Road')
+        self.assertEqual(len(response.data['items']), 120)
+        self.assertEqual(response.data['total'], 367.2)
+
+
+class OrderPdfExportTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        overrides = override_settings(RECEIPT_CACHE_DIR=self.cache_dir.name, RECEIPT_EXPORT_WORKERS=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='export', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(name='Store', owner_name='Owner', address='1 Road', contact='0917')
+        product = Product.objects.create(product_id='E1', name='Product', price=Decimal('3.00'))
+        Inventory.objects.filter(product=product).update(stock=100)
+        self.orders = services.create_orders([
+            {
+                'store': store,
+                'delivery_day': 'Tuesday' if i < 4 else 'Friday',
+                'order_items': [{'product_id': product.pk, 'quantity': i + 1}],
+            }
+            for i in range(6)
+        ], user=self.user)
+
+    def download(self, params):
+        response = self.client.get('/api/orders/orders/export_pdf/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_exports_delivery_day_in_process_pool(self):
+        archive = self.download({'delivery_day': 'Tuesday'})
+        expected = {f'order_{order.order_id}.pdf' for order in self.orders[:4]}
+        self.assertEqual(set(archive.namelist()), expected)
+        for name in archive.namelist():
+            self.assertTrue(archive.read(name).startswith(b'%PDF'))
+
+    def test_reuses_cached_receipts(self):
+        order = self.orders[5]
+        single = b''.join(self.client.get(f'/api/orders/orders/{order.pk}/pdf/').streaming_content)
+        with mock.patch.object(receipts, 'render_receipt') as render:
+            archive = self.download({'ids': str(order.pk)})
+        render.assert_not_called()
+        self.assertEqual(archive.read(f'order_{order.order_id}.pdf'), single)
+
+    def test_requires_a_selection(self):
+        response = self.client.get('/api/orders/orders/export_pdf/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/orders/orders/export_pdf/', {'delivery_day': 'Sunday'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
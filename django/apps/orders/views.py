@@ -1,17 +1,20 @@
 # apps/orders/views.py
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from apps.base.dates import day_bounds
+from apps.base.serializers import requested_fields
+from apps.inventory.services import InsufficientStockError
+from apps.stores.models import Store
+from . import receipts, services
 from .models import Order
 from .serializers import OrderSerializer
-from django.http import HttpResponse
-import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib.units import inch
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags
 
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
@@ -21,6 +24,17 @@ class OrderViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Order.objects.all()
         
+        # Load only the relations the response will render
+        if self.action in ('list', 'retrieve'):
+            queryset = self.get_serializer_class().setup_eager_loading(
+                queryset, requested_fields(self.request)
+            )
+        elif self.action in ('receipt', 'export_pdf'):
+            queryset = self.get_serializer_class().setup_eager_loading(queryset, {'store', 'items'})
+        elif self.action == 'pdf':
+            # Items are only read when the receipt is not cached yet
+            queryset = queryset.select_related('store')
+        
         # Filter by status
         status = self.request.query_params.get('status')
         if status:
@@ -31,30 +45,80 @@ class OrderViewSet(viewsets.ModelViewSet):
         if store_id:
             queryset = queryset.filter(store_id=store_id)
         
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        if start_date and end_date:
-            queryset = queryset.filter(created_at__date__range=[start_date, end_date])
-        elif start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-        elif end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
-        
-        # Limit results
-        limit = self.request.query_params.get('limit')
-        if limit:
-            try:
-                limit = int(limit)
-                queryset = queryset[:limit]
-            except ValueError:
-                pass
+        # Filter by delivery day
+        delivery_day = self.request.query_params.get('delivery_day')
+        if delivery_day:
+            queryset = queryset.filter(delivery_day=delivery_day)
+        
+        # Filter by a comma separated list of ids
+        ids = self.request.query_params.get('ids')
+        if ids:
+            queryset = queryset.filter(pk__in=[pk for pk in ids.split(',') if pk.strip().isdigit()])
+        
+        # Filter by date range, as a created_at range so its index is used
+        # (created_at__date wraps the column in a cast no index covers)
+        start_date = self._query_date('start_date')
+        if start_date:
+            queryset = queryset.filter(created_at__gte=day_bounds(start_date)[0])
+        end_date = self._query_date('end_date')
+        if end_date:
+            queryset = queryset.filter(created_at__lt=day_bounds(end_date)[1])
         
         return queryset
     
+    def _query_date(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: f'Invalid date: {value}'})
+        return day
+    
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    # Largest number of orders accepted by one batch request
+    batch_limit = 500
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Create many orders in one request and one transaction."""
+        data = request.data.get('orders') if isinstance(request.data, dict) else request.data
+        if not isinstance(data, list) or not data:
+            return Response({'error': 'Expected a non-empty list of orders'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > self.batch_limit:
+            return Response(
+                {'error': f'At most {self.batch_limit} orders per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Resolve every referenced store in one query instead of one per order
+        store_ids = set()
+        for entry in data:
+            value = entry.get('store_id') if isinstance(entry, dict) else None
+            if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+                store_ids.add(int(value))
+        context = self.get_serializer_context()
+        context['preloaded'] = {Store: Store.objects.in_bulk(store_ids)}
+        serializer = self.get_serializer_class()(data=data, many=True, context=context)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            orders = services.create_orders(serializer.validated_data, user=request.user)
+        except (services.UnknownProductError, InsufficientStockError) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.get_serializer_class().setup_eager_loading(
+            Order.objects.filter(pk__in=[order.pk for order in orders]),
+            requested_fields(request)
+        )
+        response_serializer = self.get_serializer(queryset, many=True)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['get'])
     def receipt(self, request, pk=None):
         """Get receipt data for an order."""
@@ -66,123 +130,72 @@ class OrderViewSet(viewsets.ModelViewSet):
             'date': order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'store': {
                 'name': order.store.name,
-                'location': order.store.location,
-                'contact': order.store.number
+                'location': order.store.address,
+                'contact': order.store.contact
             },
             'items': [],
-            'subtotal': 0,
-            'tax': 0,
-            'total': 0
+            'subtotal': float(order.subtotal),
+            'tax': float(order.tax),
+            'total': float(order.total)
         }
         
         # Add items
         for item in order.items.all():
-            item_data = {
+            receipt_data['items'].append({
                 'product': item.product.name,
                 'size': item.product.size,
                 'quantity': item.quantity,
                 'unit_price': float(item.unit_price),
-                'total': float(item.total_price)
-            }
-            receipt_data['items'].append(item_data)
-            receipt_data['subtotal'] += item_data['total']
-        
-        # Calculate tax and total
-        receipt_data['tax'] = round(receipt_data['subtotal'] * 0.02, 2)  # 2% tax
-        receipt_data['total'] = receipt_data['subtotal'] + receipt_data['tax']
+                'total': float(item.total)
+            })
         
         return Response(receipt_data)
     
     @action(detail=True, methods=['get'])
     def pdf(self, request, pk=None):
-        """Generate PDF receipt for an order."""
+        """Download the PDF receipt for an order, rendered once per order version."""
         order = self.get_object()
-        
-        # Create a file-like buffer to receive PDF data
-        buffer = io.BytesIO()
-        
-        # Create the PDF object, using the buffer as its "file"
-        p = canvas.Canvas(buffer, pagesize=letter)
-        
-        # Set up the document
-        p.setTitle(f"Order Receipt - {order.order_id}")
-        
-        # Add company header
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(1 * inch, 10 * inch, "K-TO-DRINKS TRADING")
-        
-        p.setFont("Helvetica", 12)
-        p.drawString(1 * inch, 9.7 * inch, "Order Receipt")
-        
-        # Add order details
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(1 * inch, 9.3 * inch, f"Order ID: {order.order_id}")
-        p.setFont("Helvetica", 10)
-        p.drawString(1 * inch, 9.0 * inch, f"Date: {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # Add store details
-        p.drawString(1 * inch, 8.6 * inch, f"Store: {order.store.name}")
-        p.drawString(1 * inch, 8.3 * inch, f"Location: {order.store.location}")
-        p.drawString(1 * inch, 8.0 * inch, f"Contact: {order.store.number}")
-        
-        # Add items table
-        data = [["Product", "Size", "Quantity", "Unit Price", "Total"]]
-        
-        # Add item rows
-        for item in order.items.all():
-            data.append([
-                item.product.name,
-                item.product.size,
-                str(item.quantity),
-                f"₱{item.unit_price:.2f}",
-                f"₱{item.total_price:.2f}"
-            ])
-        
-        # Calculate totals
-        subtotal = sum(item.total_price for item in order.items.all())
-        tax = subtotal * 0.02  # 2% tax
-        total = subtotal + tax
-        
-        # Add totals rows
-        data.append(["", "", "", "Subtotal:", f"₱{subtotal:.2f}"])
-        data.append(["", "", "", "Tax (2%):", f"₱{tax:.2f}"])
-        data.append(["", "", "", "Total:", f"₱{total:.2f}"])
-        
-        # Create table
-        table = Table(data, colWidths=[2*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-        
-        # Add style to table
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -4), colors.white),
-            ('BACKGROUND', (0, -3), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (3, -3), (-1, -1), 'Helvetica-Bold'),
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-            ('GRID', (0, 0), (-1, -4), 1, colors.black),
-            ('LINEBELOW', (3, -3), (-1, -1), 1, colors.black),
-        ]))
-        
-        # Draw table
-        table.wrapOn(p, letter[0] - 2*inch, letter[1])
-        table.drawOn(p, 1*inch, 7*inch - len(data)*15)
-        
-        # Add footer
-        p.setFont("Helvetica-Italic", 8)
-        p.drawString(1*inch, 1*inch, "Thank you for your business!")
-        p.drawString(1*inch, 0.8*inch, "K-TO-DRINKS TRADING")
-        
-        # Close the PDF object cleanly
-        p.showPage()
-        p.save()
-        
-        # Get the value of the BytesIO buffer and return response
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="order_{order.order_id}.pdf"'
-        
-        return response
\ No newline at end of file
+        key = receipts.receipt_key(order)
+        etag = f'"{key}"'
+        
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(
+                receipts.open_receipt(order, key),
+                as_attachment=True,
+                filename=f'order_{order.order_id}.pdf',
+                content_type='application/pdf'
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
+    # Largest number of receipts exported by one request
+    export_limit = 1000
+    
+    @action(detail=False, methods=['get'])
+    def export_pdf(self, request):
+        """Download the receipts of many orders (by delivery_day or ids) as one zip."""
+        delivery_day = request.query_params.get('delivery_day')
+        if not delivery_day and not request.query_params.get('ids'):
+            return Response({'error': 'delivery_day or ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        orders = self.get_queryset()
+        # ``limit`` exports only the first orders instead of refusing large days
+        limit = request.query_params.get('limit', '')
+        if limit.isdigit():
+            orders = orders[:int(limit)]
+        orders = list(orders[:self.export_limit + 1])
+        if not orders:
+            return Response({'error': 'No orders match'}, status=status.HTTP_404_NOT_FOUND)
+        if len(orders) > self.export_limit:
+            return Response(
+                {'error': f'At most {self.export_limit} receipts per export'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response = StreamingHttpResponse(receipts.stream_zip(orders), content_type='application/zip')
+        filename = f'receipts_{delivery_day or "orders"}.zip'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -13,6 +13,13 @@ class Product(TimeStampedModel):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Keyset pages of the product list, which shows either active or
+            # archived products. Partial, since SQLite only matches a boolean
+            # filter against an index condition, not an indexed column
+            models.Index(fields=['name', 'id'], condition=models.Q(is_active=True), name='product_active_name_idx'),
+            models.Index(fields=['name', 'id'], condition=models.Q(is_active=False), name='product_archived_name_idx'),
+        ]
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
 
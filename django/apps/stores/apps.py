@@ -5,3 +5,5 @@ class StoresConfig(AppConfig):
     name = 'apps.stores'
     verbose_name = 'Stores'
 
+    def ready(self):
+        import apps.stores.signals  # noqa
@@ -0,0 +1,183 @@
+# apps/stores/geo.py
+"""
+Spatial lookups over store coordinates.
+
+Every store carries a geohash of its coordinates, kept up to date on save,
+so SQL can select an area by key prefix. Radius and bounding-box queries go
+through ``StoreIndex``, an in-memory uniform grid over all located stores.
+Coordinates are held in NumPy arrays sorted by grid cell, so a query
+touches only the cells overlapping its area: one vectorised binary search
+per row of cells, then an exact distance or bounds check on the few
+candidates.
+
+The index is built lazily per process and rebuilt after any store is
+saved or deleted here, or once it is older than
+``STORE_INDEX_MAX_AGE`` seconds to pick up changes made by other
+processes.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9
+# Grid cell size in degrees (about 1.1 km of latitude)
+CELL_DEGREES = 0.01
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Cell columns per row, larger than any column index so keys sort row-major
+_ROW_STRIDE = 1 << 20
+
+
+def geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distances in km from one point to arrays of points."""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def radius_bbox(lat, lng, radius_km):
+    """``(min_lat, min_lng, max_lat, max_lng)`` enclosing a circle."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, lat - lat_delta)
+    max_lat = min(90.0, lat + lat_delta)
+    # Widest point of the circle is at the latitude closest to a pole
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    lng_delta = min(180.0, lat_delta / math.cos(math.radians(widest)))
+    return min_lat, lng - lng_delta, max_lat, lng + lng_delta
+
+
+class StoreIndex:
+    """Uniform grid of store coordinates answering radius and bounding-box queries."""
+
+    def __init__(self, ids, lats, lngs, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        keys = self._row(lats) * _ROW_STRIDE + self._column(lngs)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        rows = queryset.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+            'id', 'latitude', 'longitude'
+        )
+        columns = list(zip(*rows)) or [(), (), ()]
+        return cls(*columns)
+
+    def _row(self, lats):
+        return np.floor((np.asarray(lats) + 90.0) / self.cell_degrees).astype(np.int64)
+
+    def _column(self, lngs):
+        return np.floor((np.asarray(lngs) + 180.0) / self.cell_degrees).astype(np.int64)
+
+    def _candidates(self, min_lat, min_lng, max_lat, max_lng):
+        """Positions of the points in every cell overlapping the box."""
+        rows = np.arange(self._row(min_lat), self._row(max_lat) + 1)
+        first_column, last_column = self._column(min_lng), self._column(max_lng)
+        starts = np.searchsorted(self.keys, rows * _ROW_STRIDE + first_column, side='left')
+        ends = np.searchsorted(self.keys, rows * _ROW_STRIDE + last_column, side='right')
+        spans = [np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(spans)
+
+    def within(self, min_lat, min_lng, max_lat, max_lng):
+        """Ids of stores inside the box. Boxes crossing the antimeridian have min_lng > max_lng."""
+        if min_lng > max_lng:
+            return np.concatenate([
+                self.within(min_lat, min_lng, max_lat, 180.0),
+                self.within(min_lat, -180.0, max_lat, max_lng),
+            ])
+        positions = self._candidates(min_lat, min_lng, max_lat, max_lng)
+        lats, lngs = self.lats[positions], self.lngs[positions]
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+        return self.ids[positions[inside]]
+
+    def nearby(self, lat, lng, radius_km, limit=None):
+        """``(ids, distances_km)`` of stores within ``radius_km``, nearest first."""
+        min_lat, min_lng, max_lat, max_lng = radius_bbox(lat, lng, radius_km)
+        if min_lng < -180.0 or max_lng > 180.0:
+            # Wrap boxes crossing the antimeridian into two lookups
+            spans = [(max(min_lng, -180.0), min(max_lng, 180.0))]
+            if min_lng < -180.0:
+                spans.append((min_lng + 360.0, 180.0))
+            if max_lng > 180.0:
+                spans.append((-180.0, max_lng - 360.0))
+            positions = np.unique(np.concatenate([
+                self._candidates(min_lat, low, max_lat, high) for low, high in spans
+            ]))
+        else:
+            positions = self._candidates(min_lat, min_lng, max_lat, max_lng)
+
+        distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return self.ids[positions[order]], distances[order]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide StoreIndex, rebuilt when invalidated or too old."""
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.built_at <= settings.STORE_INDEX_MAX_AGE:
+        return index
+    with _lock:
+        if _index is None or time.monotonic() - _index.built_at > settings.STORE_INDEX_MAX_AGE:
+            from .models import Store
+            _index = StoreIndex.from_queryset(Store.objects.all())
+        return _index
+
+
+def invalidate():
+    """Drop the cached index so the next query rebuilds it."""
+    global _index
+    _index = None
@@ -0,0 +1,74 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.stores import geo
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the in-memory store spatial index (radius and bounding-box '
+        'lookups) against a full NumPy scan on synthetic store coordinates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000],
+            help='Store counts to benchmark'
+        )
+        parser.add_argument('--queries', type=int, default=200, help='Lookups per measurement')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        for size in options['sizes']:
+            # Scattered over Luzon, denser in Metro Manila
+            dense = size // 2
+            lats = np.concatenate([
+                [rng.gauss(14.6, 0.08) for _ in range(dense)],
+                [rng.uniform(13.5, 18.5) for _ in range(size - dense)],
+            ])
+            lngs = np.concatenate([
+                [rng.gauss(121.0, 0.08) for _ in range(dense)],
+                [rng.uniform(119.8, 122.5) for _ in range(size - dense)],
+            ])
+
+            started = time.perf_counter()
+            index = geo.StoreIndex(np.arange(size), lats, lngs)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size:,} stores, index built in {(time.perf_counter() - started) * 1000:.1f} ms'
+            ))
+
+            centres = [(rng.gauss(14.6, 0.1), rng.gauss(121.0, 0.1)) for _ in range(options['queries'])]
+            for radius in (1, 5, 20):
+                self._report(
+                    f'nearby {radius:>2} km',
+                    lambda lat, lng: index.nearby(lat, lng, radius)[0],
+                    lambda lat, lng: np.flatnonzero(geo.haversine_km(lat, lng, lats, lngs) <= radius),
+                    centres,
+                )
+            half = 0.05
+            self._report(
+                'within viewport',
+                lambda lat, lng: index.within(lat - half, lng - half, lat + half, lng + half),
+                lambda lat, lng: np.flatnonzero(
+                    (lats >= lat - half) & (lats <= lat + half) & (lngs >= lng - half) & (lngs <= lng + half)
+                ),
+                centres,
+            )
+
+    def _report(self, label, indexed, scan, centres):
+        results = 0
+        timings = {}
+        for name, fn in (('index', indexed), ('scan', scan)):
+            started = time.perf_counter()
+            for lat, lng in centres:
+                found = len(fn(lat, lng))
+            timings[name] = (time.perf_counter() - started) / len(centres)
+            results = found
+        self.stdout.write(
+            f'  {label:<16} index={timings["index"] * 1000:7.3f} ms  '
+            f'scan={timings["scan"] * 1000:8.3f} ms  (last query: {results:,} stores)'
+        )
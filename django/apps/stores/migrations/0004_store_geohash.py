@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+from apps.stores.geo import geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    Store = apps.get_model('stores', 'Store')
+    stores = list(Store.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for store in stores:
+        store.geohash = geohash(store.latitude, store.longitude)
+    Store.objects.bulk_update(stores, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0003_store_hours_store_latitude_store_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0004_store_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(fields=['name', 'id'], name='store_name_idx'),
+        ),
+    ]
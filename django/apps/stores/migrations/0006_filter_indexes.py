@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['name', 'id'], name='store_current_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='store',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['status', 'name', 'id'], name='store_current_status_idx'),
+        ),
+    ]
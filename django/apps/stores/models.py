@@ -1,5 +1,6 @@
 from django.db import models
 from apps.base.models import TimeStampedModel
+from . import geo
 
 class Store(TimeStampedModel):
     """
@@ -37,12 +38,37 @@ class Store(TimeStampedModel):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     hours = models.CharField(max_length=255, blank=True)
+    # Derived from latitude/longitude on save, empty when either is missing
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
 
     class Meta:
         verbose_name = 'Store'
         verbose_name_plural = 'Stores'
         ordering = ['name']
+        indexes = [
+            # Keyset pages of the store list by name
+            models.Index(fields=['name', 'id'], name='store_name_idx'),
+            # The unarchived stores, and those with a status (partial, like products')
+            models.Index(fields=['name', 'id'], condition=models.Q(is_archived=False), name='store_current_name_idx'),
+            models.Index(
+                fields=['status', 'name', 'id'], condition=models.Q(is_archived=False), name='store_current_status_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    def update_geohash(self):
+        """Recompute ``geohash``; call before bulk writes, which skip save()."""
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = geo.geohash(self.latitude, self.longitude)
+
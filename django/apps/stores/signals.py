@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import geo
+from .models import Store
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store_index(sender, **kwargs):
+    """Rebuild the spatial index on next use after any store change."""
+    geo.invalidate()
@@ -1,3 +1,139 @@
-from django.test import TestCase
+import random
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from . import geo
+from .models import Store
+
+User = get_user_model()
+
+
+class GeoTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = [(i, 14.4 + rng.random() * 0.5, 120.8 + rng.random() * 0.5) for i in range(3000)]
+        self.index = geo.StoreIndex(*zip(*self.points))
+        self.ids = np.array([point[0] for point in self.points])
+        self.lats = np.array([point[1] for point in self.points])
+        self.lngs = np.array([point[2] for point in self.points])
+
+    def test_geohash(self):
+        self.assertEqual(geo.geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        # Nearby points share a prefix
+        self.assertEqual(geo.geohash(14.5995, 120.9842)[:5], geo.geohash(14.5996, 120.9843)[:5])
+
+    def test_nearby_matches_full_scan(self):
+        for lat, lng, radius in ((14.6, 121.0, 2), (14.45, 120.85, 10), (14.9, 121.3, 0.5)):
+            ids, distances = self.index.nearby(lat, lng, radius)
+            scan = geo.haversine_km(lat, lng, self.lats, self.lngs)
+            expected = self.ids[scan <= radius]
+            self.assertEqual(sorted(ids.tolist()), sorted(expected.tolist()))
+            self.assertEqual(distances.tolist(), sorted(distances.tolist()))
+            self.assertTrue((distances <= radius).all())
+
+        ids, _distances = self.index.nearby(14.6, 121.0, 10, limit=5)
+        self.assertEqual(len(ids), 5)
+
+    def test_within_matches_full_scan(self):
+        ids = self.index.within(14.5, 120.9, 14.6, 121.05)
+        inside = (self.lats >= 14.5) & (self.lats <= 14.6) & (self.lngs >= 120.9) & (self.lngs <= 121.05)
+        self.assertEqual(sorted(ids.tolist()), sorted(self.ids[inside].tolist()))
+
+    def test_antimeridian(self):
+        index = geo.StoreIndex([1, 2, 3], [-17.0, -17.0, -17.0], [179.99, -179.99, 170.0])
+        self.assertEqual(sorted(index.within(-18, 179.9, -16, -179.9).tolist()), [1, 2])
+        self.assertEqual(sorted(index.nearby(-17.0, 179.995, 5)[0].tolist()), [1, 2])
+
+    def test_empty_index(self):
+        index = geo.StoreIndex([], [], [])
+        self.assertEqual(len(index.nearby(14.6, 121.0, 5)[0]), 0)
+        self.assertEqual(len(index.within(14, 120, 15, 122)), 0)
+
+
+class StoreSpatialApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='stores', password='pass', role='admin')
+        self.client.force_authenticate(user=self.user)
+        self.near = self.create_store('Near', 14.601, 121.0)
+        self.far = self.create_store('Far', 14.7, 121.0)
+        self.create_store('Unlocated', None, None)
+
+    def create_store(self, name, lat, lng, **fields):
+        return Store.objects.create(
+            name=name, owner_name='Owner', address='-', contact='-', latitude=lat, longitude=lng, **fields
+        )
+
+    def test_geohash_maintained_on_save(self):
+        self.assertEqual(self.near.geohash, geo.geohash(14.601, 121.0))
+        self.assertEqual(Store.objects.get(name='Unlocated').geohash, '')
+
+        self.near.latitude = 14.65
+        self.near.save(update_fields=['latitude'])
+        self.near.refresh_from_db()
+        self.assertEqual(self.near.geohash, geo.geohash(14.65, 121.0))
+
+        response = self.client.get('/api/stores/', {'geohash': self.far.geohash[:5]})
+        self.assertEqual([store['name'] for store in response.data['results']], ['Far'])
+
+    def test_active_is_paginated(self):
+        self.create_store('Archived', None, None, is_archived=True)
+        names = []
+        url, params = '/api/stores/active/', {'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [store['name'] for store in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(names, ['Far', 'Near', 'Unlocated'])
+
+    def test_nearby(self):
+        response = self.client.get('/api/stores/nearby/', {'lat': 14.6, 'lng': 121.0, 'radius': 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([store['name'] for store in response.data], ['Near', 'Far'])
+        self.assertAlmostEqual(response.data[0]['distance_km'], 0.111, places=3)
+
+        response = self.client.get('/api/stores/nearby/', {'lat': 14.6, 'lng': 121.0, 'radius': 1})
+        self.assertEqual([store['name'] for store in response.data], ['Near'])
+
+    def test_index_follows_store_changes(self):
+        params = {'lat': 14.6, 'lng': 121.0, 'radius': 1}
+        self.client.get('/api/stores/nearby/', params)
+        self.create_store('New', 14.6, 121.001)
+        response = self.client.get('/api/stores/nearby/', params)
+        self.assertEqual([store['name'] for store in response.data], ['New', 'Near'])
+
+        self.near.delete()
+        response = self.client.get('/api/stores/nearby/', params)
+        self.assertEqual([store['name'] for store in response.data], ['New'])
+
+    def test_nearby_applies_filters_and_limit(self):
+        self.create_store('Archived', 14.6, 121.0005, is_archived=True)
+        response = self.client.get(
+            '/api/stores/nearby/', {'lat': 14.6, 'lng': 121.0, 'radius': 20, 'is_archived': 'false', 'limit': 1}
+        )
+        self.assertEqual([store['name'] for store in response.data], ['Near'])
+
+    def test_within(self):
+        geo.get_index()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/stores/within/', {'bbox': '120.9,14.65,121.1,14.75'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([store['name'] for store in response.data], ['Far'])
+
+    def test_invalid_parameters(self):
+        for url, params in (
+            ('/api/stores/nearby/', {'lat': 14.6}),
+            ('/api/stores/nearby/', {'lat': 'x', 'lng': 121}),
+            ('/api/stores/nearby/', {'lat': 14.6, 'lng': 121, 'radius': 1000}),
+            ('/api/stores/nearby/', {'lat': 14.6, 'lng': 121, 'limit': 0}),
+            ('/api/stores/within/', {}),
+            ('/api/stores/within/', {'bbox': '1,2,3'}),
+            ('/api/stores/within/', {'bbox': '120,15,121,14'}),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
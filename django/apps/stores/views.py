@@ -6,6 +6,7 @@ from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from . import geo
 from .models import Store
 from .serializers import StoreSerializer
 import logging
@@ -20,6 +21,20 @@ class StoreViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'is_archived']
     search_fields = ['name', 'owner_name', 'address']
     ordering_fields = ['name', 'status']
+    # Upper bounds for the spatial lookups
+    max_radius_km = 100
+    max_results = 1000
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        # Filter by geohash prefix; a range so the geohash index is used
+        prefix = self.request.query_params.get('geohash')
+        if prefix:
+            prefix = prefix.lower()
+            queryset = queryset.filter(geohash__gte=prefix, geohash__lt=prefix + '~')
+
+        return queryset
 
     def list(self, request, *args, **kwargs):
         logger.info(f"Received store list request with params: {request.query_params}")
@@ -31,9 +46,89 @@ class StoreViewSet(viewsets.ModelViewSet):
             status='Active',
             is_archived=False
         )
+        page = self.paginate_queryset(active_stores)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(active_stores, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['GET'])
+    def nearby(self, request):
+        """
+        Stores within ``radius`` km (default 5) of ``lat``/``lng``, nearest
+        first, each with its ``distance_km``. ``limit`` caps the results.
+        """
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', 5))
+            limit = self._spatial_limit(request)
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'lat and lng are required; lat, lng, radius and limit must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= self.max_radius_km):
+            return Response(
+                {'detail': f'lat/lng must be valid coordinates and radius between 0 and {self.max_radius_km} km.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ids, distances = geo.get_index().nearby(lat, lng, radius)
+        stores = self._spatial_results(ids, limit)
+        distance_by_id = dict(zip(ids.tolist(), distances.tolist()))
+        data = self.get_serializer(stores, many=True).data
+        for store in data:
+            store['distance_km'] = round(distance_by_id[store['id']], 3)
+        return Response(data)
+
+    @action(detail=False, methods=['GET'])
+    def within(self, request):
+        """
+        Stores inside ``bbox=min_lng,min_lat,max_lng,max_lat`` (a map
+        viewport, GeoJSON order). ``limit`` caps the results.
+        """
+        try:
+            min_lng, min_lat, max_lng, max_lat = (
+                float(value) for value in request.query_params['bbox'].split(',')
+            )
+            limit = self._spatial_limit(request)
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'bbox must be min_lng,min_lat,max_lng,max_lat.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            return Response({'detail': 'bbox is out of range.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = geo.get_index().within(min_lat, min_lng, max_lat, max_lng)
+        stores = self._spatial_results(ids, limit)
+        return Response(self.get_serializer(stores, many=True).data)
+
+    def _spatial_limit(self, request):
+        limit = int(request.query_params.get('limit', self.max_results))
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        return min(limit, self.max_results)
+
+    def _spatial_results(self, ids, limit):
+        """
+        Stores for index hits in the order given, after the usual filters.
+
+        Hits are fetched in batches of ``limit`` so filtered-out stores
+        (archived, other status) do not cut the results short.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        ids = ids.tolist()
+        results = []
+        for offset in range(0, len(ids), limit):
+            batch = ids[offset:offset + limit]
+            found = queryset.in_bulk(batch)
+            results.extend(found[pk] for pk in batch if pk in found)
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
 class StoreView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -20,7 +20,7 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        queryset = User.objects.all()
+        queryset = User.objects.select_related('profile')
         status = self.request.query_params.get('status', None)
         search = self.request.query_params.get('search', None)
 
@@ -79,7 +79,7 @@ class UserListCreateView(generics.ListCreateAPIView):
     """
     API view to retrieve list of users or create new user
     """
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('profile')
     permission_classes = [permissions.IsAuthenticated]
 
     def get_serializer_class(self):
@@ -92,7 +92,7 @@ class UserRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update or delete user
     """
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('profile')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -2,6 +2,9 @@
 ASGI config for k_to_drinks project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn k_to_drinks.asgi:application``)
+for the live delivery feed at ``/api/deliveries/feed/``, which streams and
+cannot be held open by WSGI workers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
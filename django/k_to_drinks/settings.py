@@ -5,6 +5,8 @@ Django settings for k_to_drinks project.
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -76,13 +78,67 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'k_to_drinks.wsgi.application'
 
-# Database
-DATABASES = {
-   'default': {
-       'ENGINE': 'django.db.backends.sqlite3',
-       'NAME': BASE_DIR / 'db.sqlite3',
-   }
-}
+# Database: SQLite unless DB_ENGINE=postgresql (then DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST and DB_PORT describe the server)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite').lower()
+# Seconds a connection is kept for the next request (0 reconnects every
+# request). Off in development, where runserver starts a thread per request
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 0 if DEBUG else 60))
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'k_to_drinks'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Persistent connections are checked before reuse, not discovered broken mid-request
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # Connections per process in psycopg's pool; 0 keeps per-thread persistent
+    # connections instead (Django allows one or the other)
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+    if DB_POOL_MAX_SIZE > 0:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': DB_POOL_MAX_SIZE,
+            # Seconds a request waits for a free connection before failing
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+elif DB_ENGINE in ('sqlite', 'sqlite3'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Seconds a write waits for the lock (SQLite's busy_timeout)
+                # before "database is locked"
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+                # Transactions take the write lock when they begin. A deferred
+                # one that reads and then writes cannot wait for a lock held by
+                # another writer and fails at once instead
+                'transaction_mode': 'IMMEDIATE',
+                # WAL (switched on once by the apps.base migrations, it is kept in
+                # the file) lets reads run alongside the writer. synchronous=NORMAL
+                # is durable at checkpoints (safe with WAL), saving an fsync per commit
+                'init_command': (
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'Unsupported DB_ENGINE {DB_ENGINE!r}, use sqlite or postgresql')
 
 # Password validation
 # AUTH_PASSWORD_VALIDATORS = [
@@ -137,6 +193,9 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    # Lists are served in keyset pages of PAGE_SIZE rows (``?page_size=`` up to 500)
+    'DEFAULT_PAGINATION_CLASS': 'apps.base.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
 }
 
 # CORS settings
@@ -174,6 +233,64 @@ CORS_EXPOSE_HEADERS = [
     'access-control-allow-credentials',
 ]
 
+# Dashboard statistics precompute
+# Seconds between refreshes of DashboardStat by the run_schedulers command, 0
+# disables the job (use the refresh_dashboard_stats command from cron instead)
+DASHBOARD_STATS_REFRESH_INTERVAL = int(os.getenv('DASHBOARD_STATS_REFRESH_INTERVAL', '0'))
+# Precomputed stats older than this many seconds are reported as stale
+DASHBOARD_STATS_MAX_AGE = int(os.getenv('DASHBOARD_STATS_MAX_AGE', '900'))
+
+# Rendered PDF receipts
+# Directory of the on-disk receipt cache, kept outside MEDIA_ROOT so it is never served directly
+RECEIPT_CACHE_DIR = os.getenv('RECEIPT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'receipts'))
+# Oldest receipts are evicted once the cache grows past this many bytes
+RECEIPT_CACHE_MAX_BYTES = int(os.getenv('RECEIPT_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+# Worker processes rendering bulk receipt exports, 0 uses one per CPU
+RECEIPT_EXPORT_WORKERS = int(os.getenv('RECEIPT_EXPORT_WORKERS', '0'))
+
+# In-memory store spatial index
+# Seconds before a process rebuilds its index to pick up changes made elsewhere
+STORE_INDEX_MAX_AGE = int(os.getenv('STORE_INDEX_MAX_AGE', '300'))
+
+# Delivery signature uploads
+# Decode and compress signatures in a background thread pool instead of the request
+SIGNATURE_PROCESSING_ASYNC = os.getenv('SIGNATURE_PROCESSING_ASYNC', 'true').lower() == 'true'
+SIGNATURE_WORKERS = int(os.getenv('SIGNATURE_WORKERS', '2'))
+# Uploads larger than this many bytes (after base64 decoding) are rejected
+SIGNATURE_MAX_UPLOAD_BYTES = int(os.getenv('SIGNATURE_MAX_UPLOAD_BYTES', str(5 * 1024 * 1024)))
+
+# Most status updates accepted in one batch request
+DELIVERY_STATUS_MAX_BATCH = int(os.getenv('DELIVERY_STATUS_MAX_BATCH', '500'))
+
+# Live delivery feed (Server-Sent Events, served by the ASGI application)
+# Broker class fanning events out to subscribers; the default only reaches
+# streams in the same process, swap it for a shared broker when running several workers
+DELIVERY_FEED_BROKER = os.getenv('DELIVERY_FEED_BROKER', 'apps.deliveries.feed.InProcessBroker')
+# Seconds between keepalive comments on an idle stream
+DELIVERY_FEED_KEEPALIVE = int(os.getenv('DELIVERY_FEED_KEEPALIVE', '15'))
+# Streams are closed after this many seconds and the browser reconnects
+DELIVERY_FEED_MAX_SECONDS = int(os.getenv('DELIVERY_FEED_MAX_SECONDS', '300'))
+# Events queued per stream before a slow client starts losing the oldest
+DELIVERY_FEED_QUEUE_SIZE = int(os.getenv('DELIVERY_FEED_QUEUE_SIZE', '1000'))
+
+# Driver GPS breadcrumbs
+# Seconds between flushes of buffered points, 0 writes every batch through immediately
+LOCATION_FLUSH_INTERVAL = float(os.getenv('LOCATION_FLUSH_INTERVAL', '2'))
+# Buffered points that trigger an immediate flush
+LOCATION_FLUSH_SIZE = int(os.getenv('LOCATION_FLUSH_SIZE', '2000'))
+# Most points accepted in one request
+LOCATION_MAX_BATCH = int(os.getenv('LOCATION_MAX_BATCH', '500'))
+# Days of breadcrumbs kept by the prune_delivery_locations command
+LOCATION_RETENTION_DAYS = int(os.getenv('LOCATION_RETENTION_DAYS', '90'))
+
+# Most lines accepted in one stock-count import
+STOCK_COUNT_MAX_LINES = int(os.getenv('STOCK_COUNT_MAX_LINES', '20000'))
+# Most changes accepted by one stock adjustment (each locks an inventory row)
+STOCK_ADJUST_MAX_CHANGES = int(os.getenv('STOCK_ADJUST_MAX_CHANGES', '500'))
+# Seconds between checks by the run_schedulers command that yesterday's inventory
+# snapshots exist, 0 disables the job (run snapshot_inventory from cron instead)
+INVENTORY_SNAPSHOT_INTERVAL = int(os.getenv('INVENTORY_SNAPSHOT_INTERVAL', '0'))
+
 # JWT settings
 from datetime import timedelta
 SIMPLE_JWT = {
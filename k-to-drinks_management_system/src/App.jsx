@@ -18,7 +18,7 @@ import UserPage from "./pages/UserPage"
 
 import { toast } from "react-toastify"
 
-import api from "./api/api_url"
+import { fetchAllPages } from "./api/api_url"
 import "./index.css"
 import "./css/pages.css"
 import PropTypes from "prop-types"
@@ -101,10 +101,10 @@ function App() {
         if (isMounted) {
           setLoading(true)
         }
-        const response = await api.get("/users/")
+        const users = await fetchAllPages("/users/")
         if (isMounted) {
-          setUsers(response.data)
-          console.log("Users fetched successfully:", response.data.length)
+          setUsers(users)
+          console.log("Users fetched successfully:", users.length)
         }
       } catch (error) {
         console.error("Failed to fetch users:", error)
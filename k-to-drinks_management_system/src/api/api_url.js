@@ -73,4 +73,23 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints return keyset pages ({ next, previous, results }).
+// Screens that filter and sort client-side need every row, so this
+// follows the `next` links and returns one array.
+export const fetchAllPages = async (url, config = {}) => {
+  const rows = [];
+  let response = await api.get(url, { ...config, params: { page_size: 500, ...config.params } });
+  for (;;) {
+    const data = response.data;
+    if (Array.isArray(data)) {
+      return rows.concat(data);
+    }
+    rows.push(...(data?.results ?? []));
+    if (!data?.next) {
+      return rows;
+    }
+    response = await api.get(data.next);
+  }
+};
+
 export default api;
@@ -8,7 +8,7 @@ import { useAuth } from "../context/AuthContext"
 import "../css/header.css"
 import { Avatar, AvatarImage, AvatarFallback } from "./ui/avatar"
 import { Menu, Bell, Moon, LogOut, AlertTriangle, X } from "lucide-react"
-import api, { ENDPOINTS } from "@/api/api_url"
+import { ENDPOINTS, fetchAllPages } from "@/api/api_url"
 
 // Helper function to get initials
 function getInitials(firstName, lastName, userName) {
@@ -45,8 +45,8 @@ export default function Header({ toggleSidebar, sidebarOpen }) {
 
   // Fetch inventory on mount
   useEffect(() => {
-    api.get(ENDPOINTS.INVENTORY)
-      .then(response => setInventory(response.data))
+    fetchAllPages(ENDPOINTS.INVENTORY)
+      .then(rows => setInventory(rows))
       .catch(() => setInventory([]))
   }, [])
 
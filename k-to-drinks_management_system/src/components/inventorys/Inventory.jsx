@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef, useCallback, useMemo } from "react"
 import { toast } from "react-toastify"
-import api, { ENDPOINTS } from "@/api/api_url"
+import api, { ENDPOINTS, fetchAllPages } from "@/api/api_url"
 import { Edit, Search, PackagePlus, Eye, Printer, RefreshCcw, AlertTriangle, CheckCircle, XCircle } from "lucide-react"
 import jsPDF from "jspdf"
 // Import shadcn components
@@ -34,9 +34,9 @@ export default function InventoryPage() {
     try {
       setIsLoading(true)
       setError(null)
-      const response = await api.get(ENDPOINTS.INVENTORY)
+      const rows = await fetchAllPages(ENDPOINTS.INVENTORY)
 
-      const formattedData = response.data
+      const formattedData = rows
         .filter((item) => item.product?.is_active !== false)
         .map((item) => ({
           id: item.id,
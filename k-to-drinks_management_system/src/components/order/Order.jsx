@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef, useCallback, useMemo } from "react"
 import { toast } from "react-toastify"
-import api, { ENDPOINTS } from "@/api/api_url"
+import api, { ENDPOINTS, fetchAllPages } from "@/api/api_url"
 import { Search, Plus, Printer, Eye, RefreshCcw, Check, X } from "lucide-react"
 import jsPDF from "jspdf"
 import { Button } from "@/components/ui/button"
@@ -46,13 +46,8 @@ export default function OrderList() {
         params.append("search", searchTerm)
       }
 
-      const response = await api.get(`${ENDPOINTS.ORDERS}?${params.toString()}`)
-
-      if (!response.data) {
-        throw new Error("No data received from server")
-      }
-
-      setOrders(Array.isArray(response.data) ? response.data : [])
+      const orders = await fetchAllPages(`${ENDPOINTS.ORDERS}?${params.toString()}`)
+      setOrders(orders)
     } catch (error) {
       console.error("Error fetching orders:", error)
       setError(error.message || "Failed to fetch orders")
@@ -65,8 +60,8 @@ export default function OrderList() {
 
   const fetchAvailableProducts = useCallback(async () => {
     try {
-      const response = await api.get(ENDPOINTS.PRODUCTS)
-      setAvailableProducts(response.data || [])
+      const products = await fetchAllPages(ENDPOINTS.PRODUCTS)
+      setAvailableProducts(products)
     } catch (error) {
       console.error("Error fetching products:", error)
       toast.error("Failed to fetch available products")
@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef, useCallback, useMemo } from "react"
 import { toast } from "react-toastify"
-import api, { ENDPOINTS } from "@/api/api_url"
+import api, { ENDPOINTS, fetchAllPages } from "@/api/api_url"
 import { Archive, Edit, Search, Plus, Eye, ArchiveRestore, Printer, ImageIcon, X } from "lucide-react"
 import jsPDF from "jspdf"
 import { useLongPress } from "@/hooks/useLongPress"
@@ -120,13 +120,8 @@ export default function ProductsPage() {
         params.append("search", searchTerm)
       }
 
-      const response = await api.get(`${ENDPOINTS.PRODUCTS}?${params.toString()}`)
-
-      if (!response.data) {
-        throw new Error("No data received from server")
-      }
-
-      setProducts(Array.isArray(response.data) ? response.data : [])
+      const products = await fetchAllPages(`${ENDPOINTS.PRODUCTS}?${params.toString()}`)
+      setProducts(products)
     } catch (error) {
       console.error("Error fetching products:", error)
       setError(error.message || "Failed to fetch products")
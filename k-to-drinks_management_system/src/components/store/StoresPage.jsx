@@ -7,7 +7,7 @@ import { DataTable } from "@/components/ui/DataTable"
 import { toast } from "react-toastify"
 import { Search, Store, Edit, Archive, ArchiveRestore, Eye, Map } from "lucide-react"
 import { Badge } from "@/components/ui/badge"
-import api, { ENDPOINTS } from "@/api/api_url"
+import api, { ENDPOINTS, fetchAllPages } from "@/api/api_url"
 import { MapContainer, TileLayer, Marker, Popup, useMapEvents } from 'react-leaflet'
 import L from 'leaflet'
 
@@ -200,17 +200,8 @@ export default function StoresPage() {
         params.append('search', searchTerm);
       }
 
-      const response = await api.get(ENDPOINTS.STORES, { params });
-      
-      if (Array.isArray(response.data)) {
-        setStores(response.data);
-      } else if (Array.isArray(response.data.results)) {
-        // Handle paginated response
-        setStores(response.data.results);
-      } else {
-        console.error('Unexpected response format:', response.data);
-        setStores([]);
-      }
+      const stores = await fetchAllPages(ENDPOINTS.STORES, { params });
+      setStores(stores);
     } catch (error) {
       console.error('Error fetching stores:', error);
       toast.error('Failed to fetch stores');
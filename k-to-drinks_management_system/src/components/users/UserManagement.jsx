@@ -1,6 +1,6 @@
 import { useState, useEffect, useRef, useCallback, useMemo } from "react";
 import { toast } from "react-toastify";
-import api, { ENDPOINTS } from "../../api/api_url";
+import api, { ENDPOINTS, fetchAllPages } from "../../api/api_url";
 import { Archive, Edit, Search, UserPlus, Eye, ArchiveRestore, Printer, } from "lucide-react";
 import jsPDF from "jspdf";
 import { useLongPress } from "@/hooks/useLongPress";
@@ -86,14 +86,8 @@ export default function UserManagement() {
         params.append('search', searchTerm);
       }
 
-      const response = await api.get(`${ENDPOINTS.USERS}?${params.toString()}`);
-      
-      if (Array.isArray(response.data)) {
-        setUsers(response.data);
-      } else {
-        console.error('Unexpected response format:', response.data);
-        setUsers([]);
-      }
+      const users = await fetchAllPages(`${ENDPOINTS.USERS}?${params.toString()}`);
+      setUsers(users);
     } catch (error) {
       console.error('Error fetching users:', error);
       setError(error.message);